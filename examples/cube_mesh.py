@@ -1,26 +1,38 @@
 import sys
 sys.path.append('../')
 
+import numpy as np
+
 from mlab_tools.animation import Animation, StopAnimation
 from mlab_tools.geometry import GeometryParser
+from mlab_tools.group import ObjectGroup
 from mlab_tools.polyline import AnimatedPolyLine
+from mlab_tools.timeline import VolumeTimeline, read_trajectory
+from mlab_tools.transformations import rotation_matrix
 
 
 class CubeMeshAnimation(Animation):
     
     """This example shows how to use a VTK geometry file to render a 3D polyhedron mesh."""
     
+    # Simulated time elapsed on each frame.
+    TIME_PER_FRAME = 0.01
+    
     def initialize(self):
-        self.parse_volumes()
-        self.parse_trajectory()
-        
-        parser = GeometryParser.from_VTK('data/cube.vtk')
+        parser = GeometryParser.from_VTK('data/cube.vtk', merged=True)
         self.geometry = parser.parse()
-        self.polys = list()
+        self.mesh = self.geometry.get_mesh()
+        self.mesh.update_polyhedrons(self.mesh.ids, opacity=0.1)
+        self.add_object(self.mesh)
         
-        for _, polyhedron in self.geometry:
-            self.polys.append(polyhedron)
-            self.add_object(polyhedron, opacity=0.1)
+        self.parse_trajectory()
+        
+        # The highlighted volumes are precomputed for every frame.
+        self.timeline = VolumeTimeline.from_retQSS('data/retQSS_volumes_cube',
+                                                   self.geometry,
+                                                   self.TIME_PER_FRAME,
+                                                   start_time=self.times[0])
+        self.last_entry = -1
             
         self.update_camera(focalpoint=[0,-30,120],
                            distance=2700,
@@ -28,62 +40,34 @@ class CubeMeshAnimation(Animation):
                            elevation=90,
                            roll=-90)
             
-    def parse_volumes(self):
-        self.volumes = list()
-        self.boundary = list()
-        
-        with open('data/retQSS_volumes_cube', 'r') as _file:
-            lines = _file.readlines()
-            for line in lines:
-                fields = line.split()
-                time = float(fields[0])
-                volume = fields[1]
-                self.volumes.append((time, volume))
-                
-        self.current_volume_idx = 0
-        self.last_polyhedron = None
+        # The mesh and the trajectory rotate together, so they are animated
+        # as a single group.
+        self.rotation = rotation_matrix((0,0,0.3))
+        group = ObjectGroup([self.mesh, self.trajectory])
+        self.add_object_group(group, self.rotate_scene)
+            
+    def rotate_scene(self, group, frame_no):
+        return {'transform': np.linalg.matrix_power(self.rotation, frame_no)}
                 
     def parse_trajectory(self):
-        points = list()
-        self.times = list()
-        
-        with open('data/retQSS_trajectory_cube', 'r') as _file:
-            lines = _file.readlines()
-            for line in lines:
-                time, x, y, z = map(float, line.split()[:-1])
-                points.append((x,y,z))
-                self.times.append(time)
+        self.times, points, _ = read_trajectory('data/retQSS_trajectory_cube')
                 
-        self.trajectory = AnimatedPolyLine(points)
+        self.trajectory = AnimatedPolyLine(points,
+                                           times=self.times,
+                                           time_per_frame=self.TIME_PER_FRAME)
         self.add_object(self.trajectory, color=(0,0,1))                
             
     def on_frame(self, frame_no):
-        current_point_idx = self.trajectory.current_point()
-        time = self.times[current_point_idx]
-        
-        for poly in self.polys:
-            poly.transform(rotate=(0,0,0.3))
-        self.trajectory.transform(rotate=(0,0,0.3))
-        
         dist = self.get_camera().parameters()['distance']
         if dist > 525:
             self.update_camera(distance=-10)
         
-        while self.current_volume_idx < len(self.volumes) and\
-              time >= self.volumes[self.current_volume_idx][0]:
-            if self.last_polyhedron is not None:
-                self.last_polyhedron.update_properties(color=(0.5,0,0), opacity=0.05)
-                
-            volume_name = self.volumes[self.current_volume_idx][1]
-            print 'Entering volume {}...'.format(volume_name)
-            
-            polyhedron = self.geometry.get_polyhedron(volume_name)
-            polyhedron.update_properties(color=(0.7,0,0), opacity=0.3)
-            self.last_polyhedron = polyhedron
+        entry = self.timeline.seek(frame_no)
+        if entry != self.last_entry:
+            print 'Entering volume {}...'.format(self.timeline.current_name())
+            self.last_entry = entry
             
-            self.current_volume_idx += 1
-            
-        if current_point_idx == self.trajectory.num_points()-1:
+        if self.trajectory.current_point() == self.trajectory.num_points()-1:
             StopAnimation()
         
 
@@ -94,4 +78,3 @@ def run_animation():
 
 if __name__ == '__main__':
     run_animation()
-
@@ -3,9 +3,10 @@ import sys
 sys.path.append('../')
 
 from mlab_tools.animation import Animation, StopAnimation
+from mlab_tools.camera import CameraPath
 from mlab_tools.polyline import AnimatedPolyLine
 from mlab_tools.polyhedron import Polyhedron
-from mlab_tools.point import Point
+from mlab_tools.point import PointCloud
 
 
 class HelixInDetector(Animation):
@@ -21,6 +22,14 @@ class HelixInDetector(Animation):
     INIT_AZIMUTH = 12.699
     INIT_FOCAL   = (-1000,0,0)
     
+    # Frames at which the camera finishes each of its movements.
+    FIRST_ZOOM_END  = 146
+    ROTATION_END    = 199
+    TILT_END        = 250
+    SECOND_ZOOM_END = 384
+    WAIT_END        = 444
+    LAST_FRAME      = 503
+    
     POLYHEDRON_COLOR = (0.8, 0.8, 0.8)
     TRAJECTORY_COLOR = (1, 0, 0)
     POINTS_COLOR     = (0, 0, 1)
@@ -39,12 +48,6 @@ class HelixInDetector(Animation):
         self.points = list()
         self.int_points = list()
         
-        self.first_zoom_done = False
-        self.rotation_done = False
-        self.second_zoom_done = False
-        self.wait_done = False
-        self.wait_frame = 0        
-        
         with open('data/points', 'r') as _file:
             for line in _file.readlines():
                 point = map(float, line.strip().split(' '))
@@ -56,62 +59,56 @@ class HelixInDetector(Animation):
                 self.int_points.append(point)        
         
         with open('data/volumes', 'r') as _file:
-            for line in _file.readlines():
-                filename = line.strip()
-                poly = Polyhedron.from_OFF(filename)
-                self.add_object(poly, color=self.POLYHEDRON_COLOR, opacity=0.7)
+            filenames = [line.strip() for line in _file.readlines()]
+            
+        # Volumes are parsed in parallel.
+        for poly in Polyhedron.load_many(filenames):
+            self.add_object(poly, color=self.POLYHEDRON_COLOR, opacity=0.7)
                 
         trajectory = AnimatedPolyLine(list(self.points))
         self.add_object(trajectory, color=self.TRAJECTORY_COLOR)
         
-        self.update_camera(roll=self.INIT_ROLL,
-                           distance=self.INIT_DIST,
-                           elevation=self.INIT_ELEV,
-                           azimuth=self.INIT_AZIMUTH,
-                           focalpoint=self.INIT_FOCAL)        
+        # Boundary points are appended to a single point cloud as the
+        # particle reaches them.
+        self.boundary_points = PointCloud(size=5)
+        self.add_object(self.boundary_points, color=self.POINTS_COLOR)
+        
+        self.set_camera_path(self.build_camera_path())
+        
+    def build_camera_path(self):
+        # Zooms into the detector, turns around it while tilting the camera,
+        # zooms further, waits for a while and finally zooms out.
+        path = CameraPath(interpolation='linear')
+        
+        path.add_keyframe(frame=1,
+                          roll=self.INIT_ROLL,
+                          distance=self.INIT_DIST,
+                          elevation=self.INIT_ELEV,
+                          azimuth=self.INIT_AZIMUTH,
+                          focalpoint=self.INIT_FOCAL)
+        path.add_keyframe(frame=self.FIRST_ZOOM_END, distance=4000,
+                          azimuth=self.INIT_AZIMUTH)
+        path.add_keyframe(frame=self.ROTATION_END, distance=4000, azimuth=170,
+                          elevation=self.INIT_ELEV)
+        path.add_keyframe(frame=self.TILT_END, elevation=130)
+        path.add_keyframe(frame=self.SECOND_ZOOM_END, distance=300)
+        path.add_keyframe(frame=self.WAIT_END, distance=300,
+                          focalpoint=self.INIT_FOCAL)
+        path.add_keyframe(frame=self.LAST_FRAME, distance=15000,
+                          focalpoint=(-2180, 1180, 1180))
+        
+        return path
     
     def on_frame(self, frame_no):
         if self.points and self.int_points and self.distance(0,0) < 1e-2:
             int_point = self.int_points.pop(0)
-            point = Point(*int_point, thickness=5)
-            self.add_object(point, color=self.POINTS_COLOR)
+            self.boundary_points.add_point(int_point)
         if self.points:
             self.points.pop(0)
         
-        params = self.camera.parameters()
-        distance = params['distance']
-        azimuth = params['azimuth']
-        elevation = params['elevation']
-        x, y, z = params['focalpoint']
-        
-        if distance < 4000:
-            self.first_zoom_done = True
-        if self.first_zoom_done and azimuth > 170:
-            self.rotation_done = True
-        if self.rotation_done and distance < 300:
-            self.second_zoom_done = True
-        if self.second_zoom_done and\
-           self.wait_frame != 0 and\
-           frame_no - self.wait_frame > 60:
-            self.wait_done = True
-        if self.wait_done and distance >= 15000:
-            StopAnimation()
-        
-        if not self.first_zoom_done:
-            self.update_camera(distance=-100)
-        elif not self.rotation_done:
-            self.update_camera(azimuth=3)
-        elif not self.second_zoom_done:
-            if elevation < 130:
-                self.update_camera(distance=-20, elevation=2)
-            else:
-                self.update_camera(distance=-20)
-        elif not self.wait_done:
-            if self.wait_frame == 0:
-                self.wait_frame = frame_no
-        else:
-            self.update_camera(distance=250,
-                               focalpoint=(x-20, y+20, z+20))
+        # The camera follows its path (see build_camera_path).
+        if frame_no > self.LAST_FRAME:
+            raise StopAnimation()
         
     
 def run_animation():
@@ -1,32 +1,45 @@
 import sys
 sys.path.append('../')
 
+import numpy as np
+
 from mlab_tools.animation import Animation, StopAnimation
 from mlab_tools.geometry import GeometryParser
+from mlab_tools.group import ObjectGroup
 from mlab_tools.polyline import AnimatedPolyLine
+from mlab_tools.timeline import VolumeTimeline, read_trajectory, read_volumes
+from mlab_tools.transformations import rotation_matrix
 
 
 class SphereMeshAnimation(Animation):
     
     """This example shows how to use a VTK geometry file to render a 3D polyhedron mesh."""
     
+    # Simulated time elapsed on each frame.
+    TIME_PER_FRAME = 0.002
+    
     def initialize(self):
-        self.parse_volumes()
-        self.parse_trajectory()
-        volume_names = map(lambda (time, volume): volume, self.volumes)
-        
-        parser = GeometryParser.from_VTK('data/sphere_scaled.vtk')
+        parser = GeometryParser.from_VTK('data/sphere_scaled.vtk', merged=True)
         self.geometry = parser.parse()
-        self.polys = list()
+        self.mesh = self.geometry.get_mesh()
         
-        for name, polyhedron in self.geometry:
-            if name in volume_names:
-                self.polys.append(polyhedron)
-                self.add_object(polyhedron, opacity=0.1)
-                
-            elif name in self.boundary:
-                self.polys.append(polyhedron)
-                self.add_object(polyhedron, opacity=0.01)
+        # Only the boundary and the volumes traversed by the particle are
+        # visible.
+        _, volume_names = read_volumes('data/retQSS_volumes')
+        self.mesh.update_polyhedrons(self.mesh.ids, opacity=0)
+        for names, opacity in ((self.parse_boundary(), 0.01), (volume_names, 0.1)):
+            ids = self.geometry.lookup_many(names)
+            self.mesh.update_polyhedrons(ids[ids >= 0], opacity=opacity)
+        self.add_object(self.mesh)
+        
+        self.parse_trajectory()
+        
+        # The highlighted volumes are precomputed for every frame.
+        self.timeline = VolumeTimeline.from_retQSS('data/retQSS_volumes',
+                                                   self.geometry,
+                                                   self.TIME_PER_FRAME,
+                                                   start_time=self.times[0])
+        self.last_entry = -1
             
         self.update_camera(focalpoint=[0,0,0],
                            distance=3000,
@@ -34,71 +47,42 @@ class SphereMeshAnimation(Animation):
                            elevation=180,
                            roll=0)
             
-    def parse_volumes(self):
-        self.volumes = list()
-        self.boundary = list()
-        
-        with open('data/retQSS_volumes', 'r') as _file:
-            lines = _file.readlines()
-            for line in lines:
-                fields = line.split()
-                time = float(fields[0])
-                volume = fields[1]
-                self.volumes.append((time, volume))
-                
+        # The mesh and the trajectory rotate together, so they are animated
+        # as a single group.
+        self.rotation = rotation_matrix(0.1)
+        group = ObjectGroup([self.mesh, self.trajectory])
+        self.add_object_group(group, self.rotate_scene)
+            
+    def rotate_scene(self, group, frame_no):
+        return {'transform': np.linalg.matrix_power(self.rotation, frame_no)}
+            
+    def parse_boundary(self):
         with open('data/sphere_scaled_boundary', 'r') as _file:
-            lines = _file.readlines()
-            for line in lines:
-                self.boundary.append(line.strip())
-                
-        self.current_volume_idx = 0
-        self.last_polyhedron = None
+            return [line.strip() for line in _file.readlines()]
                 
     def parse_trajectory(self):
-        points = list()
-        self.times = list()
-        
-        with open('data/retQSS_trajectory', 'r') as _file:
-            lines = _file.readlines()
-            for line in lines:
-                time, x, y, z = map(float, line.split()[:-1])
-                points.append((x,y,z))
-                self.times.append(time)
+        self.times, points, _ = read_trajectory('data/retQSS_trajectory')
                 
-        self.trajectory = AnimatedPolyLine(points)
+        # The trajectory advances TIME_PER_FRAME units of simulated time per
+        # frame instead of one point per frame.
+        self.trajectory = AnimatedPolyLine(points,
+                                           times=self.times,
+                                           time_per_frame=self.TIME_PER_FRAME,
+                                           interpolate=True)
         self.add_object(self.trajectory, color=(0,0,1))                
             
     def on_frame(self, frame_no):
-        current_point_idx = self.trajectory.current_point()
-        time = self.times[current_point_idx]
-        
-        for poly in self.polys:
-            poly.transform(rotate=0.1)
-        self.trajectory.transform(rotate=0.1)
-        
         dist = self.get_camera().parameters()['distance']
         if dist > 791:
             self.update_camera(distance=-2)
         
-        volume_name = self.volumes[self.current_volume_idx][1]
-        if volume_name == 'World':
-            StopAnimation()
+        entry = self.timeline.seek(frame_no)
+        if entry != self.last_entry:
+            print 'Entering volume {}...'.format(self.timeline.current_name())
+            self.last_entry = entry
             
-        while time >= self.volumes[self.current_volume_idx][0]:
-            if self.last_polyhedron is not None:
-                self.last_polyhedron.update_properties(color=(0.5,0,0), opacity=0.05)
-                
-            volume_name = self.volumes[self.current_volume_idx][1]
-            print 'Entering volume {}...'.format(volume_name)
-            
-            if volume_name != 'World':
-                polyhedron = self.geometry.get_polyhedron(volume_name)
-                polyhedron.update_properties(color=(0.7,0,0), opacity=0.3)
-                self.last_polyhedron = polyhedron
-            else:
-                self.last_polyhedron = None
-            
-            self.current_volume_idx += 1
+        if self.timeline.current_name() == 'World':
+            StopAnimation()
         
 
 def run_animation():
@@ -108,4 +92,3 @@ def run_animation():
 
 if __name__ == '__main__':
     run_animation()
-
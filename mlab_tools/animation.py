@@ -1,18 +1,9 @@
-import glob
-import os
-import random
-import shutil
-
 from mayavi import mlab
 from tvtk.api import tvtk
 from tvtk.tools import visual
 
-try:
-    import cv2
-except ImportError:
-    cv2 = None
-
 from camera import Camera
+from video import BackgroundVideoWriter, VideoWriter
 
 
 class AnimationException(Exception):
@@ -58,19 +49,39 @@ class Animation(object):
     provided, a default animator that (typically) leaves the object still
     will be chosen. Also, a frame callback controlling the global behavior of
     the animation will be called frame after frame.
+    
+    Animations can also be rendered offscreen (e.g., on machines without a
+    display). In that case, frames are produced as fast as possible, with no
+    delay between them.
     """
 
-    def __init__(self, width, height, bgcolor=None):
-        figure = mlab.figure(size=(width, height), bgcolor=bgcolor)
-        visual.set_viewer(figure)
+    def __init__(self, width, height, bgcolor=None, offscreen=False):
+        if offscreen:
+            # Must be set before creating the figure.
+            mlab.options.offscreen = True
+        
+        self.offscreen = offscreen
+        self.figure = mlab.figure(size=(width, height), bgcolor=bgcolor)
+        visual.set_viewer(self.figure)
         
         self.width = width
         self.height = height
         
-        self.camera = Camera()
+        self.camera = Camera(scene=self.figure.scene)
+        self._camera_path = None
         
         self.frame_callbacks = [self.on_frame]
         self.obj_animations = dict()
+        self.group_animations = dict()
+        
+        # Objects currently in the scene and, for each actor, the number of
+        # these objects rendered through it (several objects may share an
+        # actor, e.g. views of a mesh).
+        self.scene_objects = set()
+        self.actor_refs = dict()
+        
+        # Objects in the scene with levels of detail (e.g., LODPolyLine).
+        self.lod_objects = set()
 
     def _add_actor(self, actor):
         viewer = visual.get_viewer()
@@ -81,14 +92,62 @@ class Animation(object):
         viewer = visual.get_viewer()
         viewer.scene.remove_actors(actor)
         
+    def _add_to_scene(self, obj):
+        # The renderer is only touched when the actor is not in the scene yet.
+        if obj in self.scene_objects:
+            return
+        self.scene_objects.add(obj)
+        if hasattr(obj, 'select_level'):
+            self.lod_objects.add(obj)
+        
+        actor = obj.get_actor()
+        refs = self.actor_refs.get(actor, 0)
+        if refs == 0:
+            self._add_actor(actor)
+        self.actor_refs[actor] = refs + 1
+        
+        obj._added_to_scene()
+        
+    def _remove_from_scene(self, obj):
+        # The renderer is only touched when no other object uses the actor.
+        if obj not in self.scene_objects:
+            return
+        self.scene_objects.remove(obj)
+        self.lod_objects.discard(obj)
+        
+        actor = obj.get_actor()
+        refs = self.actor_refs.pop(actor) - 1
+        if refs == 0:
+            self._remove_actor(actor)
+        else:
+            self.actor_refs[actor] = refs
+            
+        obj._removed_from_scene()
+        
     def get_camera(self):
         return self.camera
         
+    def set_camera_path(self, path):
+        """Moves the camera along a path (see camera.CameraPath) from now
+        on. On every frame, the camera is set to the state of the path at that
+        frame (before and after the path, the camera stays at its first and
+        last state, respectively). Passing None releases the camera.
+        
+        Arguments:
+        
+        :path: an instance of camera.CameraPath (or None).
+        """
+        self._camera_path = path
+        
+    def get_camera_path(self):
+        return self._camera_path
+        
     def update_camera(self, focalpoint=None, distance=None,
                       azimuth=None, elevation=None, roll=None):
         """Updates the animation camera.
         Parameters are additive (e.g., if distance=d is supplied, the camera
-        will have an increase of d in its distance after this call).
+        will have an increase of d in its distance after this call). The
+        camera is moved once per frame, right before rendering it.
         
         Keyword arguments:
         
@@ -145,14 +204,51 @@ class Animation(object):
         """        
         obj.update_properties(**props)
 
-        self._add_actor(obj.get_actor())
+        self._add_to_scene(obj)
 
         self.obj_animations[obj] = anim
 
+    def add_object_group(self, group, anim, **props):
+        """Adds a group of objects to the scene with a batch animator.
+        
+        Arguments:
+        
+        :group: an instance of group.ObjectGroup.
+        
+        :anim: the batch animator of the group. It should be a callable Python
+        object expecting two arguments: the group (which will be `group`) and
+        a frame number. It is called once per frame and can return None or
+        a dictionary with the keyword arguments of group.ObjectGroup.apply
+        (i.e., transform, colors and/or opacities as NumPy arrays). As with
+        animators, Stop and StopAndRemove can be raised.
+        
+        :props: keyword arguments specifying the properties of every object
+        in the group, such as color, opacity, etc. Objects keep their current
+        properties if none is given.
+        """
+        for obj in group.objects:
+            if props:
+                obj.update_properties(**props)
+            self._add_to_scene(obj)
+
+        self.group_animations[group] = anim
+
+    def remove_object_group(self, group):
+        """Removes a group of objects from the scene.
+        
+        Arguments:
+        
+        :group: an instance of group.ObjectGroup.
+        """
+        if group in self.group_animations:
+            del self.group_animations[group]
+        for obj in group.objects:
+            self.remove_object(obj)
+
     def add_static_object(self, obj, **props):
         obj.update_properties(**props)
 
-        self._add_actor(obj.get_actor())
+        self._add_to_scene(obj)
 
     def remove_object(self, obj):
         """Removes an object from the scene.
@@ -163,57 +259,108 @@ class Animation(object):
         """
         if obj in self.obj_animations:
             del self.obj_animations[obj]
-        self._remove_actor(obj.get_actor())
-        
-    def _get_image_resolution(self, tmp_dir, filename):
-        img = cv2.imread('%s/%s_1.png' % (tmp_dir, filename))
-        height, width, _ = img.shape
-        return height, width
-
-    def _assemble_video(self, directory, filename, tmp_dir, framerate):
-        # Compiles the saved PNG frames into a video using the OpenCV library.
-        # TODO: add support for OpenCV 3.0.
-        if cv2 is None:
-            raise RuntimeError('OpenCV not found! Video cannot be saved.')
-        
-        height, width = self._get_image_resolution(tmp_dir, filename)
-        video = cv2.VideoWriter('%s/%s.avi' % (directory, filename),
-                                cv2.cv.CV_FOURCC(*'XVID'),
-                                framerate,
-                                (width, height))
-
-        frames = glob.glob('%s/*.png' % tmp_dir)
-
-        for i in xrange(1, len(frames)+1):
-            frame_filename = '%s/%s_%d.png' % (tmp_dir, filename, i)
-            frame_img = cv2.imread(frame_filename)
-            
-            frame_height, frame_width, _ = frame_img.shape
-            if frame_height != height or frame_width != width:
-                msg = 'Frame %s has invalid resolution!' % frame_filename
-                raise RuntimeError(msg)
-            
-            video.write(frame_img)
+        self._remove_from_scene(obj)
+        
+    def _capture_frame(self):
+        # Grabs the pixels of the render window as an RGB array.
+        return mlab.screenshot(figure=self.figure, mode='rgb', antialiased=False)
+
+    def _render_frame(self, frame_no, video=None):
+        # Frame rendering method called during the animation loop. Rendering
+        # is disabled while animators and callbacks update the scene, which
+        # is then rendered once.
+        
+        scene = self.figure.scene
+        disable_render = scene.disable_render
+        scene.disable_render = True
+
+        try:
+            should_stop = self._update_frame(frame_no)
+            self._flush_updates()
+            self._update_camera(frame_no)
+            self._select_levels()
+        finally:
+            scene.disable_render = disable_render
+
+        scene.render()
+
+        if video is not None:
+            video.write(self._capture_frame())
+
+        if should_stop:
+            StopAnimation()
 
-        video.release()
+    def _initialize(self):
+        # Sets up the scene with rendering disabled, so that adding the
+        # initial objects does not trigger one render per object.
+        scene = self.figure.scene
+        scene.disable_render = True
+
+        try:
+            self.initialize()
+            self._flush_updates()
+            self._update_camera(1)
+            self._select_levels()
+        finally:
+            scene.disable_render = False
+
+        scene.render()
+
+    def _flush_updates(self):
+        # Object poses and properties changed by animators are pushed to
+        # their actors once per frame (imported here since the object module
+        # imports this one).
+        from object import flush_updates
+        flush_updates()
+
+    def _update_camera(self, frame_no):
+        # The camera path, if any, overrides the camera updates of the frame.
+        if self._camera_path is not None:
+            self.camera.follow(self._camera_path, frame_no)
+        else:
+            self.camera.flush()
+
+    def _select_levels(self):
+        # Lets objects with levels of detail adapt them to the current camera
+        # and viewport.
+        if not self.lod_objects:
+            return
+        
+        scene = self.figure.scene
+        camera = scene.camera
+        viewport_size = scene.get_size()
+        
+        for obj in self.lod_objects:
+            obj.select_level(camera, viewport_size)
 
-    def _render_frame(self, frame_no, frame_name):
-        # Frame rendering method called during the animation loop.
+    def _update_frame(self, frame_no):
+        # Calls animators and frame callbacks. Returns whether every one of
+        # them is stopped.
         
         should_stop = True
 
         for obj, anim in self.obj_animations.items():
-            actor = obj.get_actor()
-
             try:
                 anim(obj, frame_no)
             except (Stop, StopAndRemove) as action:
                 del self.obj_animations[obj]
                 if isinstance(action, StopAndRemove):
-                    self._remove_actor(actor)
+                    self._remove_from_scene(obj)
+            else:
+                should_stop = False
+
+        for group, anim in self.group_animations.items():
+            try:
+                state = anim(group, frame_no)
+            except (Stop, StopAndRemove) as action:
+                del self.group_animations[group]
+                if isinstance(action, StopAndRemove):
+                    for obj in group.objects:
+                        self._remove_from_scene(obj)
             else:
                 should_stop = False
-                self._add_actor(actor)
+                if state:
+                    group.apply(**state)
 
         for index, callback in enumerate(self.frame_callbacks):
             try:
@@ -223,13 +370,10 @@ class Animation(object):
             else:
                 should_stop = False
 
-        if frame_name:
-            mlab.savefig('%s_%d.png' % (frame_name, frame_no))
+        return should_stop
 
-        if should_stop:
-            StopAnimation()
-
-    def run(self, delay=30, save_to=None, framerate=30):
+    def run(self, delay=30, save_to=None, framerate=30,
+            background_encoding=False, queue_size=32, drop_frames=False):
         """Runs the animation.
         For each object in the scene, the associated animators are called in
         sequence with an increasing number that identifies the current frame.
@@ -239,43 +383,63 @@ class Animation(object):
         
         A video of the animation can be optionally saved. In order to use this
         functionality, the Python bindings for OpenCV have to be installed.
+        Frames are grabbed from the render window and encoded on the fly.
         
         Keyword arguments:
         
         :delay: time interval in milliseconds between calls to the frame
-        rendering loop (default: 30).
+        rendering loop (default: 30). Ignored by offscreen animations.
         
         :save_to: name to use for the video file of the animation (defaults to
         None, meaning that the video will not be saved).
         
         :framerate: framerate of the video (only valid is `save_to` is
         provided).
+        
+        :background_encoding: whether to encode the video in a worker thread
+        so that rendering and encoding overlap (defaults to False).
+        
+        :queue_size: maximum number of frames waiting to be encoded when
+        `background_encoding` is enabled (defaults to 32).
+        
+        :drop_frames: when `background_encoding` is enabled and the queue is
+        full, drop new frames instead of waiting for the encoder (defaults to
+        False). The number of dropped frames is reported at the end.
         """
 
-        frame_name = None
+        video = None
 
         if save_to is not None:
             try:
-                import cv2
-            except Exception:
+                video = VideoWriter('%s.avi' % save_to, framerate)
+            except RuntimeError:
                 print 'Python bindings for OpenCV needed to save animations!'
-                save_to = None
             else:
-                directory, filename = os.path.split(save_to)
-                if not directory:
-                    directory = '.'
-                tmp_dir = '%s/tmp_%d' % (directory, random.randint(1,10**6))
-                os.mkdir(tmp_dir)
+                if background_encoding:
+                    video = BackgroundVideoWriter(video,
+                                                  queue_size=queue_size,
+                                                  drop_frames=drop_frames)
+
+        self._initialize()
 
-                frame_name = '%s/%s' % (tmp_dir, filename)
+        try:
+            if self.offscreen:
+                self._run_offscreen(video)
+            else:
+                self._run_interactive(delay, video)
+        finally:
+            if video is not None:
+                video.close()
 
+    def _run_interactive(self, delay, video):
+        # Frames are rendered by the GUI event loop, one every `delay` ms.
         @mlab.animate(delay=delay, ui=False)
         def _run():
             frame_no = 1
 
             while True:
                 try:
-                    self._render_frame(frame_no, frame_name)
+                    self._render_frame(frame_no, video)
                 except StopAnimation:
                     mlab.close(all=True)
                     break
@@ -284,15 +448,78 @@ class Animation(object):
 
                 frame_no += 1
 
-        self.initialize()
         _ = _run()
         mlab.show()
 
-        if save_to is not None:
-            self._assemble_video(directory, filename,
-                                 tmp_dir,
-                                 framerate)
-            shutil.rmtree(tmp_dir)
+    def _run_offscreen(self, video):
+        # Frames are rendered in a tight loop, without any GUI timer.
+        frame_no = 1
+
+        while True:
+            try:
+                self._render_frame(frame_no, video)
+            except StopAnimation:
+                break
+
+            frame_no += 1
+
+        mlab.close(all=True)
+
+    def seek(self, frame_no):
+        """Brings the animation to the state it has right before rendering a
+        given frame.
+        By default, every previous frame is replayed (i.e., animators and frame
+        callbacks are called) without rendering it. Animations that can
+        compute their state directly from the frame number may override this
+        method.
+        
+        Arguments:
+        
+        :frame_no: number of the frame to move to.
+        """
+        scene = self.figure.scene
+        scene.disable_render = True
+        
+        try:
+            for previous_frame_no in xrange(1, frame_no):
+                self._render_frame(previous_frame_no)
+        finally:
+            scene.disable_render = False
+
+    def render_frames(self, first, last, save_to, framerate=30, codec='XVID'):
+        """Renders a range of frames into a video.
+        The animation is initialized and moved to the first frame of the range
+        (see `seek`). This is mostly meant for offscreen animations (see
+        parallel.render_parallel). Returns the number of rendered frames,
+        which can be lower than requested if the animation stops earlier.
+        
+        Arguments:
+        
+        :first: number of the first frame to render.
+        
+        :last: number of the last frame to render.
+        
+        :save_to: name to use for the video file (without extension).
+        
+        :framerate: framerate of the video (default: 30).
+        
+        :codec: FOURCC code of the video codec (default: XVID).
+        """
+        video = VideoWriter('%s.avi' % save_to, framerate, codec=codec)
+        
+        self._initialize()
+        
+        try:
+            self.seek(first)
+            for frame_no in xrange(first, last+1):
+                self._render_frame(frame_no, video)
+        except StopAnimation:
+            pass
+        finally:
+            video.close()
+            mlab.close(all=True)
+            
+        return video.num_frames
 
     def initialize(self):
         """Initialization method that is called before running the animation.
@@ -0,0 +1,142 @@
+import numpy as np
+
+
+def cell_offsets(cells, n_cells):
+    """Returns the position of every cell inside a packed connectivity array.
+
+    Packed arrays follow the layout of VTK legacy files (which is also the
+    layout of OFF faces): each cell is stored as its number of vertices
+    followed by the indices of these vertices.
+
+    Arguments:
+
+    :cells: 1D NumPy array of integers with the packed connectivity.
+
+    :n_cells: expected number of cells in `cells`.
+    """
+    cells = np.asarray(cells, dtype=np.int64)
+    size = len(cells)
+
+    if n_cells == 0:
+        return np.zeros(0, dtype=np.int64)
+    if size == 0:
+        raise Exception('Wrong cell format!')
+
+    # Fast path: every cell has the same number of vertices (e.g., a
+    # triangulated surface or a tetrahedral mesh).
+    first = int(cells[0])
+    if size == n_cells*(first+1) and (cells[::first+1] == first).all():
+        return np.arange(n_cells, dtype=np.int64) * (first+1)
+
+    # Otherwise, follow the chain of vertex counts by pointer doubling: `jump`
+    # maps every position to the one 2**k cells ahead, so the chain starting
+    # at 0 doubles its length on each step. Positions past the end of the
+    # array are sent to `size` (a proper end) or `size+1` (a malformed cell),
+    # which map to themselves.
+    jump = np.arange(1, size+1, dtype=np.int64) + cells
+    jump[(jump > size) | (cells < 0)] = size + 1
+    jump = np.append(jump, [size, size+1])
+
+    chain = np.zeros(1, dtype=np.int64)
+    while len(chain) <= n_cells:
+        chain = np.concatenate((chain, jump[chain]))
+        if len(chain) <= n_cells:
+            jump = jump[jump]
+
+    offsets = chain[:n_cells]
+    if chain[n_cells] != size or offsets[-1] >= size:
+        raise Exception('Wrong cell format!')
+
+    return offsets
+
+
+def pack_cells(cells):
+    """Packs a 2D array with one cell per row (all of them with the same
+    number of vertices) into a 1D connectivity array (see `cell_offsets`).
+    """
+    n_cells, size = cells.shape
+    packed = np.empty((n_cells, size+1), dtype=np.int64)
+    packed[:, 0] = size
+    packed[:, 1:] = cells
+    return packed.ravel()
+
+
+def concatenated_ranges(starts, lengths):
+    """Returns the concatenation of the integer ranges [starts[i],
+    starts[i] + lengths[i]) without looping over them in Python.
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    total = lengths.sum()
+    if total == 0:
+        return np.zeros(0, dtype=np.int64)
+    shifts = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return shifts + np.arange(total)
+
+
+def to_vtk_points(points):
+    """Builds a tvtk.Points instance from a NumPy array of shape (n, 3)."""
+    # tvtk is imported here so that the NumPy helpers of this module can be
+    # used (e.g., by the file readers) without it.
+    from tvtk.api import tvtk
+
+    vtk_points = tvtk.Points()
+    vtk_points.from_array(np.ascontiguousarray(points, dtype=np.float64))
+    return vtk_points
+
+
+def to_vtk_cells(cells, n_cells):
+    """Builds a tvtk.CellArray instance from a packed connectivity array (see
+    `cell_offsets`).
+    """
+    from tvtk.api import tvtk
+    from tvtk.array_handler import ID_TYPE_CODE
+
+    vtk_cells = tvtk.CellArray()
+    vtk_cells.set_cells(n_cells, np.ascontiguousarray(cells, dtype=ID_TYPE_CODE))
+    return vtk_cells
+
+
+class GrowableArray(object):
+
+    """NumPy array with amortized O(1) appends.
+
+    Rows are stored in a preallocated buffer whose capacity doubles whenever
+    it gets full. `view` returns the rows added so far without copying them.
+    """
+
+    def __init__(self, row_shape=(), dtype=np.float64, capacity=16):
+        self.row_shape = tuple(row_shape)
+        self.dtype = np.dtype(dtype)
+        self.data = np.empty((max(capacity, 1),) + self.row_shape, dtype=self.dtype)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def reserve(self, capacity):
+        """Makes room for `capacity` rows. Returns whether the buffer had to
+        be reallocated (which invalidates previous views)."""
+        if capacity <= len(self.data):
+            return False
+
+        data = np.empty((max(capacity, 2*len(self.data)),) + self.row_shape,
+                        dtype=self.dtype)
+        data[:self.size] = self.data[:self.size]
+        self.data = data
+
+        return True
+
+    def extend(self, rows):
+        """Appends several rows. Returns whether the buffer had to be
+        reallocated."""
+        rows = np.asarray(rows, dtype=self.dtype).reshape((-1,) + self.row_shape)
+        reallocated = self.reserve(self.size + len(rows))
+
+        self.data[self.size:self.size+len(rows)] = rows
+        self.size += len(rows)
+
+        return reallocated
+
+    def view(self):
+        return self.data[:self.size]
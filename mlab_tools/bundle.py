@@ -0,0 +1,283 @@
+import numpy as np
+
+from tvtk.api import tvtk
+from tvtk.array_handler import ID_TYPE_CODE
+
+from animation import Stop
+from arrays import concatenated_ranges
+from object import Object, PolyObject
+
+
+class TrajectoryBundle(PolyObject):
+
+    """Class that renders many polylines (e.g., the tracks of a particle
+    shower) as a single object.
+
+    Every track is a poly-line cell of the same vtkPolyData, so the whole
+    bundle needs one actor regardless of the number of tracks. Per-track
+    RGBA colors and IDs are stored as cell data.
+
+    Tracks can be progressively revealed, each one from its own initial frame
+    (see `default_animator`). Every cell keeps the size of its full track:
+    the slots of the points that are not visible yet point to an extra
+    "head" point of the track, which is placed on its last visible point.
+    Revealing points thus only rewrites the slots of the new points and
+    moves the heads. Tracks can also be hidden or removed without touching
+    the rest of the dataset.
+    """
+
+    def __init__(self, tracks, ids=None, initial_frames=1,
+                 color=(1,1,1), opacity=1):
+        """Builds a bundle of tracks.
+
+        Arguments:
+
+        :tracks: a list of arrays of shape (n_i, 3) (or lists of points of
+        the form (x, y, z)) with the points of each track.
+
+        :ids: IDs of the tracks (defaults to 0, 1, ..., len(tracks)-1).
+
+        :initial_frames: number of the frame on which each track starts to be
+        revealed by the default animator, either a single number or one
+        number per track (defaults to 1).
+
+        :color: initial color of every track (defaults to white).
+
+        :opacity: initial opacity of every track (defaults to 1).
+
+        Tracks are initially complete. The default animator hides the ones
+        that have not reached their initial frame yet.
+        """
+        PolyObject.__init__(self)
+
+        tracks = [np.asarray(track, dtype=np.float64).reshape((-1, 3))
+                  for track in tracks]
+        n_tracks = len(tracks)
+
+        self.lengths = np.array([len(track) for track in tracks], dtype=np.int64)
+        if (self.lengths == 0).any():
+            raise Exception('Tracks must have at least one point!')
+        self.starts = np.zeros(n_tracks, dtype=np.int64)
+        self.starts[1:] = np.cumsum(self.lengths)[:-1]
+        n_points = self.lengths.sum()
+
+        if ids is None:
+            ids = np.arange(n_tracks)
+        self.track_ids = np.asarray(ids)
+        if len(self.track_ids) != n_tracks:
+            raise Exception('An ID is needed for each track!')
+        # Sorted IDs and their positions, to look tracks up by ID.
+        self.id_order = np.argsort(self.track_ids, kind='mergesort')
+        self.sorted_ids = self.track_ids[self.id_order]
+
+        self.initial_frames = np.empty(n_tracks, dtype=np.int64)
+        self.initial_frames[:] = initial_frames
+
+        # Track points followed by the head point of each track.
+        self.points = np.empty((n_points + n_tracks, 3), dtype=np.float64)
+        if n_tracks > 0:
+            self.points[:n_points] = np.concatenate(tracks)
+        self.heads = n_points + np.arange(n_tracks)
+
+        # Packed connectivity: each cell is the length of the track followed
+        # by its slots.
+        self.cell_starts = self.starts + np.arange(n_tracks)
+        self.connectivity = np.empty(n_points + n_tracks, dtype=ID_TYPE_CODE)
+        self.connectivity[self.cell_starts] = self.lengths
+
+        self.visible = np.zeros(n_tracks, dtype=np.int64)
+        self.removed = np.zeros(n_tracks, dtype=bool)
+        self.hidden = np.zeros(n_tracks, dtype=bool)
+
+        self.colors = np.empty((n_tracks, 4), dtype=np.float64)
+        self.colors[:, :3] = color
+        self.colors[:, 3] = opacity
+        self.track_colors = np.empty((n_tracks, 4), dtype=np.uint8)
+
+        # Every track starts fully revealed.
+        self._set_visible(np.arange(n_tracks), self.lengths)
+        self._configure()
+        self._update_colors(np.arange(n_tracks))
+
+    def _configure(self):
+        # VTK wraps the connectivity and the points without copying them, and
+        # both are then updated in place (see `_update_poly_data`).
+        self.lines = tvtk.CellArray()
+        self.lines.set_cells(len(self.lengths), self.connectivity)
+        self.vtk_lines = self.lines.data
+        self.poly_data = tvtk.PolyData(points=self.points, lines=self.lines)
+        self.vtk_points = self.poly_data.points
+
+        self.poly_data.cell_data.scalars = self.track_colors
+        self.poly_data.cell_data.scalars.name = 'colors'
+        self.vtk_colors = self.poly_data.cell_data.scalars
+
+        ids = tvtk.IntArray()
+        ids.from_array(self.track_ids.astype(np.int32))
+        ids.name = 'track_id'
+        self.poly_data.cell_data.add_array(ids)
+
+        self._set_actor()
+        self.mapper.scalar_mode = 'use_cell_data'
+        self.mapper.color_mode = 'direct_scalars'
+        self.mapper.scalar_visibility = True
+
+    def _to_rgba(self, colors):
+        return np.clip(np.round(colors * 255), 0, 255).astype(np.uint8)
+
+    def _indices(self, ids):
+        ids = np.atleast_1d(ids)
+        positions = np.searchsorted(self.sorted_ids, ids)
+        positions = np.minimum(positions, len(self.sorted_ids)-1)
+        if (self.sorted_ids[positions] != ids).any():
+            raise Exception('Track ID not found in bundle!')
+        return self.id_order[positions]
+
+    def _set_visible(self, indices, counts):
+        # Shows the first counts[i] points of the track indices[i]. Only the
+        # slots between the previous and the new count are rewritten.
+        old = self.visible[indices]
+
+        revealed = counts > old
+        slots = concatenated_ranges(self.cell_starts[indices[revealed]] + 1 + old[revealed],
+                                    counts[revealed] - old[revealed])
+        points = concatenated_ranges(self.starts[indices[revealed]] + old[revealed],
+                                     counts[revealed] - old[revealed])
+        self.connectivity[slots] = points
+
+        concealed = counts < old
+        lengths = old[concealed] - counts[concealed]
+        slots = concatenated_ranges(self.cell_starts[indices[concealed]] + 1 + counts[concealed],
+                                    lengths)
+        self.connectivity[slots] = np.repeat(self.heads[indices[concealed]], lengths)
+
+        self.visible[indices] = counts
+        self.points[self.heads[indices]] = \
+            self.points[self.starts[indices] + np.maximum(counts, 1) - 1]
+
+    def _update_poly_data(self):
+        self.vtk_lines.modified()
+        self.lines.modified()
+        self.vtk_points.modified()
+        self.poly_data.modified()
+
+    def _update_colors(self, indices):
+        colors = self.colors[indices]
+        # Hidden tracks and tracks with no visible points are transparent.
+        colors[self.hidden[indices] | (self.visible[indices] == 0), 3] = 0
+        self.track_colors[indices] = self._to_rgba(colors)
+        self.vtk_colors.modified()
+
+    def num_tracks(self):
+        return len(self.lengths)
+
+    def has_track(self, tid):
+        index = np.searchsorted(self.sorted_ids, tid)
+        return index < len(self.sorted_ids) and self.sorted_ids[index] == tid
+
+    def set_visible_points(self, ids, counts):
+        """Shows the first points of a set of tracks.
+
+        Arguments:
+
+        :ids: a track ID or an array of IDs.
+
+        :counts: number of visible points, either a single number or one
+        number per track.
+        """
+        indices = self._indices(ids)
+        counts = np.broadcast_to(np.asarray(counts, dtype=np.int64), indices.shape)
+        counts = np.clip(counts, 0, self.lengths[indices])
+
+        appearing = indices[(self.visible[indices] == 0) | (counts == 0)]
+        self._set_visible(indices, counts)
+        self._update_poly_data()
+        if len(appearing) > 0:
+            self._update_colors(appearing)
+
+    def reveal(self, frame_no):
+        """Reveals one point per frame of every track that is not removed,
+        starting from its initial frame.
+        Returns whether every such track is completely revealed.
+
+        Arguments:
+
+        :frame_no: current frame number.
+        """
+        counts = np.clip(frame_no - self.initial_frames + 1, 0, self.lengths)
+        changed = np.flatnonzero((counts != self.visible) & ~self.removed)
+
+        if len(changed) > 0:
+            self.set_visible_points(self.track_ids[changed], counts[changed])
+
+        pending = (self.visible < self.lengths) & ~self.removed
+        return not pending.any()
+
+    def update_tracks(self, ids, color=None, opacity=None):
+        """Changes the color and/or opacity of a set of tracks with a single
+        update of the bundle.
+
+        Arguments:
+
+        :ids: a track ID or an array of IDs.
+
+        :color: a color (r, g, b) for every track or an array of shape
+        (len(ids), 3) with one color per track.
+
+        :opacity: a single opacity or an array with one opacity per track.
+        """
+        indices = self._indices(ids)
+
+        if color is not None:
+            self.colors[indices, :3] = color
+        if opacity is not None:
+            self.colors[indices, 3] = opacity
+
+        self._update_colors(indices)
+
+    def hide_tracks(self, ids):
+        """Hides a set of tracks (they can be shown again with
+        `show_tracks`)."""
+        indices = self._indices(ids)
+        self.hidden[indices] = True
+        self._update_colors(indices)
+
+    def show_tracks(self, ids):
+        """Shows a set of tracks previously hidden by `hide_tracks`."""
+        indices = self._indices(ids)
+        self.hidden[indices] = False
+        self._update_colors(indices)
+
+    def remove_tracks(self, ids):
+        """Removes a set of tracks from the bundle. Their cells collapse into
+        their first point and become transparent, and they are no longer
+        revealed by the default animator. The rest of the bundle is left
+        untouched.
+        """
+        indices = self._indices(ids)
+        self.removed[indices] = True
+        self._set_visible(indices, np.zeros(len(indices), dtype=np.int64))
+        self._update_poly_data()
+        self._update_colors(indices)
+
+    def update_properties(self, **props):
+        """Updates the bundle properties (see Object.update_properties).
+        Color and opacity are applied to every track of the bundle.
+        """
+        color = props.pop('color', None)
+        opacity = props.pop('opacity', None)
+
+        if color is not None or opacity is not None:
+            self.update_tracks(self.track_ids, color=color, opacity=opacity)
+
+        Object.update_properties(self, **props)
+
+    def default_animator(self):
+        """Returns an animator that reveals every track one point per frame
+        from its initial frame on (see `reveal`), and stops once every track
+        is completely revealed."""
+
+        def anim(obj, frame_no):
+            if self.reveal(frame_no): Stop()
+
+        return anim
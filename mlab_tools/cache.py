@@ -0,0 +1,209 @@
+import argparse
+import hashlib
+import os
+import tempfile
+import zipfile
+
+import numpy as np
+
+
+class GeometryCache(object):
+
+    """On-disk cache of parsed geometry files.
+
+    The arrays returned by a reader (e.g., readers.read_OFF) are stored in
+    an uncompressed .npz file, so that later runs load them instead of parsing
+    the source file again. Entries are keyed by the absolute path, the
+    modification time and the size of the source file: editing or replacing a
+    file makes its entry stale and it is parsed again on the next read.
+
+    The cache lives in the directory given by the MLAB_TOOLS_CACHE
+    environment variable or, if not set, in ~/.cache/mlab_tools. Setting
+    MLAB_TOOLS_CACHE to 'off' disables it.
+    """
+
+    # Bump whenever the output of a reader changes, so that old entries are
+    # ignored.
+    VERSION = 2
+
+    def __init__(self, directory=None):
+        """Builds a cache.
+
+        Arguments:
+
+        :directory: directory holding the cache files (defaults to the one
+        described above). None of them is created until something is cached.
+        """
+        if directory is None:
+            directory = os.environ.get('MLAB_TOOLS_CACHE')
+        if directory is None:
+            directory = os.path.join(os.path.expanduser('~'), '.cache',
+                                     'mlab_tools')
+
+        self.enabled = directory != 'off'
+        self.directory = directory
+
+    def _key(self, filename, kind):
+        stat = os.stat(filename)
+        key = '%d|%s|%s|%r|%d' % (self.VERSION, kind, os.path.abspath(filename),
+                                  stat.st_mtime, stat.st_size)
+        return hashlib.sha1(key).hexdigest()
+
+    def path(self, filename, kind):
+        """Returns the path of the cache file for a given source file.
+
+        Arguments:
+
+        :filename: path of the source file.
+
+        :kind: name of the reader (e.g., 'off' or 'vtk').
+        """
+        return os.path.join(self.directory,
+                            '%s-%s.npz' % (kind, self._key(filename, kind)))
+
+    def _load(self, path):
+        # Broken entries (e.g., truncated by a full disk) are removed, so that
+        # they get replaced.
+        try:
+            with np.load(path) as entry:
+                values = [entry['arr_%d' % i] for i in xrange(len(entry.files))]
+        except (IOError, ValueError, KeyError, EOFError, zipfile.BadZipfile):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        # Scalars were saved as 0-d arrays.
+        return tuple(value.item() if value.ndim == 0 else value
+                     for value in values)
+
+    def _save(self, path, values):
+        # Entries are written to a temporary file first, so that concurrent
+        # readers never see half-written entries. Failing to write is not an
+        # error: the values were already parsed.
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        except (IOError, OSError):
+            return
+
+        try:
+            with os.fdopen(fd, 'wb') as _file:
+                np.savez(_file, *values)
+            os.rename(temp_path, path)
+        except (IOError, OSError):
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def is_cached(self, filename, kind):
+        return self.enabled and os.path.exists(self.path(filename, kind))
+
+    def read(self, filename, kind, reader):
+        """Returns the arrays read from a file, either from the cache or by
+        calling `reader` (which then get cached).
+
+        Arguments:
+
+        :filename: path of the source file.
+
+        :kind: name of the reader (e.g., 'off' or 'vtk').
+
+        :reader: function that parses `filename` and returns a tuple of NumPy
+        arrays and/or numbers.
+        """
+        if not self.enabled:
+            return reader(filename)
+
+        path = self.path(filename, kind)
+        if os.path.exists(path):
+            values = self._load(path)
+            if values is not None:
+                return values
+
+        values = reader(filename)
+        self._save(path, values)
+
+        return values
+
+
+_cache = None
+
+
+def get_cache():
+    """Returns the default cache of readers.read_OFF and
+    readers.read_VTK."""
+    global _cache
+    if _cache is None:
+        _cache = GeometryCache()
+    return _cache
+
+
+def set_cache(cache):
+    """Replaces the default cache of readers.read_OFF and
+    readers.read_VTK (e.g., by GeometryCache('off') to disable
+    caching)."""
+    global _cache
+    _cache = cache
+
+
+def warm(directory, cache=None):
+    """Parses and caches every OFF and VTK file under a directory. Returns a
+    tuple (cached, up_to_date) with the number of files parsed and the
+    number of files whose entry was already up to date.
+
+    Arguments:
+
+    :directory: path of the directory.
+
+    :cache: the GeometryCache to fill (defaults to the one returned by
+    `get_cache`).
+    """
+    from readers import read_OFF, read_VTK
+
+    cache = cache or get_cache()
+    readers = {'.off': ('off', read_OFF), '.vtk': ('vtk', read_VTK)}
+    cached = up_to_date = 0
+
+    for root, _, filenames in os.walk(directory):
+        for filename in sorted(filenames):
+            extension = os.path.splitext(filename)[1].lower()
+            if extension not in readers:
+                continue
+            kind, reader = readers[extension]
+            path = os.path.join(root, filename)
+            if cache.is_cached(path, kind):
+                up_to_date += 1
+                continue
+            try:
+                reader(path, cache=cache)
+            except Exception as e:
+                print 'Skipping %s: %s' % (path, e)
+            else:
+                cached += 1
+
+    return cached, up_to_date
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Pre-warms the geometry cache with the OFF and VTK files '
+                    'found under the given directories.')
+    parser.add_argument('directories', nargs='+', metavar='directory')
+    parser.add_argument('--cache-dir', default=None,
+                        help='cache directory (defaults to $MLAB_TOOLS_CACHE '
+                             'or ~/.cache/mlab_tools)')
+    args = parser.parse_args()
+
+    cache = GeometryCache(args.cache_dir)
+    if not cache.enabled:
+        parser.error('the cache is disabled')
+
+    for directory in args.directories:
+        cached, up_to_date = warm(directory, cache)
+        print '%s: %d files cached, %d already up to date.' % (directory, cached,
+                                                               up_to_date)
+
+
+if __name__ == '__main__':
+    main()
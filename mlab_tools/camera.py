@@ -1,38 +1,70 @@
-from mayavi import mlab
+import numpy as np
 
 
 class Camera(object):
     
     """Class that wraps some of the mlab functions that manipulate the camera.
     A camera instance is automatically created by the animation.
+    
+    The camera holds its own state: updates are recorded and written
+    straight to the VTK camera by `flush`, once per frame and only if
+    something changed (animations call it before rendering each frame). The
+    state is only read back through mlab when the VTK camera was moved by
+    someone else, typically by the user interacting with the scene.
     """
     
     def __init__(self, focalpoint=None, distance=None,
-                 azimuth=None, elevation=None, roll=None):
+                 azimuth=None, elevation=None, roll=None, scene=None):
+        # mlab is imported here so that camera paths (which are pure NumPy)
+        # can be built without Mayavi.
+        from mayavi import mlab
+        
+        self.scene = scene or mlab.gcf().scene
         self.focalpoint = focalpoint or 'auto'
         self.distance = distance or 'auto'
         self.azimuth = azimuth or 0
         self.elevation = elevation or 0
         self.roll = roll or 0
-        self._set_view()
-        if self.distance == 'auto':
-            _, _, self.distance, self.focalpoint = mlab.view()
         
-    def _set_view(self):
-        # Sets current camera state into the animation.
+        # The initial view is set through mlab, which resolves automatic
+        # focal point and distance.
         mlab.view(azimuth=self.azimuth,
                   elevation=self.elevation,
                   distance=self.distance,
                   focalpoint=self.focalpoint,
                   roll=self.roll)
+        _, _, self.distance, self.focalpoint = mlab.view()
+        self.focalpoint = tuple(self.focalpoint)
+        
+        self.changed = False
+        self._save_view()
+        
+    def _get_view(self):
+        camera = self.scene.camera
+        return np.concatenate((camera.position, camera.focal_point,
+                               camera.view_up))
+        
+    def _save_view(self):
+        # View of the VTK camera as last written or read by this instance.
+        self.view = self._get_view()
+        
+    def _sync(self):
+        # Reads the state back if the VTK camera was moved elsewhere.
+        if np.allclose(self._get_view(), self.view, rtol=1e-9, atol=1e-12):
+            return
+        from mayavi import mlab
+        self.azimuth, self.elevation, self.distance, self.focalpoint = mlab.view()
+        self.focalpoint = tuple(self.focalpoint)
+        self.roll = mlab.roll()
+        self.changed = False
+        self._save_view()
         
     def parameters(self):
         """Get current camera parameters.
         Returns a dictionary associating each parameter name (i.e., `azimuth`,
         `focalpoint`, `distance`, `elevation` and `roll`) to its current value.
         """
-        self.azimuth, self.elevation, self.distance, self.focalpoint = mlab.view()
-        self.roll = mlab.roll()
+        self._sync()
 
         return {'focalpoint' : self.focalpoint,
                 'distance' : self.distance,
@@ -44,7 +76,8 @@ class Camera(object):
                azimuth=None, elevation=None, roll=None):
         """Updates the camera.
         Parameters are additive (e.g., if distance=d is supplied, the camera
-        will have an increase of d in its distance after this call).
+        will have an increase of d in its distance after this call). Changes
+        are written to the VTK camera by `flush`.
         
         Keyword arguments:
         
@@ -59,15 +92,278 @@ class Camera(object):
         subtended by the position vector and the z-axis.
         
         :focalpoint: an array of 3 floating point numbers representing the
-        focal point of the camera. 
+        focal point of the camera (it replaces the current one). 
         
         :roll: the rotation of the camera around its axis.
         
         See mlab documentation for further details.
         """        
-        self.focalpoint = focalpoint or self.focalpoint
+        self._sync()
+        
+        if focalpoint is not None:
+            self.focalpoint = tuple(focalpoint)
         self.distance = self.distance + (distance or 0)
         self.azimuth = self.azimuth + (azimuth or 0)
         self.elevation = self.elevation + (elevation or 0)
         self.roll = self.roll + (roll or 0)
-        self._set_view()
\ No newline at end of file
+        self.changed = True
+        
+    def _set_view(self, focalpoint, position, view_up, roll):
+        camera = self.scene.camera
+        camera.focal_point = focalpoint
+        camera.position = position
+        camera.view_up = view_up
+        camera.set_roll(roll)
+        self.scene.renderer.reset_camera_clipping_range()
+        self._save_view()
+        
+    def flush(self):
+        """Writes the camera state to the VTK camera if it changed since the
+        last call."""
+        if not self.changed:
+            return
+        
+        positions, view_ups = CameraPath.view_vectors(np.array([self.focalpoint]),
+                                                      np.array([self.distance]),
+                                                      np.array([self.azimuth]),
+                                                      np.array([self.elevation]))
+        self._set_view(self.focalpoint, positions[0], view_ups[0], self.roll)
+        self.changed = False
+        
+    def follow(self, path, frame_no):
+        """Moves the camera to the state of a CameraPath at a given frame,
+        using the precomputed vectors of the path."""
+        focalpoint, position, view_up, roll, params = path.state(frame_no)
+        
+        self._set_view(focalpoint, position, view_up, roll)
+        
+        self.focalpoint = params['focalpoint']
+        self.distance = params['distance']
+        self.azimuth = params['azimuth']
+        self.elevation = params['elevation']
+        self.roll = params['roll']
+        self.changed = False
+
+
+EASINGS = ('linear', 'ease_in', 'ease_out', 'ease_in_out')
+
+
+def _ease(s, easing):
+    # Maps the position inside a segment (from 0 to 1) to the interpolation
+    # parameter.
+    if easing == 'ease_in':
+        return s*s
+    if easing == 'ease_out':
+        return s*(2 - s)
+    if easing == 'ease_in_out':
+        return s*s*(3 - 2*s)
+    return s
+
+
+class CameraPath(object):
+    
+    """Camera movement declared by keyframes.
+    
+    Every camera parameter (focal point, distance, azimuth, elevation and
+    roll, as in Camera.update) has its own keyframes, placed at frame numbers
+    or at times, and it is interpolated between them either linearly or with
+    a Catmull-Rom spline. Each keyframe may also give an easing for the
+    segment ending at it. Parameters keep their first and last values
+    before their first and after their last keyframe, respectively.
+    
+    The whole path is precomputed into NumPy arrays the first time it is
+    used, so the camera of any frame is known right away: animations apply
+    it straight to the VTK camera (see Animation.set_camera_path and
+    Camera.follow), without going through mlab and regardless of the order
+    in which frames are rendered.
+    """
+    
+    PARAMETERS = ('focalpoint', 'distance', 'azimuth', 'elevation', 'roll')
+    
+    def __init__(self, interpolation='spline', time_per_frame=None,
+                 start_time=0, initial_frame=1):
+        """Builds an empty path.
+        
+        Keyword arguments:
+        
+        :interpolation: either 'spline' (Catmull-Rom, the default) or
+        'linear'.
+        
+        :time_per_frame: time elapsed between consecutive frames, needed to
+        place keyframes at times.
+        
+        :start_time: time of the initial frame (defaults to 0).
+        
+        :initial_frame: number of the frame at `start_time` (defaults to 1).
+        """
+        if interpolation not in ('spline', 'linear'):
+            raise Exception('Unknown interpolation {}!'.format(interpolation))
+        
+        self.interpolation = interpolation
+        self.time_per_frame = time_per_frame
+        self.start_time = start_time
+        self.initial_frame = initial_frame
+        
+        # Parameter -> list of (frame, value, easing).
+        self.keyframes = dict((name, list()) for name in self.PARAMETERS)
+        self.frames = None
+        
+    def add_keyframe(self, frame=None, time=None, easing='linear',
+                     focalpoint=None, distance=None,
+                     azimuth=None, elevation=None, roll=None):
+        """Adds a keyframe setting some of the camera parameters. Returns the
+        path, so that calls can be chained.
+        
+        Keyword arguments:
+        
+        :frame: frame number of the keyframe (it may be fractional).
+        
+        :time: time of the keyframe, used instead of `frame`.
+        
+        :easing: easing of the segments ending at this keyframe: 'linear'
+        (the default), 'ease_in', 'ease_out' or 'ease_in_out'.
+        
+        :focalpoint, distance, azimuth, elevation, roll: values of the
+        parameters at this keyframe (see Camera.update). Parameters not given
+        are not constrained by this keyframe. Angles are not wrapped, so
+        going from azimuth 350 to 370 is a 20 degrees turn.
+        """
+        if frame is None:
+            if time is None:
+                raise Exception('Either a frame or a time is needed!')
+            if not self.time_per_frame:
+                raise Exception('Keyframes at times need a time per frame!')
+            frame = self.initial_frame +\
+                    (time - self.start_time) / float(self.time_per_frame)
+        if easing not in EASINGS:
+            raise Exception('Unknown easing {}!'.format(easing))
+        
+        values = {'focalpoint' : focalpoint,
+                  'distance' : distance,
+                  'azimuth' : azimuth,
+                  'elevation' : elevation,
+                  'roll' : roll}
+        
+        for name, value in values.items():
+            if value is not None:
+                value = np.asarray(value, dtype=np.float64)
+                self.keyframes[name].append((float(frame), value, easing))
+                
+        self.frames = None
+        
+        return self
+        
+    @staticmethod
+    def view_vectors(focalpoints, distances, azimuths, elevations):
+        """Returns the camera positions and view up vectors of arrays of
+        camera parameters, following the convention of mlab.view."""
+        azimuths = np.radians(azimuths)
+        elevations = np.radians(elevations)
+        directions = np.column_stack((np.cos(azimuths)*np.sin(elevations),
+                                      np.sin(azimuths)*np.sin(elevations),
+                                      np.cos(elevations)))
+        positions = focalpoints + distances[:, None]*directions
+        
+        view_ups = np.zeros((len(directions), 3))
+        view_ups[:, 2] = np.where(np.sin(elevations) < 0, -1, 1)
+        view_ups -= (view_ups*directions).sum(axis=1)[:, None]*directions
+        norms = np.sqrt((view_ups**2).sum(axis=1))
+        view_ups[norms < 1e-12] = (0, 1, 0)
+        norms[norms < 1e-12] = 1
+        
+        return positions, view_ups / norms[:, None]
+        
+    def first_frame(self):
+        self._compute()
+        return self.frames[0]
+        
+    def last_frame(self):
+        self._compute()
+        return self.frames[-1]
+        
+    def _interpolate(self, keyframes, frames):
+        keyframes = sorted(keyframes, key=lambda keyframe: keyframe[0])
+        times = np.array([keyframe[0] for keyframe in keyframes])
+        values = np.array([keyframe[1] for keyframe in keyframes])
+        values = values.reshape((len(values), -1))
+        
+        if len(times) == 1:
+            return np.repeat(values, len(frames), axis=0)
+        
+        # Segment of every frame and position inside it, with easing.
+        segments = np.clip(np.searchsorted(times, frames, side='right') - 1,
+                           0, len(times) - 2)
+        lengths = times[segments+1] - times[segments]
+        s = np.clip((frames - times[segments]) / np.where(lengths > 0, lengths, 1),
+                    0, 1)
+        for easing in set(keyframe[2] for keyframe in keyframes[1:]):
+            ending = np.array([keyframe[2] == easing for keyframe in keyframes[1:]])
+            selected = ending[segments]
+            s[selected] = _ease(s[selected], easing)
+        s = s[:, None]
+        
+        start, end = values[segments], values[segments+1]
+        if self.interpolation == 'linear':
+            return start + s*(end - start)
+        
+        # Catmull-Rom tangents (one sided at both ends), computed for uneven
+        # keyframe spacing and evaluated as a cubic Hermite curve.
+        tangents = np.empty_like(values)
+        tangents[1:-1] = (values[2:] - values[:-2]) /\
+                         np.maximum(times[2:] - times[:-2], 1e-12)[:, None]
+        tangents[0] = (values[1] - values[0]) / max(times[1] - times[0], 1e-12)
+        tangents[-1] = (values[-1] - values[-2]) / max(times[-1] - times[-2], 1e-12)
+        
+        h = lengths[:, None]
+        s2, s3 = s*s, s*s*s
+        return (2*s3 - 3*s2 + 1)*start + (s3 - 2*s2 + s)*h*tangents[segments] +\
+               (-2*s3 + 3*s2)*end + (s3 - s2)*h*tangents[segments+1]
+        
+    def _compute(self):
+        if self.frames is not None:
+            return
+            
+        for name in self.PARAMETERS:
+            if not self.keyframes[name]:
+                raise Exception('No keyframe sets the {}!'.format(name))
+                
+        times = [keyframe[0] for name in self.PARAMETERS
+                 for keyframe in self.keyframes[name]]
+        frames = np.arange(int(np.floor(min(times))), int(np.ceil(max(times))) + 1)
+        
+        points = frames.astype(np.float64)
+        self.focalpoints = self._interpolate(self.keyframes['focalpoint'], points)
+        self.distances = self._interpolate(self.keyframes['distance'], points)[:, 0]
+        self.azimuths = self._interpolate(self.keyframes['azimuth'], points)[:, 0]
+        self.elevations = self._interpolate(self.keyframes['elevation'], points)[:, 0]
+        self.rolls = self._interpolate(self.keyframes['roll'], points)[:, 0]
+        
+        self.positions, self.view_ups = self.view_vectors(self.focalpoints,
+                                                          self.distances,
+                                                          self.azimuths,
+                                                          self.elevations)
+        
+        self.frames = frames
+        
+    def _index(self, frame_no):
+        self._compute()
+        return min(max(frame_no - self.frames[0], 0), len(self.frames) - 1)
+        
+    def state(self, frame_no):
+        """Returns the state of the camera at a given frame as a tuple
+        (focalpoint, position, view_up, roll, parameters), where the last
+        item is the dictionary returned by `parameters`."""
+        index = self._index(frame_no)
+        return (self.focalpoints[index], self.positions[index],
+                self.view_ups[index], self.rolls[index],
+                self.parameters(frame_no))
+        
+    def parameters(self, frame_no):
+        """Returns a dictionary with the camera parameters at a given frame
+        (as Camera.parameters does)."""
+        index = self._index(frame_no)
+        return {'focalpoint' : tuple(self.focalpoints[index]),
+                'distance' : self.distances[index],
+                'azimuth' : self.azimuths[index],
+                'elevation' : self.elevations[index],
+                'roll' : self.rolls[index]}
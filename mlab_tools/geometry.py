@@ -1,46 +1,164 @@
 from collections import OrderedDict
 
+import numpy as np
+
 
 class Geometry(object):
 
+    """Set of named polyhedrons, each one with a unique ID.
+    
+    Polyhedrons can be registered one by one (see `add_named_polyhedron`) or
+    taken from a cell source (see `set_source`), which builds them on demand
+    the first time they are accessed.
+    """
+    
     def __init__(self):
         self.polys_by_id = OrderedDict()
         self.polys_by_name = dict()
+        self.ids_by_name = dict()
+        self.names_by_id = dict()
+        self.mesh = None
+        self.source = None
+        self.num_built = 0
         
     def add_named_polyhedron(self, poly, name, pid):
         if name in self.polys_by_name:
             raise Exception('Polyhedron {} already registered!'.format(name))
-        if pid in self.polys_by_id:
+        if pid in self.polys_by_id or\
+           (self.source is not None and self.source.has_id(pid)):
             raise Exception('Polyhedron ID {} already exists!'.format(pid))
-        
+            
         self.polys_by_name[name] = poly
         self.polys_by_id[pid] = poly
+        self.ids_by_name[name] = pid
+        self.names_by_id[pid] = name
+        
+    def set_source(self, source):
+        """Sets the source of the polyhedrons that are built lazily.
+        
+        Arguments:
+        
+        :source: an object holding the raw cells of a geometry (such as
+        vtk_parser.CellSource). It should provide `ids`, `has_id`,
+        `lookup` (from name to ID), `name` and `build` (from ID to
+        polyhedron) methods and support `len`.
+        """
+        self.source = source
+        
+    def set_mesh(self, mesh):
+        self.mesh = mesh
+        
+    def get_mesh(self):
+        """Returns the PolyhedronMesh holding every polyhedron when the
+        geometry was parsed in merged mode (None otherwise)."""
+        return self.mesh
+        
+    def _build(self, pid):
+        # Names of polyhedrons taken from the source are not stored (the
+        # source indexes them).
+        poly = self.source.build(pid)
+        self.polys_by_id[pid] = poly
+        self.num_built += 1
+        return poly
         
     def get_polyhedron(self, name):
-        return self.polys_by_name.get(name)
-    
+        poly = self.polys_by_name.get(name)
+        if poly is None and self.source is not None:
+            pid = self.source.lookup(name)
+            if pid is not None:
+                poly = self.get_polyhedron_by_ID(pid)
+        return poly
+        
     def get_polyhedron_by_ID(self, pid):
-        return self.polys_by_id.get(pid)
+        poly = self.polys_by_id.get(pid)
+        if poly is None and self.source is not None and self.source.has_id(pid):
+            poly = self._build(pid)
+        return poly
+        
+    def lookup_many(self, names):
+        """Returns an array with the ID of the polyhedron of each given name
+        (-1 for unknown names). No polyhedron is built.
+        
+        Arguments:
+        
+        :names: a list of polyhedron names.
+        """
+        ids = np.empty(len(names), dtype=np.int64)
+        ids[:] = -1
+        
+        if self.source is not None:
+            ids[:] = self.source.lookup_many(names)
+            
+        if self.ids_by_name:
+            for position, name in enumerate(names):
+                if ids[position] < 0 and name in self.ids_by_name:
+                    ids[position] = self.ids_by_name[name]
+                
+        return ids
     
-    def num_polyhedrons(self):
-        return len(self.polys_by_id)
+    def locate(self, points):
+        """Returns an array with the ID of the polyhedron containing each
+        given point (-1 for points outside every polyhedron). Only tetras and
+        voxels of parsed geometries are taken into account (points inside
+        cells of other types are reported as outside), and a spatial index
+        over them is built on the first call. Points on a face shared by
+        several cells get the one with the lowest index in the file.
+        
+        Arguments:
+        
+        :points: array of shape (n, 3) with the query points.
+        """
+        if self.source is None:
+            raise Exception('Points can only be located in parsed geometries!')
+        return self.source.locate(points)
     
+    def get_name(self, pid):
+        """Returns the name of the polyhedron with the given ID (or None)."""
+        if pid in self.names_by_id:
+            return self.names_by_id[pid]
+        if self.source is not None and self.source.has_id(pid):
+            return self.source.name(pid)
+        return None
+        
+    def num_polyhedrons(self):
+        num_polyhedrons = len(self.polys_by_id)
+        if self.source is not None:
+            num_polyhedrons += len(self.source) - self.num_built
+        return num_polyhedrons
+        
     def __iter__(self):
-        return self.polys_by_id.iteritems()
+        # Iterating builds every pending polyhedron.
+        for pid, poly in self.polys_by_id.items():
+            if self.source is None or not self.source.has_id(pid):
+                yield pid, poly
+                
+        if self.source is not None:
+            for pid in self.source.ids():
+                yield pid, self.get_polyhedron_by_ID(pid)
     
     
 class GeometryParser(object):
-    
+
     @classmethod
-    def from_VTK(cls, filename):
+    def from_VTK(cls, filename, merged=False):
+        """Returns a parser for the given VTK file.
+        
+        Arguments:
+        
+        :filename: path to a VTK legacy file with an unstructured grid.
+        
+        :merged: if True, every cell is rendered as part of a single
+        PolyhedronMesh (one actor for the whole grid) and the polyhedrons of
+        the resulting geometry are lightweight views over it (see
+        mesh.PolyhedronView). Defaults to False (one Polyhedron per cell).
+        """
         from vtk_parser import VTKParser
-        return VTKParser(filename)
-    
-    def __init__(self, filename):
+        return VTKParser(filename, merged=merged)
+        
+    def __init__(self, filename, merged=False):
         self.filename = filename
+        self.merged = merged
         self.current_id = 1
-    
+        
     def parse(self):
         raise NotImplementedError
-    
-    
@@ -0,0 +1,130 @@
+import numpy as np
+
+from tvtk.api import tvtk
+
+from mesh import PolyhedronView
+
+
+class ObjectGroup(object):
+
+    """Set of objects animated together by a batch animator.
+
+    Instead of being called once per object, a batch animator is called once
+    per frame with the whole group and returns the state of the group for
+    that frame as NumPy arrays (see `apply`). The group applies them in bulk:
+    every object shares a group transformation, and the colors and opacities
+    of polyhedron views (see mesh.PolyhedronView) are set with a single
+    update of their mesh.
+    """
+
+    def __init__(self, objects):
+        """Builds a group.
+
+        Arguments:
+
+        :objects: a list of instances of object.Object.
+        """
+        self.objects = list(objects)
+        self.transform = tvtk.Transform()
+        # Transformation shared by the objects as long as they are all given
+        # the same matrix (see `apply`), and their own transformations and
+        # matrices otherwise.
+        self.object_transform = tvtk.Transform()
+        self.object_transforms = None
+        self.object_matrices = None
+
+        # Polyhedron views are grouped by mesh, keeping their positions in
+        # the group and their IDs.
+        self.views = dict()
+        self.others = list()
+
+        for position, obj in enumerate(self.objects):
+            if isinstance(obj, PolyhedronView):
+                positions, ids = self.views.setdefault(obj.mesh, (list(), list()))
+                positions.append(position)
+                ids.append(obj.pid)
+            else:
+                self.others.append(position)
+                obj._join_group(self.transform, self.object_transform)
+
+        for mesh, (positions, ids) in self.views.items():
+            self.views[mesh] = np.array(positions), np.array(ids)
+
+    def __len__(self):
+        return len(self.objects)
+
+    def _set_object_transforms(self, matrices):
+        matrices = matrices[self.others]
+        if len(matrices) == 0:
+            return
+
+        if self.object_transforms is None:
+            if (matrices == matrices[0]).all():
+                # Every object is given the same matrix, so the shared
+                # transformation is enough.
+                self.object_transform.set_matrix(matrices[0].ravel().tolist())
+                return
+
+            # Per-object transformations are only created when first needed.
+            self.object_transform.identity()
+            self.object_transforms = list()
+            for position in self.others:
+                transform = tvtk.Transform()
+                self.objects[position]._join_group(transform)
+                self.object_transforms.append(transform)
+            self.object_matrices = np.empty_like(matrices)
+            self.object_matrices[:] = np.identity(4)
+
+        # Only the transformations whose matrix changed are updated.
+        changed = np.flatnonzero((matrices != self.object_matrices)
+                                 .reshape((len(matrices), 16)).any(axis=1))
+        for index in changed:
+            self.object_transforms[index].set_matrix(matrices[index].ravel().tolist())
+        self.object_matrices[changed] = matrices[changed]
+
+    def apply(self, transform=None, colors=None, opacities=None):
+        """Sets the state of the group.
+
+        Keyword arguments:
+
+        :transform: either a 4x4 matrix, which will transform the whole group,
+        or an array of shape (n, 4, 4) with one matrix per object. As long as
+        every object is given the same matrix, they share a single
+        transformation; otherwise, every object whose matrix changed requires
+        one update. Polyhedron views cannot be transformed.
+
+        :colors: a color (r, g, b) for every object or an array of shape
+        (n, 3) with one color per object.
+
+        :opacities: a single opacity or an array with one opacity per object.
+        """
+        n = len(self.objects)
+
+        if transform is not None:
+            transform = np.asarray(transform, dtype=np.float64)
+            if transform.shape == (4, 4):
+                self.transform.set_matrix(transform.ravel().tolist())
+            else:
+                self._set_object_transforms(transform.reshape((n, 4, 4)))
+
+        if colors is None and opacities is None:
+            return
+
+        if colors is not None:
+            colors = np.broadcast_to(np.asarray(colors, dtype=np.float64), (n, 3))
+        if opacities is not None:
+            opacities = np.broadcast_to(np.asarray(opacities, dtype=np.float64), (n,))
+
+        for mesh, (positions, ids) in self.views.items():
+            mesh.update_polyhedrons(
+                ids,
+                color=colors[positions] if colors is not None else None,
+                opacity=opacities[positions] if opacities is not None else None)
+
+        for position in self.others:
+            props = dict()
+            if colors is not None:
+                props['color'] = tuple(colors[position])
+            if opacities is not None:
+                props['opacity'] = opacities[position]
+            self.objects[position].update_properties(**props)
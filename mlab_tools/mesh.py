@@ -0,0 +1,238 @@
+import numpy as np
+
+from tvtk.api import tvtk
+
+from arrays import to_vtk_cells, to_vtk_points
+from object import Object, PolyObject
+
+
+class PolyhedronMesh(PolyObject):
+
+    """Class that renders a set of polyhedrons as a single object.
+
+    Every face of every polyhedron is stored in the same vtkPolyData, so the
+    whole set needs one actor (and one draw call) per frame. A cell data array
+    maps each face to the ID of its polyhedron, and per-face RGBA colors allow
+    changing the color and opacity of each polyhedron individually (see
+    `update_polyhedrons` and `PolyhedronView`).
+
+    When the mesh is added to an animation, every polyhedron is drawn. When
+    only views of it are, just the polyhedrons of these views are drawn
+    (the faces of the others are made transparent).
+    """
+
+    def __init__(self, points, faces, n_faces, face_ids,
+                 color=(1,1,1), opacity=1):
+        """Builds a mesh from NumPy arrays.
+
+        Arguments:
+
+        :points: array of shape (n, 3) with the vertex coordinates.
+
+        :faces: 1D array of integers with the packed face connectivity, i.e.,
+        the number of vertices of each face followed by their indices.
+
+        :n_faces: number of faces in `faces`.
+
+        :face_ids: array with the ID of the polyhedron of each face.
+
+        :color: initial color of every polyhedron (defaults to white).
+
+        :opacity: initial opacity of every polyhedron (defaults to 1).
+        """
+        PolyObject.__init__(self)
+
+        face_ids = np.asarray(face_ids)
+        self.ids, self.face_index = np.unique(face_ids, return_inverse=True)
+
+        # Faces grouped by polyhedron, so that the faces of a single
+        # polyhedron can be sliced out without scanning the whole mesh.
+        self.face_order = np.argsort(self.face_index, kind='mergesort')
+        self.face_starts = np.searchsorted(self.face_index[self.face_order],
+                                           np.arange(len(self.ids)+1))
+
+        self.colors = np.empty((len(self.ids), 4), dtype=np.float64)
+        self.colors[:, :3] = color
+        self.colors[:, 3] = opacity
+
+        self.face_colors = np.empty((n_faces, 4), dtype=np.uint8)
+        self.face_colors[:] = self._to_rgba(self.colors[self.face_index])
+
+        # Whether the mesh itself is in the scene, and number of views of each
+        # polyhedron in the scene.
+        self.in_scene = False
+        self.view_refs = np.zeros(len(self.ids), dtype=np.int64)
+        self.num_view_refs = 0
+
+        self.points = to_vtk_points(points)
+        self.faces = to_vtk_cells(faces, n_faces)
+        self.face_ids = face_ids
+        self._configure()
+
+    def _configure(self):
+        self.poly_data = tvtk.PolyData(points=self.points, polys=self.faces)
+
+        self.poly_data.cell_data.scalars = self.face_colors
+        self.poly_data.cell_data.scalars.name = 'colors'
+        self.vtk_colors = self.poly_data.cell_data.scalars
+
+        ids = tvtk.IntArray()
+        ids.from_array(self.face_ids.astype(np.int32))
+        ids.name = 'polyhedron_id'
+        self.poly_data.cell_data.add_array(ids)
+
+        self._set_actor()
+        self.mapper.scalar_mode = 'use_cell_data'
+        self.mapper.color_mode = 'direct_scalars'
+        self.mapper.scalar_visibility = True
+
+    def _to_rgba(self, colors):
+        return np.clip(np.round(colors * 255), 0, 255).astype(np.uint8)
+
+    def _indices(self, ids):
+        ids = np.atleast_1d(ids)
+        indices = np.searchsorted(self.ids, ids)
+        indices = np.minimum(indices, len(self.ids)-1)
+        if (self.ids[indices] != ids).any():
+            raise Exception('Polyhedron ID not found in mesh!')
+        return indices
+
+    def _faces_of(self, indices):
+        if len(indices) == 1:
+            start, end = self.face_starts[indices[0]:indices[0]+2]
+            return self.face_order[start:end]
+        selected = np.zeros(len(self.ids), dtype=bool)
+        selected[indices] = True
+        return np.flatnonzero(selected[self.face_index])
+
+    def has_polyhedron(self, pid):
+        index = np.searchsorted(self.ids, pid)
+        return index < len(self.ids) and self.ids[index] == pid
+
+    def update_polyhedrons(self, ids, color=None, opacity=None):
+        """Changes the color and/or opacity of a set of polyhedrons with a
+        single update of the mesh.
+
+        Arguments:
+
+        :ids: a polyhedron ID or an array of IDs.
+
+        :color: a color (r, g, b) for every polyhedron or an array of shape
+        (len(ids), 3) with one color per polyhedron.
+
+        :opacity: a single opacity or an array with one opacity per
+        polyhedron.
+        """
+        indices = self._indices(ids)
+
+        if color is not None:
+            self.colors[indices, :3] = color
+        if opacity is not None:
+            self.colors[indices, 3] = opacity
+
+        self._update_faces(indices)
+
+    def _draws_all(self):
+        return self.in_scene or self.num_view_refs == 0
+
+    def _update_faces(self, indices=None):
+        # Refreshes the face colors of the given polyhedrons (all of them by
+        # default), hiding those not drawn.
+        if indices is None:
+            faces = slice(None)
+            face_index = self.face_index
+        else:
+            faces = self._faces_of(indices)
+            face_index = self.face_index[faces]
+
+        colors = self._to_rgba(self.colors[face_index])
+        if not self._draws_all():
+            colors[self.view_refs[face_index] == 0, 3] = 0
+
+        self.face_colors[faces] = colors
+        self.vtk_colors.modified()
+
+    def _set_drawn(self, in_scene=None, view_index=None, count=0):
+        # Updates what is drawn, refreshing every face only when switching
+        # between drawing the whole mesh and drawing some views.
+        draws_all = self._draws_all()
+
+        if in_scene is not None:
+            self.in_scene = in_scene
+        if view_index is not None:
+            self.view_refs[view_index] += count
+            self.num_view_refs += count
+
+        if draws_all != self._draws_all():
+            self._update_faces()
+        elif view_index is not None and not draws_all:
+            self._update_faces(np.array([view_index]))
+
+    def _added_to_scene(self):
+        self._set_drawn(in_scene=True)
+
+    def _removed_from_scene(self):
+        self._set_drawn(in_scene=False)
+
+    def update_properties(self, **props):
+        """Updates the mesh properties (see Object.update_properties). Color
+        and opacity are applied to every polyhedron of the mesh.
+        """
+        color = props.pop('color', None)
+        opacity = props.pop('opacity', None)
+
+        if color is not None or opacity is not None:
+            self.update_polyhedrons(self.ids, color=color, opacity=opacity)
+
+        Object.update_properties(self, **props)
+
+    def get_view(self, pid):
+        """Returns a `PolyhedronView` of the polyhedron with the given ID."""
+        if not self.has_polyhedron(pid):
+            raise Exception('Polyhedron ID not found in mesh!')
+        return PolyhedronView(self, pid)
+
+
+class PolyhedronView(Object):
+
+    """Lightweight handle on a single polyhedron of a `PolyhedronMesh`.
+
+    Views can be used wherever polyhedrons are expected, but only their color
+    and opacity can be changed. Their actor is the (shared) actor of the
+    mesh, which only draws the polyhedrons whose views are in the scene
+    (unless the mesh itself is added too).
+    """
+
+    def __init__(self, mesh, pid):
+        Object.__init__(self)
+        self.mesh = mesh
+        self.pid = pid
+        self.index = mesh._indices(pid)[0]
+
+    def _added_to_scene(self):
+        self.mesh._set_drawn(view_index=self.index, count=1)
+
+    def _removed_from_scene(self):
+        self.mesh._set_drawn(view_index=self.index, count=-1)
+
+    def get_actor(self):
+        return self.mesh.get_actor()
+
+    def update_properties(self, **props):
+        """Updates the color and/or opacity of this polyhedron."""
+        color = props.pop('color', None)
+        opacity = props.pop('opacity', None)
+
+        if props:
+            msg = 'Only color and opacity can be set on polyhedron views!'
+            raise Exception(msg)
+
+        self.mesh.update_polyhedrons(self.pid, color=color, opacity=opacity)
+
+    def transform(self, translate=None, scale=None, rotate=None):
+        msg = 'Polyhedron views cannot be transformed (transform the mesh instead)!'
+        raise Exception(msg)
+
+    def set_pose(self, matrix=None, translate=None, scale=None, rotate=None):
+        msg = 'Polyhedron views cannot be transformed (transform the mesh instead)!'
+        raise Exception(msg)
@@ -1,12 +1,116 @@
+import numpy as np
+
 from tvtk.api import tvtk
 
 from animation import Stop
+from transformations import rotation_matrix, scaling_matrix, translation_matrix
+
+
+class PropertyPool(object):
+
+    """Pool of tvtk.Property instances shared by objects with the same look.
+
+    Properties are keyed by the values set on them, and every object holds
+    the key of the property of its actor. An object changing its properties
+    switches to the pooled property with the new values if there is one.
+    Otherwise, the property it holds is updated in place when no other
+    object shares it, or copied before updating it when shared (i.e., copy
+    on write).
+    """
+
+    def __init__(self):
+        # Key -> [property, number of objects holding it].
+        self.entries = dict()
+
+    def _key(self, values):
+        key = list()
+        for name, value in values.items():
+            if isinstance(value, (list, tuple, np.ndarray)):
+                value = tuple(value)
+            key.append((name, value))
+        return tuple(sorted(key))
+
+    def acquire(self, values, key=None, changes=None):
+        """Returns the key and the property for the given values.
+
+        Arguments:
+
+        :values: every value set on the property.
+
+        Keyword arguments:
+
+        :key: key of the property currently held by the caller (if any),
+        which is released.
+
+        :changes: values changed with respect to those of `key`.
+        """
+        new_key = self._key(values)
+        if new_key == key:
+            return key, self.entries[key][0]
+
+        entry = self.entries.get(new_key)
+
+        if entry is None and key is not None and self.entries[key][1] == 1:
+            # Nobody else holds the current property: it is updated in place
+            # and moved to its new key.
+            entry = self.entries.pop(key)
+            entry[0].set(**changes)
+            self.entries[new_key] = entry
+            return new_key, entry[0]
+
+        if entry is None:
+            entry = self.entries[new_key] = [tvtk.Property(**values), 0]
+
+        entry[1] += 1
+        self.release(key)
+
+        return new_key, entry[0]
+
+    def release(self, key):
+        if key is None:
+            return
+        entry = self.entries[key]
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self.entries[key]
+
+
+properties = PropertyPool()
+
+
+# Objects with a pending pose or property change (see flush_updates).
+_dirty_objects = set()
+
+
+def flush_updates():
+    """Pushes the pending poses and properties of every object to its actor.
+    Animations call this once per frame, so it is only needed when objects
+    are rendered outside of an animation."""
+    while _dirty_objects:
+        _dirty_objects.pop()._flush()
 
 
 class Object(object):
     
     """Base class for objects that can be placed into the scene."""
 
+    def __init__(self):
+        # Pose of the object (a 4x4 matrix updated by `transform` and
+        # `set_pose`) and the transformation holding it once pushed,
+        # transformations of the groups this object belongs to (see
+        # group.ObjectGroup) and an optional offset transformation placing
+        # the geometry of the object (see primitive.Primitive).
+        self._pose = None
+        self._pose_changed = False
+        self._transform = None
+        self._group_transforms = list()
+        self._offset = None
+        # Values set on the actor property, its key in the property pool
+        # and the changes not flushed yet.
+        self._properties = dict()
+        self._property_key = None
+        self._pending_properties = dict()
+
     def _set_actor(self):
         self.actor = tvtk.Actor(mapper=self.mapper)
         self.actor.mapper.update()
@@ -18,41 +122,136 @@ class Object(object):
         """Returns the default animator, which leaves the object still."""
         return lambda obj, frame_no: Stop()
 
+    def _added_to_scene(self):
+        # Called by the animation right after adding the object to the scene.
+        pass
+
+    def _removed_from_scene(self):
+        # Called by the animation right after removing the object from the
+        # scene.
+        pass
+
     def update_properties(self, **props):
         """Updates the object properties, such as opacity, color, etc. (see VTK
-        documentation for further details)."""
-        properties = tvtk.Property(**props)
-        self.actor.property = properties
+        documentation for further details). Properties not given keep their
+        values.
+        
+        Changes are applied when the frame is rendered (see flush_updates),
+        and only the values that actually changed are set. Objects with the
+        same properties share a single tvtk.Property (see PropertyPool).
+        """
+        self._pending_properties.update(props)
+        _dirty_objects.add(self)
+
+    def _flush_properties(self):
+        changes = dict()
+        for name, value in self._pending_properties.items():
+            current = self._properties.get(name)
+            if current is None or np.any(np.asarray(current) != np.asarray(value)):
+                changes[name] = value
+        self._pending_properties.clear()
+
+        if not changes:
+            return
 
-    def _to_tuple(self, value):
-        if isinstance(value, (list, tuple)):
-            return value[:3]
-        elif isinstance(value, (int, float)):
-            return value, value, value
+        values = dict(self._properties)
+        values.update(changes)
+        key, prop = properties.acquire(values, key=self._property_key,
+                                       changes=changes)
+
+        self._properties = values
+        self._property_key = key
+        if self.actor.property is not prop:
+            self.actor.property = prop
 
     def transform(self, translate=None, scale=None, rotate=None):
         """Applies an affine transformation to the current object.
         
         Keyword arguments are self explanatory. They can be a tuple or list
         representing the three-dimensional vector or a single number to use
-        for each of the three components.
+        for each of the three components. The transformation is composed with
+        the current pose (see `set_pose`) as a translation, a scaling and
+        then rotations around the x, y and z axes.
         """
-        transform = self.actor.user_transform or tvtk.Transform()
+        pose = self._pose if self._pose is not None else np.identity(4)
+        self._set_pose(np.dot(pose, self._pose_matrix(translate, scale, rotate)))
 
-        if translate is not None:
-            transform.translate(self._to_tuple(translate))
+    def set_pose(self, matrix=None, translate=None, scale=None, rotate=None):
+        """Sets the pose of the object, replacing any previous
+        transformation.
+        
+        Keyword arguments:
+        
+        :matrix: a 4x4 matrix with the whole pose.
+        
+        :translate, scale, rotate: used instead of `matrix`, they build the
+        pose as `transform` does starting from the identity.
+        """
+        if matrix is None:
+            matrix = self._pose_matrix(translate, scale, rotate)
+        self._set_pose(np.array(matrix, dtype=np.float64).reshape((4, 4)))
 
-        if scale is not None:
-            transform.scale(self._to_tuple(scale))
+    def get_pose(self):
+        """Returns the 4x4 matrix with the pose of the object."""
+        if self._pose is None:
+            return np.identity(4)
+        return self._pose.copy()
 
+    def _pose_matrix(self, translate, scale, rotate):
+        matrix = np.identity(4)
+        if translate is not None:
+            matrix = np.dot(matrix, translation_matrix(translate))
+        if scale is not None:
+            matrix = np.dot(matrix, scaling_matrix(scale))
         if rotate is not None:
-            rotate = self._to_tuple(rotate)
-            transform.rotate_x(rotate[0])
-            transform.rotate_y(rotate[1])
-            transform.rotate_z(rotate[2])
-        
+            matrix = np.dot(matrix, rotation_matrix(rotate))
+        return matrix
+
+    def _set_pose(self, matrix):
+        # The actor is only updated when the pose is flushed, at most once per
+        # frame however many times the pose changes.
+        self._pose = matrix
+        self._pose_changed = True
+        _dirty_objects.add(self)
+
+    def _flush(self):
+        if self._pending_properties:
+            self._flush_properties()
+        if self._pose_changed:
+            self._flush_pose()
+
+    def _flush_pose(self):
+        if self._transform is None:
+            self._transform = tvtk.Transform()
+            self._set_user_transform()
+        self._transform.set_matrix(self._pose.ravel().tolist())
+        self._pose_changed = False
+
+    def _set_user_transform(self):
+        # The actor is transformed by the offset, the object's own
+        # transformation and then the group transformations. These are
+        # concatenated once, so that later changes of any of them do not
+        # require updating the actor.
+        transforms = list(self._group_transforms)
+        for transform in (self._transform, self._offset):
+            if transform is not None:
+                transforms.append(transform)
+
+        if len(transforms) <= 1:
+            if transforms:
+                self.actor.user_transform = transforms[0]
+            return
+
+        transform = tvtk.Transform()
+        for other in transforms:
+            transform.concatenate(other)
+
         self.actor.user_transform = transform
 
+    def _join_group(self, *transforms):
+        self._group_transforms.extend(transforms)
+        self._set_user_transform()
+
 
 class PolyObject(Object):
     
@@ -0,0 +1,91 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+from video import concatenate_videos
+
+
+def _render_chunk(task):
+    # Runs in a worker process, which builds its own offscreen animation.
+    animation_class, args, kwargs, first, last, save_to, framerate, codec = task
+    animation = animation_class(*args, offscreen=True, **kwargs)
+    return animation.render_frames(first, last, save_to,
+                                   framerate=framerate,
+                                   codec=codec)
+
+
+def render_parallel(animation_class, num_frames, save_to, workers=None,
+                    framerate=30, args=(), kwargs=None, chunk_codec='MJPG'):
+    """Renders an animation into a video using several processes.
+    
+    Frames 1..`num_frames` are split into contiguous chunks, one per worker.
+    Every worker creates its own offscreen instance of the animation, moves it
+    to the first frame of its chunk (see Animation.seek) and renders the
+    chunk into a temporary video. Chunks are then concatenated into the final
+    video. The state of the animation must therefore depend only on the frame
+    number (e.g., random generators should be seeded).
+    
+    Note that the default Animation.seek replays every frame before the
+    chunk (without rendering it), so the total work of the workers grows
+    with the number of frames times the number of workers. Speedups are only
+    significant when rendering dominates the cost of a frame, or when the
+    animation overrides `seek` to compute its state from the frame number
+    directly (e.g., with a camera.CameraPath instead of a state machine in
+    `on_frame`). Also, since offscreen rendering must be enabled before the
+    figure is created, the constructor of the animation class must accept
+    the `offscreen` keyword argument and pass it to Animation.__init__.
+    
+    Returns the number of frames of the video.
+    
+    Arguments:
+    
+    :animation_class: the Animation subclass to render. It is instantiated
+    as animation_class(*args, offscreen=True, **kwargs).
+    
+    :num_frames: number of frames to render.
+    
+    :save_to: name to use for the video file of the animation.
+    
+    :workers: number of worker processes (defaults to the number of CPUs).
+    
+    :framerate: framerate of the video (default: 30).
+    
+    :args: positional arguments for the animation constructor.
+    
+    :kwargs: keyword arguments for the animation constructor.
+    
+    :chunk_codec: FOURCC code used for the temporary videos (defaults to
+    MJPG, which is quick to decode).
+    """
+    workers = workers or multiprocessing.cpu_count()
+    workers = max(1, min(workers, num_frames))
+    kwargs = kwargs or dict()
+    
+    directory = os.path.dirname(save_to) or '.'
+    tmp_dir = tempfile.mkdtemp(dir=directory)
+    
+    tasks = list()
+    chunk_size = (num_frames + workers - 1) // workers
+    for first in xrange(1, num_frames+1, chunk_size):
+        last = min(first + chunk_size - 1, num_frames)
+        chunk_name = os.path.join(tmp_dir, 'chunk_%d' % first)
+        tasks.append((animation_class, args, kwargs, first, last,
+                      chunk_name, framerate, chunk_codec))
+        
+    # Every task gets a fresh process, as figures cannot be reused.
+    pool = multiprocessing.Pool(workers, maxtasksperchild=1)
+    
+    try:
+        frames = pool.map(_render_chunk, tasks)
+        pool.close()
+        pool.join()
+        
+        chunks = ['%s.avi' % task[5]
+                  for task, num_chunk_frames in zip(tasks, frames)
+                  if num_chunk_frames > 0]
+        
+        return concatenate_videos(chunks, '%s.avi' % save_to, framerate)
+    finally:
+        pool.terminate()
+        shutil.rmtree(tmp_dir)
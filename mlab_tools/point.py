@@ -1,6 +1,171 @@
+import numpy as np
+
+from tvtk.api import tvtk
+from tvtk.common import configure_input_data, configure_source_data
+
+from arrays import GrowableArray
+from object import PolyObject
 from primitive import Sphere
 
 
 def Point(x, y, z, thickness=1e-2):
     """Sphere wrapper to represent points."""
-    return Sphere(center=(x,y,z), radius=thickness)
\ No newline at end of file
+    return Sphere(center=(x,y,z), radius=thickness)
+
+
+class PointCloud(PolyObject):
+    
+    """Class that represents a (possibly large) set of points.
+    
+    Unlike Point, which builds a full sphere per point, every point of the
+    cloud is stored in a single vtkPolyData and drawn as a sphere glyph by a
+    single actor (the glyphs are instanced by a vtkGlyph3DMapper). Points can
+    have individual sizes and colors, and they can be appended at any time
+    (e.g., during the animation).
+    
+    VTK arrays wrap whole preallocated buffers, and a mask array tells the
+    mapper which of their rows hold points. Appending points therefore only
+    marks the arrays as modified, except when the buffers get reallocated.
+    """
+    
+    def __init__(self, points=(), size=1e-2, colors=None, resolution=8):
+        """Builds a point cloud.
+        
+        Arguments:
+        
+        :points: a list or array of points of the form (x, y, z) (defaults to
+        an empty cloud).
+        
+        :size: radius of the points, either a single number or one number per
+        point (defaults to 1e-2).
+        
+        :colors: optional list or array with a color (r, g, b) per point. If
+        not given, points use the color of the object properties.
+        
+        :resolution: resolution of the sphere glyph (defaults to 8).
+        """
+        PolyObject.__init__(self)
+        self.size = size
+        self.resolution = resolution
+        self.has_colors = colors is not None
+        
+        self.coordinates = GrowableArray((3,), np.float64)
+        self.sizes = GrowableArray((), np.float64)
+        self.colors = GrowableArray((3,), np.uint8)
+        self.mask = GrowableArray((), np.uint8)
+        
+        self._configure()
+        self._wrap_buffers()
+        self.add_points(points, size=size, colors=colors)
+        
+    def _configure(self):
+        self.poly_data = tvtk.PolyData()
+        
+        self.glyph = tvtk.SphereSource(radius=1,
+                                       theta_resolution=self.resolution,
+                                       phi_resolution=self.resolution)
+        self.glyph.update()
+        
+        self.mapper = tvtk.Glyph3DMapper(scaling=True,
+                                         scale_mode='scale_by_magnitude',
+                                         scale_factor=1)
+        configure_input_data(self.mapper, self.poly_data)
+        configure_source_data(self.mapper, self.glyph.output)
+        self.mapper.set_scale_array('sizes')
+        self.mapper.masking = True
+        self.mapper.set_mask_array('mask')
+        
+        if self.has_colors:
+            self.mapper.scalar_visibility = True
+            self.mapper.scalar_mode = 'use_point_field_data'
+            self.mapper.color_mode = 'direct_scalars'
+            self.mapper.select_color_array('colors')
+        else:
+            self.mapper.scalar_visibility = False
+            
+        self.actor = tvtk.Actor(mapper=self.mapper)
+        
+    def _wrap_buffers(self):
+        # VTK arrays wrap the buffers without copying them, so they are only
+        # rebuilt when the buffers are reallocated. Unused rows are masked
+        # out, and they repeat the first point so as not to alter the bounds
+        # of the cloud.
+        n = len(self.coordinates)
+        self.coordinates.data[n:] = self.coordinates.data[0] if n > 0 else 0
+        self.sizes.data[n:] = 0
+        self.colors.data[n:] = 0
+        self.mask.data[n:] = 0
+        
+        self.poly_data.points = self.coordinates.data
+        
+        arrays = [('sizes', tvtk.DoubleArray(), self.sizes),
+                  ('mask', tvtk.UnsignedCharArray(), self.mask)]
+        if self.has_colors:
+            arrays.append(('colors', tvtk.UnsignedCharArray(), self.colors))
+            
+        for name, array, values in arrays:
+            array.from_array(values.data)
+            array.name = name
+            self.poly_data.point_data.add_array(array)
+        
+        self.poly_data.modified()
+        
+    def _update_poly_data(self, reallocated):
+        if reallocated:
+            self._wrap_buffers()
+            return
+        
+        self.poly_data.points.modified()
+        for name in ('sizes', 'mask', 'colors'):
+            array = self.poly_data.point_data.get_array(name)
+            if array is not None:
+                array.modified()
+        self.poly_data.modified()
+        
+    def num_points(self):
+        return len(self.coordinates)
+    
+    def get_points(self):
+        """Returns an array of shape (n, 3) with the points of the cloud."""
+        return self.coordinates.view()
+        
+    def add_points(self, points, size=None, colors=None):
+        """Appends points to the cloud.
+        
+        Arguments:
+        
+        :points: a list or array of points of the form (x, y, z).
+        
+        :size: radius of the new points, either a single number or one number
+        per point (defaults to the size given to the constructor).
+        
+        :colors: color (r, g, b) of the new points or one color per point
+        (defaults to white). Ignored if the cloud has no colors.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape((-1, 3))
+        n = len(points)
+        
+        if size is None:
+            size = self.size
+        if colors is None:
+            colors = (1,1,1)
+        
+        # Every buffer grows in the same way, so they are reallocated at once.
+        empty = len(self.coordinates) == 0
+        reallocated = self.coordinates.extend(points)
+        self.sizes.extend(np.broadcast_to(np.asarray(size, dtype=np.float64), (n,)))
+        self.mask.extend(np.ones(n, dtype=np.uint8))
+        
+        if self.has_colors:
+            colors = np.broadcast_to(np.asarray(colors, dtype=np.float64), (n, 3))
+            self.colors.extend(np.round(np.clip(colors, 0, 1) * 255))
+            
+        if empty and n > 0 and not reallocated:
+            # Unused rows were set to the origin while the cloud was empty.
+            self.coordinates.data[n:] = points[0]
+            
+        self._update_poly_data(reallocated)
+        
+    def add_point(self, point, size=None, color=None):
+        """Appends a single point (see add_points)."""
+        self.add_points([point], size=size, colors=color)
@@ -1,7 +1,12 @@
+import numpy as np
+
 from tvtk.api import tvtk
+from tvtk.array_handler import ID_TYPE_CODE
 
 from animation import Stop
+from arrays import GrowableArray
 from object import PolyObject
+from point import PointCloud
 from primitive import Sphere
 
 
@@ -16,10 +21,12 @@ class PolyLine(PolyObject):
         
         Arguments:
         
-        :points: a list of points of the form (x, y, z) or objects returned by
-        the Point function.
+        :points: a list of points of the form (x, y, z), objects returned by
+        the Point function or a PointCloud.
         """
         PolyObject.__init__(self)
+        if isinstance(points, PointCloud):
+            points = points.get_points().copy()
         self.points = points
         self._configure(points)
 
@@ -29,25 +36,58 @@ class PolyLine(PolyObject):
         return point
 
     def _configure(self, points):
-        self.vtk_points = tvtk.Points()
-        self.lines = tvtk.CellArray()
+        self.coordinates = GrowableArray((3,), np.float64, capacity=len(points))
+        if not isinstance(points, np.ndarray):
+            points = [self._to_float_tuple(point) for point in points]
+        self.coordinates.extend(points)
+        self.num_visible = len(self.coordinates)
 
-        for point in points:
-            self.vtk_points.insert_next_point(self._to_float_tuple(point))
-         
-        for i in xrange(len(points)-1):
-            line = tvtk.Line()
-            line.point_ids.set_id(0, i)
-            line.point_ids.set_id(1, i+1)
-            self.lines.insert_next_cell(line)
-         
-        self.poly_data = tvtk.PolyData(points=self.vtk_points, lines=self.lines)
+        self.lines = tvtk.CellArray()
+        self.poly_data = tvtk.PolyData(lines=self.lines)
+        self._wrap_buffers()
+        self._update_poly_data()
 
         self._set_actor()
+
+    def _wrap_buffers(self):
+        # Points are kept in a preallocated buffer and the line is a single
+        # poly-line cell whose connectivity, [n, 0, 1, ..., n-1], is a prefix
+        # of a preallocated buffer too. VTK wraps both whole buffers without
+        # copying them, so they are only wrapped again when the points get
+        # reallocated. Unused points are not referenced by the cell.
+        self.connectivity = np.arange(-1, len(self.coordinates.data),
+                                      dtype=ID_TYPE_CODE)
+        self.poly_data.points = self.coordinates.data
+        self.lines.set_cells(1, self.connectivity)
+
+    def _update_poly_data(self):
+        # Only the vertex count of the cell and the size of the wrapped
+        # connectivity array change. The buffer is only wrapped again after
+        # hiding every point, as VTK drops the buffer of an empty array.
+        n = self.num_visible
+        self.connectivity[0] = n
+        if n == 0:
+            self.lines.set_cells(0, self.connectivity[:0])
+        else:
+            if self.lines.number_of_cells == 0:
+                self.lines.set_cells(1, self.connectivity)
+            self.lines.data.number_of_tuples = n+1
+
+        self.lines.data.modified()
+        self.lines.modified()
+        self.poly_data.points.modified()
+        self.poly_data.modified()
         
     def num_points(self):
         return len(self.points)
 
+    def _set_visible_points(self, n):
+        # Shows the first n points of the polyline.
+        n = max(0, min(n, len(self.coordinates)))
+        if n != self.num_visible:
+            self.num_visible = n
+            self._update_poly_data()
+
     def add_point(self, point):
         """Adds a point to the polyline.
         
@@ -56,18 +96,10 @@ class PolyLine(PolyObject):
         :point: a point of the form (x, y, z) or an object returned by the
         Point function. 
         """
-        idx = len(self.vtk_points) - 1
-
-        self.vtk_points.insert_next_point(self._to_float_tuple(point))
-        
-        line = tvtk.Line()
-        line.point_ids.set_id(0, idx)
-        line.point_ids.set_id(1, idx+1)
-        self.lines.insert_next_cell(line)
-
-        self.poly_data.update_traits()
-        self.poly_data.modified()
-        self.actor.mapper.update()
+        if self.coordinates.extend([self._to_float_tuple(point)]):
+            self._wrap_buffers()
+        self.num_visible = len(self.coordinates)
+        self._update_poly_data()
 
 
 class AnimatedPolyLine(PolyLine):
@@ -76,37 +108,286 @@ class AnimatedPolyLine(PolyLine):
     
     Points in the this polyline will be progressively added frame after frame.
     This is achieved by a custom animator provided by the `default_animator`
-    method.
+    method. Every point is loaded upfront, so revealing points only changes
+    the number of visible points.
     """
 
-    def __init__(self, points, initial_frame=1):
+    def __init__(self, points, initial_frame=1, times=None,
+                 time_per_frame=None, interpolate=False):
         """Build an animated polyline from a given list of points.
         
+        By default, one point is revealed per frame. If `time_per_frame` is
+        given, the polyline is driven by time instead: every frame advances
+        the simulated time by `time_per_frame` and reveals every point whose
+        timestamp has been reached (as a single update).
+        
         Arguments:
         
-        :points: a list of points of the form (x, y, z) or objects returned by
-        the Point function.
+        :points: a list of points of the form (x, y, z), objects returned by
+        the Point function or a PointCloud.
         
         :initial_frame: number of the first frame on which this polyline
         appears on scene (defaults to 1).
+        
+        :times: timestamps of the points, in non-decreasing order (only
+        needed if `time_per_frame` is given).
+        
+        :time_per_frame: simulated time elapsed between consecutive frames
+        (defaults to None, i.e., one point per frame).
+        
+        :interpolate: in time-driven mode, whether to extend the polyline up
+        to the position of the particle at the current time, interpolating
+        linearly between the last revealed point and the next one (defaults
+        to False).
         """        
+        if time_per_frame is not None:
+            if times is None or len(times) != len(points):
+                raise Exception('A timestamp is needed for each point!')
+            times = np.asarray(times, dtype=np.float64)
+            if (np.diff(times) < 0).any():
+                raise Exception('Timestamps must be in non-decreasing order!')
+            
+        self.times = times
+        self.time_per_frame = time_per_frame
+        self.interpolate = interpolate
+        # Position and original value of the buffer slot currently holding
+        # the interpolated head of the polyline (if any).
+        self.head = None
+        
         PolyLine.__init__(self, points)
         self.initial_frame = initial_frame
         self.current_point_idx = 0
 
     def _configure(self, points):
-        PolyLine._configure(self, self.points[:1])
+        PolyLine._configure(self, points)
+        self._set_visible_points(1)
+
+    def _restore_head(self):
+        if self.head is not None:
+            index, point = self.head
+            self.coordinates.data[index] = point
+            self.head = None
+            # Force the next update, as the buffer has changed.
+            self.num_visible = None
+
+    def _reveal_until(self, time):
+        # Shows every point whose timestamp is not greater than `time`.
+        self._restore_head()
+        
+        n = max(1, np.searchsorted(self.times, time, side='right'))
+        self.current_point_idx = n - 1
+        
+        if not self.interpolate or n >= len(self.times):
+            self._set_visible_points(n)
+            return
+        
+        data = self.coordinates.data
+        t0, t1 = self.times[n-1], self.times[n]
+        alpha = min(1, max(0, (time - t0) / (t1 - t0))) if t1 > t0 else 1
+        
+        self.head = n, data[n].copy()
+        data[n] = (1 - alpha)*data[n-1] + alpha*data[n]
+        
+        self.num_visible = n + 1
+        self._update_poly_data()
 
     def default_animator(self):
+        if self.time_per_frame is not None:
+            return self._time_animator()
 
         def anim(obj, abs_frame_no):
             # Compute frame number relative to the starting point of this line.
             frame_no = abs_frame_no - self.initial_frame
             if frame_no >= len(self.points): Stop()
-            self.add_point(self.points[frame_no])
-            self.current_point_idx = frame_no
+            self._set_visible_points(frame_no+1)
+            self.current_point_idx = max(frame_no, 0)
 
         return anim
     
+    def _time_animator(self):
+        
+        def anim(obj, abs_frame_no):
+            # Nothing is revealed before the starting point of this line.
+            frame_no = abs_frame_no - self.initial_frame
+            if frame_no < 0: return
+            time = self.times[0] + frame_no*self.time_per_frame
+            if self.current_point_idx == len(self.points) - 1: Stop()
+            self._reveal_until(time)
+            
+        return anim
+    
     def current_point(self):
         return self.current_point_idx
+
+
+class LODPolyLine(PolyLine):
+    
+    """A polyline with several levels of detail (see PolyLine class for
+    further details).
+    
+    Simplified versions of the polyline are computed upfront by clustering
+    consecutive points that fall into the same cell of a uniform grid. The
+    grid spacing doubles from one level to the next, so that the number of
+    points roughly halves and the error (i.e., the maximum distance between
+    a discarded point and the simplified line) is bounded on every level.
+    Before rendering each frame, the animation picks the coarsest level whose
+    error still fits in `pixel_tolerance` pixels, taking into account the
+    distance to the camera and the size of the viewport (see `select_level`).
+    
+    Every point stays loaded in VTK: changing the level of detail only
+    replaces the connectivity of the line with a precomputed one.
+    """
+    
+    def __init__(self, points, pixel_tolerance=1, min_points=2):
+        """Build a polyline with levels of detail from a given list of points.
+        
+        Arguments:
+        
+        :points: a list of points of the form (x, y, z), objects returned by
+        the Point function or a PointCloud.
+        
+        :pixel_tolerance: maximum error (in pixels) allowed on screen when
+        choosing the level of detail (defaults to 1).
+        
+        :min_points: minimum number of points of the coarsest level (defaults
+        to 2).
+        """
+        self.pixel_tolerance = pixel_tolerance
+        self.min_points = max(2, min_points)
+        self.levels = None
+        self.level = 0
+        
+        PolyLine.__init__(self, points)
+        
+    def _cluster(self, indices, spacing):
+        # Keeps the first point of every run of consecutive points lying in
+        # the same grid cell (and the last point of the line).
+        cells = np.floor(self.coordinates.data[indices] / spacing).astype(np.int64)
+        keep = np.empty(len(indices), dtype=bool)
+        keep[0] = keep[-1] = True
+        keep[1:-1] = (cells[1:-1] != cells[:-2]).any(axis=1)
+        return indices[keep]
+    
+    def _connectivity(self, indices):
+        connectivity = np.empty(len(indices)+1, dtype=ID_TYPE_CODE)
+        connectivity[0] = len(indices)
+        connectivity[1:] = indices
+        return connectivity
+        
+    def _build_levels(self):
+        # Each level is a pair (error, connectivity), sorted by error.
+        points = self.coordinates.view()
+        indices = np.arange(len(points))
+        self.levels = [(0., self._connectivity(indices))]
+        
+        if len(points) > 0:
+            self.bounds = points.min(axis=0), points.max(axis=0)
+        else:
+            self.bounds = np.zeros(3), np.zeros(3)
+        
+        lengths = np.sqrt(((points[1:] - points[:-1])**2).sum(axis=1))
+        lengths = lengths[lengths > 0]
+        if len(points) <= self.min_points or len(lengths) == 0:
+            return
+        
+        diagonal = np.sqrt(((self.bounds[1] - self.bounds[0])**2).sum())
+        spacing = 2*np.median(lengths)
+        error = 0.
+        
+        while len(indices) > self.min_points and spacing <= 2*diagonal:
+            # Clustering a level that was already simplified adds up the
+            # errors of both levels.
+            simplified = self._cluster(indices, spacing)
+            error += np.sqrt(3)*spacing
+            spacing *= 2
+            
+            # Levels that barely reduce the number of points are not kept.
+            if len(simplified) <= 0.75*len(self.levels[-1][1]):
+                self.levels.append((error, self._connectivity(simplified)))
+            indices = simplified
+        
+    def _update_poly_data(self):
+        if self.levels is None:
+            self._build_levels()
+            self.level = min(self.level, len(self.levels)-1)
+            self.poly_data.points.modified()
+        
+        # Levels are precomputed, so VTK just wraps the connectivity of the
+        # current one.
+        connectivity = self.levels[self.level][1]
+        if len(connectivity) > 1:
+            self.lines.set_cells(1, connectivity)
+        else:
+            self.lines.set_cells(0, connectivity[:0])
+        self.poly_data.modified()
+        
+    def num_levels(self):
+        return len(self.levels)
+    
+    def num_rendered_points(self):
+        """Returns the number of points of the current level of detail."""
+        return len(self.levels[self.level][1]) - 1
+    
+    def set_level(self, level):
+        """Renders a given level of detail (0 being the original polyline).
+        
+        Arguments:
+        
+        :level: index of the level of detail.
+        """
+        level = max(0, min(level, len(self.levels)-1))
+        if level != self.level:
+            self.level = level
+            self._update_poly_data()
+        
+    def select_level(self, camera, viewport_size):
+        """Renders the coarsest level of detail whose error is not visible
+        from a given camera. This is called by the animation right before
+        rendering each frame.
+        
+        Arguments:
+        
+        :camera: the tvtk.Camera of the scene.
+        
+        :viewport_size: size (width, height) of the viewport, in pixels.
+        """
+        height = max(1, viewport_size[1])
+        
+        # Levels are computed in model coordinates, so the bounding box and
+        # the errors are taken to world coordinates by the actor matrix
+        # (which includes the pose, group and offset transformations).
+        matrix = self.actor.matrix.to_array()
+        linear = matrix[:3, :3]
+        scale = max(np.sqrt((linear**2).sum(axis=0)).max(), 1e-300)
+        
+        if camera.parallel_projection:
+            pixel_size = 2*camera.parallel_scale / height
+        else:
+            # The closest point of the bounding box of the line determines
+            # the finest detail that can be seen.
+            lower, upper = self.bounds
+            corners = np.array([(x, y, z) for x in (lower[0], upper[0])
+                                          for y in (lower[1], upper[1])
+                                          for z in (lower[2], upper[2])])
+            corners = np.dot(corners, linear.T) + matrix[:3, 3]
+            
+            position = np.asarray(camera.position)
+            closest = np.clip(position, corners.min(axis=0), corners.max(axis=0))
+            distance = np.sqrt(((position - closest)**2).sum())
+            angle = np.radians(camera.view_angle)
+            pixel_size = 2*distance*np.tan(angle/2) / height
+        
+        pixel_size /= scale
+        
+        errors = [error for error, _ in self.levels]
+        level = np.searchsorted(errors, self.pixel_tolerance*pixel_size,
+                                side='right') - 1
+        self.set_level(level)
+        
+    def add_point(self, point):
+        """Adds a point to the polyline (see PolyLine.add_point). Levels of
+        detail are recomputed, so this takes time linear in the number of
+        points.
+        """
+        self.levels = None
+        PolyLine.add_point(self, point)
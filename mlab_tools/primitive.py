@@ -1,40 +1,109 @@
+from collections import OrderedDict
+
+import numpy as np
+
 from tvtk.api import tvtk
-from tvtk.common import configure_input_data
+from tvtk.common import configure_input_data, configure_source_data
 
-from object import Object
+from object import Object, PolyObject
 
 
-class Primitive(Object):
+class SourceCache(object):
+
+    """Least recently used cache of primitive sources.
+    
+    Primitives are built from unit sources (e.g., a sphere of radius 1 at the
+    origin) which only depend on the type and the resolution of the
+    primitive, so every primitive with the same type and resolution shares
+    the same source and mapper. Evicted sources stay alive as long as some
+    primitive uses them.
+    """
     
+    def __init__(self, capacity=64):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        
+    def get(self, key, factory):
+        """Returns the (source, mapper) pair for `key`, building the source
+        with `factory` if it is not cached."""
+        entry = self.entries.pop(key, None)
+        
+        if entry is None:
+            source = factory()
+            source.update()
+            mapper = tvtk.PolyDataMapper()
+            configure_input_data(mapper, source.output)
+            entry = source, mapper
+            
+        self.entries[key] = entry
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            
+        return entry
+        
+    def clear(self):
+        self.entries.clear()
+
+
+sources = SourceCache()
+
+
+class Primitive(Object):
+
     """Base class for 'primitive' objects (i.e., those based on some of the
     vtkPolyDataAlgorithm subclasses).
+    
+    The geometry of a primitive is a shared unit source (see SourceCache)
+    which is placed by a per-primitive offset transformation (scale,
+    orientation and center). This transformation is applied before any
+    other one (see Object.transform), so primitives behave as if they had
+    their own source.
     """
     
     def __init__(self, center):
         Object.__init__(self)
         self.center = center or (0,0,0)
-
+        
     def _get_primitive(self):
         raise NotImplementedError
-    
+        
+    def _get_key(self):
+        # Parameters that determine the unit source.
+        raise NotImplementedError
+        
+    def _get_scale(self):
+        raise NotImplementedError
+        
+    def _orient(self, transform):
+        pass
+        
     def set_center(self, center):
-        self.primitive.center = center
-        self.primitive.update()
-
+        self.center = center
+        self._update_offset()
+        
     def get_center(self):
-        return self.primitive.center
-
+        return self.center
+        
+    def _update_offset(self):
+        offset = self._offset
+        offset.identity()
+        offset.translate(self.center)
+        self._orient(offset)
+        offset.scale(self._get_scale())
+        
     def _configure(self):
-        self.primitive = self._get_primitive()
-        self.mapper = tvtk.PolyDataMapper()
-        configure_input_data(self.mapper, self.primitive.output)
-        self.primitive.update()
+        self.primitive, self.mapper = sources.get(self._get_key(),
+                                                  self._get_primitive)
+                                                  
+        self._offset = tvtk.Transform()
+        self._update_offset()
         
         self._set_actor()
-        
+        self._set_user_transform()
+
 
 class Sphere(Primitive):
-    
+
     def __init__(self, center, radius, theta_res=8, phi_res=8):
         Primitive.__init__(self, center)
         self.radius = radius
@@ -42,13 +111,18 @@ class Sphere(Primitive):
         self.phi_res = phi_res
         self._configure()
         
+    def _get_key(self):
+        return 'sphere', self.theta_res, self.phi_res
+        
+    def _get_scale(self):
+        return self.radius, self.radius, self.radius
+        
     def _get_primitive(self):
-        return tvtk.SphereSource(center=self.center,
-                                 radius=self.radius,
+        return tvtk.SphereSource(radius=1,
                                  theta_resolution=self.theta_res,
                                  phi_resolution=self.phi_res)
 
-        
+
 class Box(Primitive):
 
     def __init__(self, x_length, y_length, z_length, center=None):
@@ -58,21 +132,24 @@ class Box(Primitive):
         self.z_length = z_length
         self._configure()
         
+    def _get_key(self):
+        return 'box',
+        
+    def _get_scale(self):
+        return self.x_length, self.y_length, self.z_length
+        
     def _get_primitive(self):
-        return tvtk.CubeSource(center=self.center,
-                               x_length=self.x_length,
-                               y_length=self.y_length,
-                               z_length=self.z_length)
+        return tvtk.CubeSource(x_length=1, y_length=1, z_length=1)
 
 
 class Cube(Box):
-    
+
     def __init__(self, length, center=None):
         Box.__init__(self, length, length, length, center=center)
-        
-        
+
+
 class Cone(Primitive):
-    
+
     def __init__(self, radius, height, resolution=6, center=None, direction=None):
         Primitive.__init__(self, center)
         self.radius = radius
@@ -82,25 +159,41 @@ class Cone(Primitive):
         self._configure()
         
     def set_direction(self, direction):
-        self.primitive.direction = direction
-        self.primitive.update()
-
+        self.direction = direction
+        self._update_offset()
+        
     def set_height(self, height):
-        self.primitive.height = height
-        self.primitive.update()
-
+        self.height = height
+        self._update_offset()
+        
     def get_height(self):
-        return self.primitive.height
+        return self.height
+        
+    def _get_key(self):
+        return 'cone', self.resolution
+        
+    def _get_scale(self):
+        return self.height, self.radius, self.radius
+        
+    def _orient(self, transform):
+        # Rotates the x axis onto the direction of the cone (as done by
+        # vtkConeSource).
+        direction = np.asarray(self.direction, dtype=np.float64)
+        if direction[1] == 0 and direction[2] == 0:
+            if direction[0] < 0:
+                transform.rotate_wxyz(180, 0, 1, 0)
+            return
+        axis = direction / np.sqrt((direction**2).sum()) + (1, 0, 0)
+        transform.rotate_wxyz(180, *(axis / 2))
         
     def _get_primitive(self):
-        return tvtk.ConeSource(center=self.center,
-                               height=self.height,
-                               radius=self.radius,
-                               direction=self.direction,
+        return tvtk.ConeSource(height=1,
+                               radius=1,
                                resolution=self.resolution)
-        
+
+
 class Cylinder(Primitive):
-    
+
     def __init__(self, radius, height, resolution=6, center=None):
         Primitive.__init__(self, center)
         self.radius = radius
@@ -108,8 +201,130 @@ class Cylinder(Primitive):
         self.resolution = resolution
         self._configure()
         
+    def _get_key(self):
+        return 'cylinder', self.resolution
+        
+    def _get_scale(self):
+        return self.radius, self.height, self.radius
+        
     def _get_primitive(self):
-        return tvtk.CylinderSource(center=self.center,
-                                   height=self.height,
-                                   radius=self.radius,
-                                   resolution=self.resolution)
\ No newline at end of file
+        return tvtk.CylinderSource(height=1,
+                                   radius=1,
+                                   resolution=self.resolution)
+
+
+class Instances(PolyObject):
+
+    """Many copies of a primitive drawn by a single actor.
+    
+    Copies are instanced by a vtkGlyph3DMapper, and each one has its own
+    position, rotation, scale and color. These are kept in NumPy arrays
+    that VTK uses without copying them, so updating every instance takes a
+    single vectorized assignment per attribute (see `update_instances`).
+    """
+    
+    def __init__(self, primitive, positions, rotations=None, scales=None,
+                 colors=None):
+        """Builds a set of instances.
+        
+        Arguments:
+        
+        :primitive: the Primitive to copy. Its size, orientation and center
+        are kept (the center becomes an offset from the position of each
+        instance), but not its transformations or properties.
+        
+        :positions: array of shape (n, 3) with the position of each instance.
+        
+        :rotations: optional array of shape (n, 3) with the rotation angles
+        (in degrees) of each instance around the x, y and z axes, with the
+        same convention as the orientation of VTK actors (defaults to no
+        rotation).
+        
+        :scales: optional array of shape (n, 3) with the scale factors of each
+        instance along each axis, or of shape (n,) with a single factor per
+        instance (defaults to 1).
+        
+        :colors: optional array of shape (n, 3) with the color of each
+        instance, or (n, 4) including opacities. If not given, instances use
+        the color of the object properties.
+        """
+        PolyObject.__init__(self)
+        
+        positions = np.asarray(positions, dtype=np.float64).reshape((-1, 3))
+        n = len(positions)
+        
+        self.positions = positions.copy()
+        self.rotations = np.zeros((n, 3))
+        self.scales = np.ones((n, 3))
+        self.has_colors = colors is not None
+        self.colors = np.empty((n, 4), dtype=np.uint8)
+        self.colors[:] = 255
+        
+        self.glyph = tvtk.TransformPolyDataFilter(transform=primitive._offset)
+        configure_input_data(self.glyph, primitive.primitive.output)
+        self.glyph.update()
+        
+        self._configure()
+        self.update_instances(rotations=rotations, scales=scales, colors=colors)
+        
+    def _configure(self):
+        self.poly_data = tvtk.PolyData(points=self.positions)
+        
+        for name, values in (('rotations', self.rotations),
+                             ('scales', self.scales)):
+            array = tvtk.DoubleArray()
+            array.from_array(values)
+            array.name = name
+            self.poly_data.point_data.add_array(array)
+            
+        self.vtk_colors = tvtk.UnsignedCharArray()
+        self.vtk_colors.from_array(self.colors)
+        self.vtk_colors.name = 'colors'
+        self.poly_data.point_data.add_array(self.vtk_colors)
+        
+        self.mapper = tvtk.Glyph3DMapper(scaling=True,
+                                         scale_mode='scale_by_vector_components',
+                                         scale_factor=1,
+                                         orient=True,
+                                         orientation_mode='rotation')
+        configure_input_data(self.mapper, self.poly_data)
+        configure_source_data(self.mapper, self.glyph.output)
+        self.mapper.set_scale_array('scales')
+        self.mapper.set_orientation_array('rotations')
+        
+        if self.has_colors:
+            self.mapper.scalar_visibility = True
+            self.mapper.scalar_mode = 'use_point_field_data'
+            self.mapper.color_mode = 'direct_scalars'
+            self.mapper.select_color_array('colors')
+        else:
+            self.mapper.scalar_visibility = False
+            
+        self.actor = tvtk.Actor(mapper=self.mapper)
+        
+    def num_instances(self):
+        return len(self.positions)
+        
+    def update_instances(self, positions=None, rotations=None, scales=None,
+                         colors=None):
+        """Updates the attributes of every instance at once (see the
+        constructor for the format of the arguments). Attributes that are
+        not given are left untouched.
+        """
+        n = len(self.positions)
+        
+        if positions is not None:
+            self.positions[:] = np.asarray(positions).reshape((n, 3))
+            self.poly_data.points.modified()
+        if rotations is not None:
+            self.rotations[:] = np.asarray(rotations).reshape((n, 3))
+        if scales is not None:
+            scales = np.asarray(scales, dtype=np.float64)
+            self.scales[:] = scales.reshape((n, 1)) if scales.ndim == 1 else scales
+        if colors is not None:
+            colors = np.asarray(colors, dtype=np.float64)
+            self.colors[:, :colors.shape[-1]] = np.round(np.clip(colors, 0, 1) * 255)
+            
+        for name in ('rotations', 'scales', 'colors'):
+            self.poly_data.point_data.get_array(name).modified()
+        self.poly_data.modified()
@@ -0,0 +1,382 @@
+import mmap
+import multiprocessing
+import re
+
+import numpy as np
+
+from cache import get_cache
+
+
+def read_OFF(filename, cache=None):
+    """Reads an OFF file into NumPy arrays.
+    
+    Returns a tuple (points, faces, n_faces), where `points` is an array of
+    shape (n, 3) and `faces` holds the packed face connectivity (see
+    `Polyhedron.from_arrays`). Parsed files are cached on disk (see
+    cache.GeometryCache).
+    
+    Arguments:
+    
+    :filename: path to an OFF file.
+    
+    :cache: the GeometryCache to use (defaults to cache.get_cache()).
+    """
+    return (cache or get_cache()).read(filename, 'off', _read_OFF_file)
+
+
+def _read_OFF_task(task):
+    # Runs in a worker process.
+    filename, cache = task
+    return read_OFF(filename, cache=cache)
+
+
+def read_many_OFF(filenames, workers=None, cache=None):
+    """Reads several OFF files into NumPy arrays (see `read_OFF`) using a pool
+    of processes. Files already in the cache are loaded by the current
+    process, and only the rest are parsed by the workers. Returns a list
+    with the arrays of each file, in the same order as `filenames`.
+    
+    Arguments:
+    
+    :filenames: paths to OFF files.
+    
+    :workers: number of worker processes (defaults to the number of CPUs).
+    
+    :cache: the GeometryCache to use (defaults to cache.get_cache()).
+    """
+    cache = cache or get_cache()
+    results = [None] * len(filenames)
+    pending = list()
+    
+    for index, filename in enumerate(filenames):
+        if cache.is_cached(filename, 'off'):
+            results[index] = read_OFF(filename, cache=cache)
+        else:
+            pending.append(index)
+            
+    workers = workers or multiprocessing.cpu_count()
+    workers = max(1, min(workers, len(pending)))
+    tasks = [(filenames[index], cache) for index in pending]
+    
+    if workers == 1:
+        parsed = map(_read_OFF_task, tasks)
+    else:
+        pool = multiprocessing.Pool(workers)
+        try:
+            chunk_size = max(1, len(tasks) // (4*workers))
+            parsed = pool.map(_read_OFF_task, tasks, chunk_size)
+            pool.close()
+            pool.join()
+        finally:
+            pool.terminate()
+            
+    for index, arrays in zip(pending, parsed):
+        results[index] = arrays
+        
+    return results
+
+
+def _read_OFF_file(filename):
+    with open(filename, 'r') as _file:
+        lines = _file.read().splitlines()
+
+    if not lines or lines[0].strip() != 'OFF':
+        raise Exception('Wrong format!')
+
+    lines = [line for line in (line.strip() for line in lines[1:])
+             if line and line[0] != '#']
+
+    try:
+        n_verts, n_faces = map(int, lines[0].split()[:2])
+    except Exception:
+        raise Exception('Wrong format!')
+
+    vertex_lines = lines[1:n_verts+1]
+    face_lines = lines[n_verts+1:n_verts+n_faces+1]
+
+    if len(vertex_lines) != n_verts or len(face_lines) != n_faces:
+        raise Exception('Wrong format!')
+
+    points = np.fromstring(' '.join(vertex_lines), sep=' ')
+    if len(points) != 3*n_verts:
+        # Vertex lines carry extra values (e.g., colors). Keep the
+        # coordinates only.
+        try:
+            points = np.array([line.split()[:3] for line in vertex_lines],
+                              dtype=np.float64)
+        except ValueError:
+            raise Exception('Wrong format!')
+    points = points.reshape((n_verts, 3))
+
+    faces, offsets = _read_OFF_faces(face_lines)
+
+    indices = np.delete(faces, offsets)
+    if len(indices) > 0 and (indices.min() < 0 or indices.max() >= n_verts):
+        raise Exception('Face vertex index out of range!')
+
+    return points, faces, n_faces
+
+
+def _read_OFF_faces(face_lines):
+    # Returns the packed face connectivity and the offset of every face. Face
+    # lines may carry extra values after the vertex indices (e.g., a color),
+    # so the number of values of every line is compared with its vertex count
+    # and the extra ones are dropped.
+    if not face_lines:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    text = '\n'.join(face_lines)
+    values = np.fromstring(text, sep=' ')
+
+    # Count the values of every line from the positions where a value starts
+    # (i.e., a non-blank character after a blank one).
+    chars = np.frombuffer(text, dtype=np.uint8)
+    blank = np.in1d(chars, np.frombuffer(' \t\r\n', dtype=np.uint8))
+    newline = chars == ord('\n')
+    starts = ~blank
+    starts[1:] &= blank[:-1]
+    line_of = np.cumsum(newline)
+    counts = np.bincount(line_of[starts], minlength=len(face_lines))
+
+    if len(values) != counts.sum():
+        raise Exception('Wrong format!')
+
+    firsts = np.cumsum(counts) - counts
+    sizes = values[firsts].astype(np.int64)
+
+    if (sizes < 3).any():
+        raise Exception('Faces should have at least three vertices!')
+    if (counts < sizes+1).any():
+        raise Exception('Wrong format!')
+
+    if (counts > sizes+1).any():
+        position = np.arange(len(values)) - np.repeat(firsts, counts)
+        values = values[position < np.repeat(sizes+1, counts)]
+
+    offsets = np.cumsum(sizes+1) - (sizes+1)
+
+    return values.astype(np.int64), offsets
+
+
+class CellType(object):
+    
+    VTK_VERTEX = 1
+    VTK_POLY_VERTEX = 2
+    VTK_LINE = 3
+    VTK_POLY_LIN = 4
+    VTK_TRIANGLE = 5
+    VTK_TRIANGLE_STRIP = 6
+    VTK_POLYGON = 7
+    VTK_PIXEL = 8
+    VTK_QUAD = 9
+    VTK_TETRA = 10
+    VTK_VOXEL = 11
+    VTK_HEXAHEDRON = 12
+    VTK_WEDGE = 13
+    VTK_PYRAMID = 14 
+
+
+class LegacyReader(object):
+    
+    """Single-pass reader of VTK legacy files holding unstructured grids.
+    
+    The file is memory-mapped and consumed as a stream of tokens. Data blocks
+    (POINTS, CELLS and CELL_TYPES) are read straight into NumPy arrays: ASCII
+    blocks with a single NumPy parse each and BINARY blocks as big-endian
+    views over the mapped file.
+    """
+    
+    VERSION_REGEXP = re.compile(r'# vtk DataFile Version (\d+)\.(\d+)')
+    KEYWORD_REGEXP = re.compile(r'[A-Z][A-Z_]+')
+    
+    DATA_TYPES = {
+        'bit': 'u1',
+        'unsigned_char': 'u1',
+        'char': 'i1',
+        'unsigned_short': 'u2',
+        'short': 'i2',
+        'unsigned_int': 'u4',
+        'int': 'i4',
+        'unsigned_long': 'u8',
+        'long': 'i8',
+        'vtktypeint64': 'i8',
+        'vtkidtype': 'i4',
+        'float': 'f4',
+        'double': 'f8',
+    }
+    
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+        self.binary = False
+        
+    def _readline(self):
+        end = self.data.find('\n', self.pos)
+        if end < 0:
+            end = len(self.data)
+        line = self.data[self.pos:end]
+        self.pos = end + 1
+        return line.strip()
+    
+    def _next_token(self):
+        data = self.data
+        size = len(data)
+        
+        while True:
+            while self.pos < size and data[self.pos].isspace():
+                self.pos += 1
+            if self.pos >= size:
+                return None
+            if data[self.pos] != '#':
+                break
+            # Skip comments.
+            self._readline()
+            
+        start = self.pos
+        while self.pos < size and not data[self.pos].isspace():
+            self.pos += 1
+            
+        return data[start:self.pos]
+    
+    def _next_int(self, msg):
+        try:
+            return int(self._next_token())
+        except Exception:
+            raise Exception(msg)
+        
+    def _read_block(self, count, dtype, msg):
+        if self.binary:
+            # Binary data starts right after the end of the declaration line.
+            self._readline()
+            dtype = np.dtype(dtype).newbyteorder('>')
+            if self.pos + count*dtype.itemsize > len(self.data):
+                raise Exception(msg)
+            values = np.frombuffer(self.data, dtype=dtype,
+                                   count=count, offset=self.pos)
+            self.pos += count*dtype.itemsize
+        else:
+            match = self.KEYWORD_REGEXP.search(self.data, self.pos)
+            end = match.start() if match is not None else len(self.data)
+            values = np.fromstring(self.data[self.pos:end], sep=' ')
+            self.pos = end
+            
+        if len(values) != count:
+            raise Exception(msg)
+        
+        return values
+    
+    def _read_header(self):
+        match = self.VERSION_REGEXP.match(self._readline())
+        if match is None:
+            raise Exception('Wrong format!')
+        if int(match.groups()[0]) >= 5:
+            raise Exception('VTK file version not supported!')
+        
+        # Title.
+        self._readline()
+        
+        encoding = self._readline()
+        if encoding not in ['ASCII', 'BINARY']:
+            raise Exception('Wrong file encoding!')
+        self.binary = encoding == 'BINARY'
+        
+        if self._next_token() != 'DATASET' or\
+           self._next_token() != 'UNSTRUCTURED_GRID':
+            raise Exception('VTK dataset must be unstructured grid!')
+    
+    def _read_points(self):
+        n_points = self._next_int('Wrong number of points!')
+        data_type = (self._next_token() or '').lower()
+        
+        if data_type not in self.DATA_TYPES:
+            raise Exception('Wrong point declaration format!')
+        
+        points = self._read_block(3*n_points, self.DATA_TYPES[data_type],
+                                  'Invalid point coordinates!')
+        
+        return points.astype(np.float64).reshape((n_points, 3))
+    
+    def _read_cells(self):
+        n_cells = self._next_int('Wrong number of cells!')
+        size = self._next_int('Wrong cell declaration format!')
+        
+        cells = self._read_block(size, 'i4', 'Wrong cell format!')
+        
+        return n_cells, cells.astype(np.int64)
+    
+    def _read_cell_types(self):
+        n_cells = self._next_int('Wrong number of cell types!')
+        
+        cell_types = self._read_block(n_cells, 'i4', 'Wrong cell type format!')
+        
+        return cell_types.astype(np.int64)
+    
+    def _skip_metadata(self):
+        # METADATA sections (VTK 4.x) end with an empty line.
+        end = self.data.find('\n\n', self.pos)
+        self.pos = len(self.data) if end < 0 else end + 2
+        
+    def read(self):
+        """Reads the file and returns a tuple (points, cells, cell_types),
+        where `points` is an array of shape (n, 3), `cells` is the packed
+        cell connectivity (i.e., the number of points of each cell followed by
+        their indices) and `cell_types` holds the VTK type of each cell.
+        """
+        self._read_header()
+        
+        points = cells = cell_types = None
+        n_cells = 0
+        
+        while True:
+            keyword = self._next_token()
+            
+            if keyword == 'POINTS':
+                points = self._read_points()
+            elif keyword == 'CELLS':
+                n_cells, cells = self._read_cells()
+            elif keyword == 'CELL_TYPES':
+                cell_types = self._read_cell_types()
+            elif keyword == 'METADATA':
+                self._skip_metadata()
+            else:
+                # Either the end of the file or dataset attributes (which are
+                # not needed).
+                break
+                
+        if points is None:
+            raise Exception('Wrong point declaration format!')
+        if cells is None:
+            raise Exception('Wrong cell declaration format!')
+        if cell_types is None or len(cell_types) != n_cells:
+            raise Exception('Wrong cell types declaration format!')
+        
+        return points, cells, cell_types
+    
+
+def read_VTK(filename, cache=None):
+    """Reads a VTK legacy file with an unstructured grid into NumPy arrays (see
+    LegacyReader.read). Parsed files are cached on disk (see
+    cache.GeometryCache).
+    
+    Arguments:
+    
+    :filename: path to a VTK legacy file.
+    
+    :cache: the GeometryCache to use (defaults to cache.get_cache()).
+    """
+    return (cache or get_cache()).read(filename, 'vtk', _read_VTK_file)
+
+
+def _read_VTK_file(filename):
+    with open(filename, 'rb') as _file:
+        try:
+            data = mmap.mmap(_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise Exception('Wrong format!')
+        
+    try:
+        points, cells, cell_types = LegacyReader(data).read()
+    finally:
+        data.close()
+        
+    return points, cells, cell_types
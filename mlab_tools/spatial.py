@@ -0,0 +1,201 @@
+import numpy as np
+
+from arrays import concatenated_ranges
+from readers import CellType
+
+
+class CellLocator(object):
+
+    """Spatial index over the cells of an unstructured grid, used to find the
+    cells containing a set of points.
+
+    The bounding box of the grid is split into a uniform grid of bins (with
+    roughly as many bins as cells), and every bin lists the cells whose
+    bounding boxes overlap it. Queries are vectorized: the bins of all the
+    query points are computed at once, their candidate cells are gathered
+    into (point, cell) pairs, and these pairs are checked with a bounding
+    box test followed by an exact test (barycentric coordinates for tetras;
+    the bounding box test is already exact for voxels, which are
+    axis-aligned).
+
+    Only tetras and voxels are indexed: cells of any other type (including
+    other volumetric ones, such as hexahedra or wedges) never contain points,
+    so points lying only inside them are reported as outside every cell.
+    """
+
+    # Number of query points processed at once, which bounds the memory
+    # used by the (point, cell) pairs.
+    CHUNK_SIZE = 1 << 16
+
+    def __init__(self, points, cells, offsets, cell_types, tolerance=1e-9):
+        """Builds the index.
+
+        Arguments:
+
+        :points: array of shape (n, 3) with the point coordinates of the
+        grid.
+
+        :cells: 1D array with the packed cell connectivity.
+
+        :offsets: position of each cell inside `cells` (see
+        arrays.cell_offsets).
+
+        :cell_types: array with the VTK type of each cell.
+
+        :tolerance: relative tolerance of the containment tests, so that
+        points lying on a face are found despite rounding errors (defaults
+        to 1e-9).
+        """
+        points = np.asarray(points, dtype=np.float64)
+
+        tetras = np.flatnonzero(cell_types == CellType.VTK_TETRA)
+        voxels = np.flatnonzero(cell_types == CellType.VTK_VOXEL)
+        self.indices = np.concatenate([tetras, voxels])
+        self.num_tetras = len(tetras)
+
+        self.lower = np.empty((len(self.indices), 3))
+        self.upper = np.empty((len(self.indices), 3))
+        self.origins = np.zeros((0, 3))
+        self.inverses = np.zeros((0, 3, 3))
+        self.degenerate = np.zeros(0, dtype=bool)
+
+        for first, indices, size in ((0, tetras, 4),
+                                     (len(tetras), voxels, 8)):
+            if len(indices) == 0:
+                continue
+            cell_points = points[cells[offsets[indices][:, None] + 1 + np.arange(size)]]
+            self.lower[first:first+len(indices)] = cell_points.min(axis=1)
+            self.upper[first:first+len(indices)] = cell_points.max(axis=1)
+            if size == 4:
+                self._set_tetras(cell_points)
+
+        if len(self.indices) > 0:
+            extent = (self.upper.max(axis=0) - self.lower.min(axis=0)).max()
+        else:
+            extent = 1.
+        self.tolerance = tolerance
+        self.distance_tolerance = tolerance * max(extent, 1.)
+
+        self._build_grid()
+
+    def _set_tetras(self, tetras):
+        # The barycentric coordinates of a point p are inverse * (p - v0),
+        # with v0 being the first vertex of the tetra. Degenerate tetras
+        # (with no volume) never contain points.
+        self.origins = tetras[:, 0]
+        edges = np.transpose(tetras[:, 1:] - tetras[:, :1], (0, 2, 1))
+
+        determinants = np.linalg.det(edges)
+        scale = np.abs(edges).max(axis=(1, 2)) ** 3
+        self.degenerate = np.abs(determinants) <= 1e-12 * np.maximum(scale, 1e-300)
+        edges[self.degenerate] = np.identity(3)
+
+        self.inverses = np.linalg.inv(edges)
+
+    def _build_grid(self):
+        n_cells = len(self.indices)
+
+        if n_cells == 0:
+            self.origin = np.zeros(3)
+            self.bin_size = np.ones(3)
+            self.dims = np.ones(3, dtype=np.int64)
+            self.bin_starts = np.zeros(2, dtype=np.int64)
+            self.bin_cells = np.zeros(0, dtype=np.int64)
+            return
+
+        self.origin = self.lower.min(axis=0)
+        extent = self.upper.max(axis=0) - self.origin
+        # Flat grids still get a (thin) volume.
+        extent = np.maximum(extent, 1e-6 * max(extent.max(), 1e-300))
+
+        bin_size = (np.prod(extent) / n_cells) ** (1./3)
+        self.dims = np.maximum(1, np.ceil(extent / bin_size)).astype(np.int64)
+        self.bin_size = extent / self.dims
+
+        lower = self._bin_coordinates(self.lower)
+        upper = self._bin_coordinates(self.upper)
+        extents = upper - lower + 1
+        counts = extents.prod(axis=1)
+
+        # Every cell is listed in each bin overlapped by its bounding box.
+        cell_rep = np.repeat(np.arange(n_cells), counts)
+        local = concatenated_ranges(np.zeros(n_cells, dtype=np.int64), counts)
+        extents, lower = extents[cell_rep], lower[cell_rep]
+
+        x = lower[:, 0] + local % extents[:, 0]
+        local //= extents[:, 0]
+        y = lower[:, 1] + local % extents[:, 1]
+        z = lower[:, 2] + local // extents[:, 1]
+
+        bins = (z*self.dims[1] + y)*self.dims[0] + x
+        order = np.argsort(bins, kind='mergesort')
+
+        self.bin_cells = cell_rep[order]
+        self.bin_starts = np.searchsorted(bins[order],
+                                          np.arange(self.dims.prod()+1))
+
+    def _bin_coordinates(self, points):
+        coordinates = np.floor((points - self.origin) / self.bin_size)
+        return np.clip(coordinates, 0, self.dims-1).astype(np.int64)
+
+    def _locate_chunk(self, points):
+        relative = (points - self.origin) / self.bin_size
+        inside = ((relative >= 0) & (relative <= self.dims)).all(axis=1)
+        candidates = np.flatnonzero(inside)
+
+        coordinates = self._bin_coordinates(points[candidates])
+        bins = (coordinates[:, 2]*self.dims[1] + coordinates[:, 1])*self.dims[0] +\
+               coordinates[:, 0]
+        starts = self.bin_starts[bins]
+        counts = self.bin_starts[bins+1] - starts
+
+        pair_points = np.repeat(candidates, counts)
+        pair_cells = self.bin_cells[concatenated_ranges(starts, counts)]
+
+        coordinates = points[pair_points]
+        matches = ((coordinates >= self.lower[pair_cells] - self.distance_tolerance) &
+                   (coordinates <= self.upper[pair_cells] + self.distance_tolerance)).all(axis=1)
+        pair_points, pair_cells = pair_points[matches], pair_cells[matches]
+
+        # Exact test for tetras.
+        tetras = np.flatnonzero(pair_cells < self.num_tetras)
+        tetra_cells = pair_cells[tetras]
+        offsets = points[pair_points[tetras]] - self.origins[tetra_cells]
+        barycentric = np.einsum('nij,nj->ni', self.inverses[tetra_cells], offsets)
+        matches = np.ones(len(pair_cells), dtype=bool)
+        matches[tetras] = (barycentric >= -self.tolerance).all(axis=1) &\
+                          (barycentric.sum(axis=1) <= 1 + self.tolerance) &\
+                          ~self.degenerate[tetra_cells]
+
+        # Pairs are sorted by point and then by cell index in the grid, so
+        # points lying on a shared face belong to the containing cell with the
+        # lowest index.
+        pair_points = pair_points[matches]
+        pair_cells = self.indices[pair_cells[matches]]
+        order = np.lexsort((pair_cells, pair_points))
+        pair_points, pair_cells = pair_points[order], pair_cells[order]
+        first = np.ones(len(pair_points), dtype=bool)
+        first[1:] = pair_points[1:] != pair_points[:-1]
+
+        result = np.empty(len(points), dtype=np.int64)
+        result[:] = -1
+        result[pair_points[first]] = pair_cells[first]
+
+        return result
+
+    def locate(self, points):
+        """Returns an array with the index of the cell containing each point
+        (-1 for points outside every cell).
+
+        Arguments:
+
+        :points: array of shape (n, 3) with the query points.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape((-1, 3))
+        result = np.empty(len(points), dtype=np.int64)
+
+        for start in xrange(0, len(points), self.CHUNK_SIZE):
+            chunk = slice(start, start+self.CHUNK_SIZE)
+            result[chunk] = self._locate_chunk(points[chunk])
+
+        return result
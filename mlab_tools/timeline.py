@@ -0,0 +1,215 @@
+import numpy as np
+
+
+def read_trajectory(filename):
+    """Reads a retQSS trajectory file, where every line holds the time, the
+    coordinates and the volume of a sample of the trajectory.
+
+    Returns a tuple (times, points, volumes) of arrays with shapes (n,),
+    (n, 3) and (n,).
+    """
+    data = np.loadtxt(filename, dtype=str, ndmin=2)
+    if data.shape[1] != 5:
+        raise Exception('Wrong format!')
+
+    return data[:, 0].astype(np.float64), data[:, 1:4].astype(np.float64), data[:, 4]
+
+
+def read_volumes(filename):
+    """Reads a retQSS volume file, where every line holds the time at which
+    the particle enters a volume and the name of this volume.
+
+    Returns a tuple (times, volumes) of arrays.
+    """
+    data = np.loadtxt(filename, dtype=str, ndmin=2)
+    if data.shape[1] != 2:
+        raise Exception('Wrong format!')
+
+    return data[:, 0].astype(np.float64), data[:, 1]
+
+
+class VolumeTimeline(object):
+
+    """Highlights the volumes traversed by a particle on a merged mesh (see
+    mesh.PolyhedronMesh), frame by frame.
+
+    The timeline is a sorted list of entries (the time at which a volume is
+    entered and the ID of that volume). Frame numbers are mapped to times
+    (see `frame_time`) and from there to entries with a binary search, so
+    moving to any frame takes O(log n) time plus the work of updating the
+    volumes whose state changes. Every volume is in one of three states: not
+    visited yet (it keeps its original color), current (the last volume
+    entered) or visited. The state of a volume at a given entry follows from
+    the first entry visiting it, which is precomputed.
+
+    The volumes whose state changes on a frame are updated with a single
+    call to `PolyhedronMesh.update_polyhedrons`.
+    """
+
+    def __init__(self, mesh, times, volume_ids, time_per_frame,
+                 start_time=None, initial_frame=1,
+                 current_color=(0.7,0,0), current_opacity=0.3,
+                 visited_color=(0.5,0,0), visited_opacity=0.05,
+                 names=None):
+        """Builds a timeline.
+
+        Arguments:
+
+        :mesh: the PolyhedronMesh holding the volumes.
+
+        :times: times at which each volume is entered, in non-decreasing
+        order.
+
+        :volume_ids: ID of the polyhedron of each entry in the mesh (-1 for
+        volumes outside the mesh, such as the world volume).
+
+        :time_per_frame: simulated time elapsed between consecutive frames.
+
+        :start_time: time of the initial frame (defaults to the first entry
+        time).
+
+        :initial_frame: number of the frame on which the timeline starts
+        (defaults to 1).
+
+        :current_color: color of the current volume.
+
+        :current_opacity: opacity of the current volume.
+
+        :visited_color: color of previously visited volumes.
+
+        :visited_opacity: opacity of previously visited volumes.
+
+        :names: optional names of the volumes of each entry (see
+        `current_name`).
+        """
+        self.mesh = mesh
+        self.times = np.asarray(times, dtype=np.float64)
+        self.volume_ids = np.asarray(volume_ids, dtype=np.int64)
+        self.names = names
+
+        if len(self.times) != len(self.volume_ids):
+            raise Exception('A volume is needed for each entry!')
+        if (np.diff(self.times) < 0).any():
+            raise Exception('Entry times must be in non-decreasing order!')
+
+        self.time_per_frame = time_per_frame
+        self.start_time = self.times[0] if start_time is None else start_time
+        self.initial_frame = initial_frame
+
+        # Volumes of the entries, as indices into the mesh.
+        in_mesh = self.volume_ids >= 0
+        self.volumes = np.empty(len(self.volume_ids), dtype=np.int64)
+        self.volumes[:] = -1
+        self.volumes[in_mesh] = mesh._indices(self.volume_ids[in_mesh])
+
+        # Entry of the first visit to each volume.
+        entries = np.flatnonzero(in_mesh)
+        volumes, first = np.unique(self.volumes[entries], return_index=True)
+        self.first_visit = np.empty(len(mesh.ids), dtype=np.int64)
+        self.first_visit[:] = len(self.times)
+        self.first_visit[volumes] = entries[first]
+
+        self.original_colors = mesh.colors.copy()
+        self.current_state = np.array(tuple(current_color) + (current_opacity,))
+        self.visited_state = np.array(tuple(visited_color) + (visited_opacity,))
+
+        # Entry of every frame until the last entry is reached.
+        num_frames = 1
+        if time_per_frame > 0 and len(self.times) > 0:
+            num_frames += max(0, int(np.ceil((self.times[-1] - self.start_time) /
+                                             time_per_frame)))
+        frames = np.arange(num_frames) + initial_frame
+        self.frame_entries = self._entry_at(self.frame_time(frames))
+
+        # No entry has been applied yet.
+        self.entry = -1
+
+    def frame_time(self, frame_no):
+        """Returns the simulated time of a frame (or an array of frames)."""
+        return self.start_time + (frame_no - self.initial_frame)*self.time_per_frame
+
+    def _entry_at(self, time):
+        return np.searchsorted(self.times, time, side='right') - 1
+
+    def entry_at_frame(self, frame_no):
+        """Returns the index of the last entry reached on a given frame (-1
+        if none)."""
+        index = frame_no - self.initial_frame
+        if index < 0:
+            return -1
+        if index < len(self.frame_entries):
+            return self.frame_entries[index]
+        return len(self.times) - 1
+
+    def _states(self, volumes, entry):
+        # Colors of the given volumes after the given entry.
+        colors = self.original_colors[volumes].copy()
+        visited = self.first_visit[volumes] <= entry
+        colors[visited] = self.visited_state
+        if entry >= 0:
+            colors[volumes == self.volumes[entry]] = self.current_state
+        return colors
+
+    def seek(self, frame_no):
+        """Brings the mesh to the state of a given frame. Only the volumes of
+        the entries between the current frame and the given one are updated,
+        so this is meant to be called on every frame (e.g., from a frame
+        callback) as well as to jump to any frame. Returns the index of the
+        last entry reached (-1 if none).
+
+        Arguments:
+
+        :frame_no: number of the frame.
+        """
+        entry = self.entry_at_frame(frame_no)
+        if entry == self.entry:
+            return entry
+
+        first, last = sorted((self.entry, entry))
+        volumes = self.volumes[max(first, 0):last+1]
+        volumes = np.unique(volumes[volumes >= 0])
+
+        self.entry = entry
+
+        if len(volumes) > 0:
+            colors = self._states(volumes, entry)
+            self.mesh.update_polyhedrons(self.mesh.ids[volumes],
+                                         color=colors[:, :3],
+                                         opacity=colors[:, 3])
+
+        return entry
+
+    def current_name(self):
+        """Returns the name of the volume of the last entry reached (or None
+        if no entry was reached or names were not given)."""
+        if self.names is None or self.entry < 0:
+            return None
+        return self.names[self.entry]
+
+    def finished(self):
+        """Returns whether the last entry has been reached."""
+        return self.entry == len(self.times) - 1
+
+    @classmethod
+    def from_retQSS(cls, filename, geometry, time_per_frame, **kwargs):
+        """Builds a timeline from a retQSS volume file (see `read_volumes`).
+
+        Arguments:
+
+        :filename: path to the volume file.
+
+        :geometry: the Geometry holding the volumes, parsed in merged mode.
+
+        :time_per_frame: simulated time elapsed between consecutive frames.
+
+        :kwargs: further keyword arguments of the constructor.
+        """
+        mesh = geometry.get_mesh()
+        if mesh is None:
+            raise Exception('The geometry should be parsed in merged mode!')
+
+        times, names = read_volumes(filename)
+        volume_ids = geometry.lookup_many(names)
+
+        return cls(mesh, times, volume_ids, time_per_frame, names=names,
+                   **kwargs)
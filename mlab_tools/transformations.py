@@ -0,0 +1,54 @@
+import numpy as np
+
+
+def _to_vector(value):
+    if np.ndim(value) == 0:
+        return np.array([value, value, value], dtype=np.float64)
+    return np.asarray(value, dtype=np.float64)[:3]
+
+
+def translation_matrix(translate):
+    """Returns the 4x4 matrix of a translation.
+
+    Arguments:
+
+    :translate: a tuple or list representing the translation vector or a
+    single number to use for each of its three components.
+    """
+    matrix = np.identity(4)
+    matrix[:3, 3] = _to_vector(translate)
+    return matrix
+
+
+def scaling_matrix(scale):
+    """Returns the 4x4 matrix of a scaling (see translation_matrix for the
+    format of the argument)."""
+    matrix = np.identity(4)
+    matrix[(0,1,2), (0,1,2)] = _to_vector(scale)
+    return matrix
+
+
+def rotation_matrix(rotate):
+    """Returns the 4x4 matrix of a rotation around the x, y and z axes (in
+    this order, as done by Object.transform).
+
+    Arguments:
+
+    :rotate: a tuple or list with the three angles (in degrees) or a single
+    angle to use for each of the axes.
+    """
+    x, y, z = np.radians(_to_vector(rotate))
+    matrix = np.identity(4)
+
+    for axis, angle in zip((0,1,2), (x, y, z)):
+        if angle == 0:
+            continue
+        i, j = [k for k in (0,1,2) if k != axis]
+        cos, sin = np.cos(angle), np.sin(angle)
+        rotation = np.identity(4)
+        rotation[i, i] = rotation[j, j] = cos
+        rotation[i, j] = -sin if axis != 1 else sin
+        rotation[j, i] = sin if axis != 1 else -sin
+        matrix = np.dot(matrix, rotation)
+
+    return matrix
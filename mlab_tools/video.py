@@ -0,0 +1,186 @@
+import Queue
+import threading
+
+import numpy as np
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+
+def _fourcc(codec):
+    if hasattr(cv2, 'VideoWriter_fourcc'):
+        return cv2.VideoWriter_fourcc(*codec)
+    # OpenCV 2.4 only exposes FOURCC codes through the legacy module.
+    return cv2.cv.CV_FOURCC(*codec)
+
+
+class VideoWriter(object):
+
+    """Streaming video writer fed with in-memory frames.
+
+    Frames are encoded as soon as they are written, so neither temporary
+    image files nor the whole sequence of frames are kept around. The video
+    resolution is taken from the first frame.
+    """
+
+    def __init__(self, filename, framerate, codec='XVID'):
+        """Opens a video for writing.
+
+        Arguments:
+
+        :filename: path of the video file.
+
+        :framerate: framerate of the video.
+
+        :codec: FOURCC code of the video codec (defaults to XVID).
+        """
+        if cv2 is None:
+            raise RuntimeError('OpenCV not found! Video cannot be saved.')
+
+        self.filename = filename
+        self.framerate = framerate
+        self.codec = codec
+        self.size = None
+        self.num_frames = 0
+        self.video = None
+
+    def write(self, frame, bgr=False):
+        """Encodes a frame.
+
+        Arguments:
+
+        :frame: array of shape (height, width, 3) with the RGB pixels of the
+        frame (as returned by mlab.screenshot).
+
+        :bgr: whether the pixels of `frame` are in BGR order instead (as
+        returned by OpenCV). Defaults to False.
+        """
+        height, width, _ = frame.shape
+
+        if self.video is None:
+            self.size = (width, height)
+            self.video = cv2.VideoWriter(self.filename,
+                                         _fourcc(self.codec),
+                                         self.framerate,
+                                         self.size)
+        elif (width, height) != self.size:
+            msg = 'Frame %d has invalid resolution!' % (self.num_frames+1)
+            raise RuntimeError(msg)
+
+        if not bgr:
+            # OpenCV expects BGR pixels.
+            frame = np.ascontiguousarray(frame[:, :, ::-1])
+
+        self.video.write(frame)
+        self.num_frames += 1
+
+    def close(self):
+        if self.video is not None:
+            self.video.release()
+            self.video = None
+
+
+def concatenate_videos(filenames, output, framerate, codec='XVID'):
+    """Writes the frames of several videos, in order, into a new video.
+
+    Arguments:
+
+    :filenames: paths of the videos to concatenate.
+
+    :output: path of the resulting video.
+
+    :framerate: framerate of the resulting video.
+
+    :codec: FOURCC code of the video codec (defaults to XVID).
+    """
+    writer = VideoWriter(output, framerate, codec=codec)
+
+    try:
+        for filename in filenames:
+            capture = cv2.VideoCapture(filename)
+            while True:
+                success, frame = capture.read()
+                if not success:
+                    break
+                writer.write(frame, bgr=True)
+            capture.release()
+    finally:
+        writer.close()
+
+    return writer.num_frames
+
+
+class BackgroundVideoWriter(object):
+
+    """Video writer that encodes frames in a worker thread.
+
+    Frames are put into a bounded queue consumed by the worker, so rendering
+    and encoding overlap (OpenCV releases the GIL while encoding). When the
+    queue is full, `write` either waits for the worker to catch up or drops
+    the frame, depending on `drop_frames`.
+    """
+
+    def __init__(self, writer, queue_size=32, drop_frames=False):
+        """Starts the encoding worker.
+
+        Arguments:
+
+        :writer: the VideoWriter that will encode the frames.
+
+        :queue_size: maximum number of frames waiting to be encoded
+        (defaults to 32).
+
+        :drop_frames: whether to drop new frames when the queue is full
+        instead of blocking until there is room for them (defaults to False).
+        The number of dropped frames is kept in `dropped_frames`.
+        """
+        self.writer = writer
+        self.queue = Queue.Queue(maxsize=queue_size)
+        self.drop_frames = drop_frames
+        self.dropped_frames = 0
+        self.error = None
+
+        self.worker = threading.Thread(target=self._encode)
+        self.worker.daemon = True
+        self.worker.start()
+
+    def _encode(self):
+        while True:
+            frame = self.queue.get()
+            if frame is None:
+                break
+            if self.error is not None:
+                # Keep draining the queue so that the producer never blocks.
+                continue
+            try:
+                self.writer.write(frame)
+            except Exception as e:
+                self.error = e
+
+    def write(self, frame):
+        """Queues a frame for encoding (see VideoWriter.write)."""
+        if self.error is not None:
+            raise self.error
+
+        if not self.drop_frames:
+            self.queue.put(frame)
+            return
+
+        try:
+            self.queue.put_nowait(frame)
+        except Queue.Full:
+            self.dropped_frames += 1
+
+    def close(self):
+        """Waits for the queued frames to be encoded and closes the video."""
+        self.queue.put(None)
+        self.worker.join()
+        self.writer.close()
+
+        if self.dropped_frames > 0:
+            print '%d frames were dropped while encoding the video.' % self.dropped_frames
+
+        if self.error is not None:
+            raise self.error
@@ -1,264 +1,294 @@
-import re
+import numpy as np
 
+from arrays import cell_offsets, pack_cells
 from geometry import Geometry, GeometryParser
+from mesh import PolyhedronMesh
 from polyhedron import Polyhedron
+from readers import CellType, LegacyReader, read_VTK
 
-from tvtk.api import tvtk
 
-
-class CellType(object):
+class CellSource(object):
     
-    VTK_VERTEX = 1
-    VTK_POLY_VERTEX = 2
-    VTK_LINE = 3
-    VTK_POLY_LIN = 4
-    VTK_TRIANGLE = 5
-    VTK_TRIANGLE_STRIP = 6
-    VTK_POLYGON = 7
-    VTK_PIXEL = 8
-    VTK_QUAD = 9
-    VTK_TETRA = 10
-    VTK_VOXEL = 11
-    VTK_HEXAHEDRON = 12
-    VTK_WEDGE = 13
-    VTK_PYRAMID = 14 
-
-
-class VTKParser(GeometryParser):
+    """Raw cells of a parsed VTK file, whose polyhedrons are built on demand
+    (see Geometry.set_source).
     
-    SUPPORTED_CELL_TYPES = [
-        CellType.VTK_TRIANGLE,
-        CellType.VTK_QUAD,
-        CellType.VTK_PIXEL,
-        CellType.VTK_TETRA,
-        CellType.VTK_VOXEL,
-    ]
+    Cells get consecutive IDs starting from `first_id`. A Polyhedron is built
+    from the points of its cell when first requested or, if a mesh is given,
+    a view of it (see mesh.PolyhedronMesh).
     
-    def _build_geometry(self, points, cells):
-        geometry = Geometry()
+    Names of the form 'Tetra-127-139-3-84' (see VTKParser) are never stored.
+    Instead, cells are indexed by a 64-bit hash of their type and their
+    sorted point indices: names are parsed back into this key and looked up
+    with a binary search (the order of the points in the name is therefore
+    irrelevant).
+    """
+    
+    def __init__(self, parser, points, cells, offsets, cell_types, first_id,
+                 mesh=None):
+        self.parser = parser
+        self.points = points
+        self.cells = cells
+        self.offsets = offsets
+        self.cell_types = cell_types
+        self.first_id = first_id
+        self.mesh = mesh
+        self.hashes = None
+        self.locator = None
+        self.types_by_name = dict((name, cell_type) for cell_type, name
+                                  in parser.CELL_NAMES.items())
         
-        for cell in cells:
-            cell_type, cell = cell[0], cell[1:]           
-                
-            if cell_type == CellType.VTK_TRIANGLE:
-                poly, name = self._build_triangle(cell, points)
-            if cell_type == CellType.VTK_QUAD:
-                poly, name = self._build_quadrilateral(cell, points)
-            if cell_type == CellType.VTK_PIXEL:
-                poly, name = self._build_pixel(cell, points)
-            if cell_type == CellType.VTK_TETRA:
-                poly, name = self._build_tetrahedron(cell, points)
-            elif cell_type == CellType.VTK_VOXEL:
-                poly, name = self._build_voxel(cell, points)
-
-            geometry.add_named_polyhedron(poly, name, self.current_id)
-            self.current_id += 1
+        self.templates = dict()
+        for cell_type, faces in parser.CELL_FACES.items():
+            self.templates[cell_type] = pack_cells(np.array(faces)), len(faces)
         
-        return geometry
+    def __len__(self):
+        return len(self.offsets)
     
-    def _get_cell_points(self, cell, points):
-        cell_points = tvtk.Points()
-        
-        for idx in cell:
-            vertex = points[idx]
-            cell_points.insert_next_point(vertex)
-            
-        return cell_points
+    def ids(self):
+        return xrange(self.first_id, self.first_id + len(self.offsets))
+    
+    def has_id(self, pid):
+        return self.first_id <= pid < self.first_id + len(self.offsets)
+    
+    def _cell(self, pid):
+        index = pid - self.first_id
+        offset = self.offsets[index]
+        return self.cell_types[index], self.cells[offset+1:offset+1+self.cells[offset]]
     
-    def _build_triangle(self, cell, points):
-        faces = tvtk.CellArray()
+    def name(self, pid):
+        cell_type, cell = self._cell(pid)
+        return self.parser._cell_name(cell_type, cell)
+    
+    def _hash(self, cell_type, keys):
+        # FNV-1a over the cell type and the (sorted) point indices.
+        hashes = np.empty(len(keys), dtype=np.uint64)
+        hashes[:] = 14695981039346656037 ^ int(cell_type)
+        for column in keys.T:
+            hashes ^= column.astype(np.uint64)
+            hashes *= np.uint64(1099511628211)
+        return hashes
+    
+    def _keys(self, indices):
+        # Sorted point indices of cells of the same type.
+        size = self.cells[self.offsets[indices[0]]]
+        keys = self.cells[self.offsets[indices][:, None] + 1 + np.arange(size)]
+        return np.sort(keys, axis=1)
+    
+    def _build_index(self):
+        hashes = list()
+        indices = list()
         
-        polygon = tvtk.Polygon()
-        polygon.point_ids.number_of_ids = 3
-        polygon.point_ids.set_id(0, 0)
-        polygon.point_ids.set_id(1, 1)
-        polygon.point_ids.set_id(2, 2)    
-        faces.insert_next_cell(polygon)      
-
-        cell_points = self._get_cell_points(cell, points)
+        for cell_type in np.unique(self.cell_types):
+            type_indices = np.flatnonzero(self.cell_types == cell_type)
+            hashes.append(self._hash(cell_type, self._keys(type_indices)))
+            indices.append(type_indices)
         
-        poly = Polyhedron(cell_points, faces)
-        name = 'Triang-{}-{}-{}'.format(*cell)
+        hashes = np.concatenate(hashes) if hashes else np.zeros(0, np.uint64)
+        indices = np.concatenate(indices) if indices else np.zeros(0, np.int64)
         
-        return poly, name
+        order = np.argsort(hashes, kind='mergesort')
+        self.hashes = hashes[order]
+        self.hash_cells = indices[order]
     
-    def _build_quadrilateral(self, cell, points):
-        faces = tvtk.CellArray()
+    def _parse_name(self, name):
+        # Returns the cell type and the sorted point indices of a cell name,
+        # or None if the name does not denote a valid cell.
+        fields = name.split('-')
+        cell_type = self.types_by_name.get(fields[0])
+        if cell_type is None or\
+           len(fields) != self.parser.CELL_SIZES[cell_type] + 1:
+            return None
+        try:
+            return cell_type, sorted(int(field) for field in fields[1:])
+        except ValueError:
+            return None
+    
+    def lookup_many(self, names):
+        """Returns an array with the ID of the cell of each given name (-1 for
+        names that do not match any cell).
         
-        polygon = tvtk.Polygon()
-        polygon.point_ids.number_of_ids = 4
-        polygon.point_ids.set_id(0, 0)
-        polygon.point_ids.set_id(1, 1)
-        polygon.point_ids.set_id(2, 2)
-        polygon.point_ids.set_id(3, 3)
-        faces.insert_next_cell(polygon)      
-
-        cell_points = self._get_cell_points(cell, points)
+        Arguments:
+        
+        :names: a list of cell names.
+        """
+        if self.hashes is None:
+            self._build_index()
+        
+        ids = np.empty(len(names), dtype=np.int64)
+        ids[:] = -1
         
-        poly = Polyhedron(cell_points, faces)
-        name = 'Quad-{}-{}-{}-{}'.format(*cell)
+        # Names are grouped by cell type, so that every group is hashed and
+        # searched at once.
+        groups = dict()
+        for position, name in enumerate(names):
+            key = self._parse_name(name)
+            if key is not None:
+                positions, keys = groups.setdefault(key[0], (list(), list()))
+                positions.append(position)
+                keys.append(key[1])
         
-        return poly, name
+        for cell_type, (positions, keys) in groups.items():
+            positions = np.array(positions)
+            keys = np.array(keys, dtype=np.int64)
+            hashes = self._hash(cell_type, keys)
+            
+            starts = np.searchsorted(self.hashes, hashes, side='left')
+            ends = np.searchsorted(self.hashes, hashes, side='right')
+            
+            # Candidates are verified, as different cells may share a hash.
+            # Unique hashes (by far the most common case) are checked at once.
+            unique = np.flatnonzero(ends - starts == 1)
+            candidates = self.hash_cells[starts[unique]]
+            if len(unique) > 0:
+                matches = self.cell_types[candidates] == cell_type
+                unique, candidates = unique[matches], candidates[matches]
+            if len(unique) > 0:
+                matches = (self._keys(candidates) == keys[unique]).all(axis=1)
+                ids[positions[unique[matches]]] = self.first_id + candidates[matches]
+            
+            for i in np.flatnonzero(ends - starts > 1):
+                for index in self.hash_cells[starts[i]:ends[i]]:
+                    if self.cell_types[index] == cell_type and\
+                       (self._keys(np.array([index]))[0] == keys[i]).all():
+                        ids[positions[i]] = self.first_id + index
+                        break
+        
+        return ids
+    
+    def lookup(self, name):
+        """Returns the ID of the cell with the given name (or None)."""
+        pid = self.lookup_many([name])[0]
+        return pid if pid >= 0 else None
     
-    def _build_pixel(self, cell, points):
-        faces = tvtk.CellArray()
+    def locate(self, points):
+        """Returns an array with the ID of the cell containing each given
+        point (-1 for points outside every cell). See spatial.CellLocator.
         
-        polygon = tvtk.Polygon()
-        polygon.point_ids.number_of_ids = 4
-        polygon.point_ids.set_id(0, 0)
-        polygon.point_ids.set_id(1, 1)
-        polygon.point_ids.set_id(2, 2)
-        polygon.point_ids.set_id(3, 3)
-        faces.insert_next_cell(polygon)      
-
-        cell_points = self._get_cell_points(cell, points)
+        Arguments:
         
-        poly = Polyhedron(cell_points, faces)
-        name = 'Pixel-{}-{}-{}-{}'.format(*cell)
+        :points: array of shape (n, 3) with the query points.
+        """
+        if self.locator is None:
+            from spatial import CellLocator
+            self.locator = CellLocator(self.points, self.cells, self.offsets,
+                                       self.cell_types)
         
-        return poly, name
+        indices = self.locator.locate(points)
+        return np.where(indices >= 0, self.first_id + indices, -1)
     
-    def _build_tetrahedron(self, cell, points):
-        faces = tvtk.CellArray()
+    def build(self, pid):
+        if self.mesh is not None:
+            return self.mesh.get_view(pid)
         
-        for i0,i1,i2 in [(0,1,2), (0,3,1), (0,2,3), (1,3,2)]:
-            polygon = tvtk.Polygon()
-            polygon.point_ids.number_of_ids = 3
-            polygon.point_ids.set_id(0, i0)
-            polygon.point_ids.set_id(1, i1)
-            polygon.point_ids.set_id(2, i2)          
-            faces.insert_next_cell(polygon)
+        cell_type, cell = self._cell(pid)
+        faces, n_faces = self.templates[cell_type]
+        return Polyhedron.from_arrays(self.points[cell], faces, n_faces)
+
 
-        cell_points = self._get_cell_points(cell, points)
+class VTKParser(GeometryParser):
+    
+    SUPPORTED_CELL_TYPES = [
+        CellType.VTK_TRIANGLE,
+        CellType.VTK_QUAD,
+        CellType.VTK_PIXEL,
+        CellType.VTK_TETRA,
+        CellType.VTK_VOXEL,
+    ]
+    
+    CELL_SIZES = {
+        CellType.VTK_TRIANGLE: 3,
+        CellType.VTK_QUAD: 4,
+        CellType.VTK_PIXEL: 4,
+        CellType.VTK_TETRA: 4,
+        CellType.VTK_VOXEL: 8,
+    }
+    
+    # Faces of each supported cell type, given as indices of the cell points.
+    CELL_FACES = {
+        CellType.VTK_TRIANGLE: [(0,1,2)],
+        CellType.VTK_QUAD: [(0,1,2,3)],
+        CellType.VTK_PIXEL: [(0,1,2,3)],
+        CellType.VTK_TETRA: [(0,1,2), (0,3,1), (0,2,3), (1,3,2)],
+        CellType.VTK_VOXEL: [(0,1,3,2), (1,3,7,5), (5,7,6,4), (4,0,2,6),
+                             (6,2,3,7), (0,1,5,4)],
+    }
+    
+    CELL_NAMES = {
+        CellType.VTK_TRIANGLE: 'Triang',
+        CellType.VTK_QUAD: 'Quad',
+        CellType.VTK_PIXEL: 'Pixel',
+        CellType.VTK_TETRA: 'Tetra',
+        CellType.VTK_VOXEL: 'Voxel',
+    }
+    
+    def _build_geometry(self, points, cells, offsets, cell_types):
+        # Polyhedrons are built lazily, from the raw arrays kept by the cell
+        # source. In merged mode, only the mesh is built upfront.
+        mesh = None
+        if self.merged:
+            mesh = self._build_mesh(points, cells, offsets, cell_types)
         
-        poly = Polyhedron(cell_points, faces)
-        name = 'Tetra-{}-{}-{}-{}'.format(*cell)
+        geometry = Geometry()
+        geometry.set_mesh(mesh)
+        geometry.set_source(CellSource(self, points, cells, offsets,
+                                       cell_types, self.current_id, mesh))
         
-        return poly, name
+        self.current_id += len(offsets)
         
-    def _build_voxel(self, cell, points):
-        faces = tvtk.CellArray()
+        return geometry
+    
+    def _build_mesh(self, points, cells, offsets, cell_types):
+        # Every cell becomes a set of faces of a single mesh. Cells of the
+        # same type are processed together.
+        cell_ids = self.current_id + np.arange(len(offsets))
         
-        for i0,i1,i2,i3 in [(0,1,3,2), (1,3,7,5), (5,7,6,4), (4,0,2,6),
-                            (6,2,3,7), (0,1,5,4)]:
-            polygon = tvtk.Polygon()
-            polygon.point_ids.number_of_ids = 4
-            polygon.point_ids.set_id(0, i0)
-            polygon.point_ids.set_id(1, i1)
-            polygon.point_ids.set_id(2, i2)
-            polygon.point_ids.set_id(3, i3)     
-            faces.insert_next_cell(polygon)
+        faces = list()
+        face_ids = list()
+        n_faces = 0
         
-        cell_points = self._get_cell_points(cell, points)
+        for cell_type in np.unique(cell_types):
+            indices = np.flatnonzero(cell_types == cell_type)
+            size = self.CELL_SIZES[cell_type]
+            type_cells = cells[offsets[indices][:, None] + 1 + np.arange(size)]
+            template = np.array(self.CELL_FACES[cell_type])
+            
+            # Shape: (cells, faces per cell, points per face).
+            type_faces = type_cells[:, template]
+            n_type_faces = type_faces.shape[0] * type_faces.shape[1]
+            
+            faces.append(pack_cells(type_faces.reshape((n_type_faces, -1))))
+            face_ids.append(np.repeat(cell_ids[indices], len(template)))
+            n_faces += n_type_faces
+            
+        return PolyhedronMesh(points,
+                              np.concatenate(faces),
+                              n_faces,
+                              np.concatenate(face_ids))
+    
+    def _cell_name(self, cell_type, cell):
+        return '-'.join([self.CELL_NAMES[cell_type]] + map(str, cell))
+    
+    def _check_cells(self, points, cells, offsets, cell_types):
+        supported = np.in1d(cell_types, self.SUPPORTED_CELL_TYPES)
+        if not supported.all():
+            cell_type = cell_types[np.flatnonzero(~supported)[0]]
+            raise Exception('Cell type {} not supported!'.format(cell_type))
         
-        poly = Polyhedron(cell_points, faces)
-        name = 'Voxel-{}-{}-{}-{}-{}-{}-{}-{}'.format(*cell)
+        sizes = np.zeros(max(self.CELL_SIZES)+1, dtype=np.int64)
+        for cell_type, size in self.CELL_SIZES.items():
+            sizes[cell_type] = size
+        if (cells[offsets] != sizes[cell_types]).any():
+            raise Exception('Wrong cell format!')
         
-        return poly, name
+        indices = np.delete(cells, offsets)
+        if len(indices) > 0 and\
+           (indices.min() < 0 or indices.max() >= len(points)):
+            raise Exception('Cell point index out of range!')
     
     def parse(self):
-        points = list()
-        cells = list()
+        points, cells, cell_types = read_VTK(self.filename)
+        offsets = cell_offsets(cells, len(cell_types))
         
-        point_regexp = 'POINTS\s+(\d+)\s+([a-zA-Z]+)'
-        cell_regexp = 'CELLS\s+(\d+)'
-        cell_types_regexp = 'CELL_TYPES\s+(\d+)'
-
-        with open(self.filename, 'r') as _file:
-            lines = _file.readlines()
-            
-            i = k = 0
-            n_points = n_cells = 0
-            
-            for line in lines:
-                line = line.strip()
-                
-                if i == 0:
-                    if line != '# vtk DataFile Version 2.0' and\
-                       line != '# vtk DataFile Version 3.0':
-                        raise Exception('Wrong format!')
-                    i += 1
-                    continue
-                    
-                if not line or line[0] == '#':
-                    k += 1
-                    continue
-                
-                if i == 2:
-                    if line != 'ASCII':
-                        raise Exception('Binary input not supported!')
-                    
-                if i == 3:
-                    if line != 'DATASET UNSTRUCTURED_GRID':
-                        raise Exception('VTK dataset must be unstructured grid!')
-                    
-                if i == 4:
-                    match = re.match(point_regexp, line)
-                    
-                    if match is None:
-                        raise Exception('Line {}: wrong point declaration format!'.format(i+k))
-                    
-                    n_points, _ = match.groups()
-                    
-                    try:
-                        n_points = int(n_points)
-                    except Exception:
-                        raise Exception('Line {}: wrong number of points!'.format(i+k))
-                    
-                if i >= 5 and len(points) < n_points:
-                    try:
-                        values = map(float, line.split())
-                    except Exception:
-                        raise Exception('Line {}: invalid point coordinates!'.format(i+k))
-                        
-                    points.append(tuple(values))
-                    
-                if i == n_points+5:
-                    match = re.match(cell_regexp, line)
-                    
-                    if match is None:
-                        raise Exception('Line {}: wrong cell declaration format!'.format(i+k))
-                    
-                    n_cells = match.groups()[0]
-                    
-                    try:
-                        n_cells = int(n_cells)
-                    except Exception:
-                        raise Exception('Line {}: wrong number of cells!'.format(i+k))
-                    
-                if i > n_points+5 and len(cells) < n_cells:
-                    match = re.findall('\d+', line)
-                    
-                    if len(match) == 0:
-                        raise Exception('Line {}: wrong cell format!'.format(i+k))
-                    
-                    n_points_in_cell = int(match[0])
-                    
-                    if len(match) != 1+n_points_in_cell:
-                        raise Exception('Line {}: wrong cell format!'.format(i+k))
-                    
-                    cell = list(map(int, match[1:]))
-                    
-                    cells.append(cell)
-                    
-                if i == n_points+n_cells+6:
-                    match = re.match(cell_types_regexp, line)
-                    
-                    if match is None:
-                        raise Exception('Line {}: wrong cell types declaration format!'.format(i+k))
-                    
-                if i > n_points+n_cells+6:
-                    match = re.findall('\d+', line)
-                    
-                    if len(match) == 0:
-                        raise Exception('Line {}: wrong cell type format!'.format(i+k))
-                    
-                    cell_type = int(match[0])
-                    if cell_type not in self.SUPPORTED_CELL_TYPES:
-                        raise Exception('Line {}: cell type {} not supported!'.format(i+k, cell_type))
-                    
-                    cells[i-n_points-n_cells-7].insert(0, cell_type)
-                    
-                i += 1
-                    
-        return self._build_geometry(points, cells)
\ No newline at end of file
+        self._check_cells(points, cells, offsets, cell_types)
+        
+        return self._build_geometry(points, cells, offsets, cell_types)
@@ -0,0 +1,95 @@
+import os
+import sys
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+try:
+    from mlab_tools.animation import Animation
+    from mlab_tools.mesh import PolyhedronMesh
+    from mlab_tools.polyline import LODPolyLine
+except ImportError as e:
+    missing = 'Missing dependency: {}'.format(e)
+else:
+    missing = None
+
+
+if not missing:
+
+    class SceneAnimation(Animation):
+
+        # Animation without a figure, which records the actors added to the
+        # renderer.
+
+        def __init__(self):
+            self.obj_animations = dict()
+            self.group_animations = dict()
+            self.frame_callbacks = list()
+            self.scene_objects = set()
+            self.actor_refs = dict()
+            self.lod_objects = set()
+            self.actors = list()
+
+        def _add_actor(self, actor):
+            self.actors.append(actor)
+
+        def _remove_actor(self, actor):
+            self.actors.remove(actor)
+
+
+def make_mesh():
+    # Two triangles, with IDs 1 and 2.
+    points = np.array([(0, 0, 0), (1, 0, 0), (0, 1, 0), (1, 1, 0)])
+    faces = np.array([3, 0, 1, 2, 3, 1, 3, 2])
+    return PolyhedronMesh(points, faces, 2, [1, 2])
+
+
+@unittest.skipIf(missing, missing)
+class TestScene(unittest.TestCase):
+
+    def test_shared_actor(self):
+        animation = SceneAnimation()
+        mesh = make_mesh()
+        first, second = mesh.get_view(1), mesh.get_view(2)
+
+        animation.add_static_object(first)
+        animation.add_static_object(second)
+        animation.add_static_object(second)
+        self.assertEqual(animation.actors, [mesh.get_actor()])
+        self.assertEqual(animation.actor_refs[mesh.get_actor()], 2)
+
+        animation.remove_object(first)
+        self.assertEqual(animation.actors, [mesh.get_actor()])
+        animation.remove_object(second)
+        animation.remove_object(second)
+        self.assertEqual(animation.actors, [])
+        self.assertEqual(animation.actor_refs, dict())
+
+    def test_scene_hooks(self):
+        animation = SceneAnimation()
+        mesh = make_mesh()
+        view = mesh.get_view(2)
+
+        animation.add_static_object(view)
+        self.assertEqual(list(mesh.view_refs), [0, 1])
+        animation.add_object(mesh)
+        self.assertTrue(mesh.in_scene)
+
+        animation.remove_object(mesh)
+        animation.remove_object(view)
+        self.assertFalse(mesh.in_scene)
+        self.assertEqual(list(mesh.view_refs), [0, 0])
+
+    def test_levels_of_detail(self):
+        animation = SceneAnimation()
+        line = LODPolyLine([(0, 0, 0), (1, 0, 0), (2, 0, 0)])
+
+        animation.add_static_object(line)
+        self.assertEqual(animation.lod_objects, set([line]))
+        animation.remove_object(line)
+        self.assertEqual(animation.lod_objects, set())
+
+
+if __name__ == '__main__':
+    unittest.main()
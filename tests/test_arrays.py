@@ -0,0 +1,42 @@
+import os
+import sys
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+from mlab_tools.arrays import GrowableArray
+
+
+class TestGrowableArray(unittest.TestCase):
+
+    def test_extend(self):
+        array = GrowableArray((3,), np.float64, capacity=2)
+        self.assertFalse(array.extend([(0, 0, 0), (1, 1, 1)]))
+        data = array.data
+
+        # The capacity doubles when the buffer gets full.
+        self.assertTrue(array.extend([(2, 2, 2)]))
+        self.assertEqual(len(array.data), 4)
+        self.assertFalse(array.extend([(3, 3, 3)]))
+
+        self.assertEqual(len(array), 4)
+        np.testing.assert_array_equal(array.view(), np.repeat(np.arange(4), 3)
+                                                      .reshape((4, 3)))
+        np.testing.assert_array_equal(data, array.view()[:2])
+
+    def test_large_extend(self):
+        array = GrowableArray((), np.int64, capacity=4)
+        self.assertTrue(array.extend(np.arange(10)))
+        self.assertEqual(len(array.data), 10)
+        np.testing.assert_array_equal(array.view(), np.arange(10))
+
+    def test_view(self):
+        array = GrowableArray((), np.int64)
+        array.extend([1, 2])
+        array.view()[0] = 5
+        np.testing.assert_array_equal(array.view(), [5, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
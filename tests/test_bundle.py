@@ -0,0 +1,81 @@
+import os
+import sys
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+from mlab_tools.arrays import concatenated_ranges
+
+try:
+    from mlab_tools.bundle import TrajectoryBundle
+except ImportError as e:
+    missing = 'Missing dependency: {}'.format(e)
+else:
+    missing = None
+
+
+TRACKS = [[(0, 0, 0), (1, 0, 0), (2, 0, 0)],
+          [(0, 1, 0), (0, 2, 0)]]
+
+
+def cells(bundle):
+    data = bundle.poly_data.lines.data
+    return [data.get_value(i) for i in xrange(data.number_of_tuples)]
+
+
+class TestConcatenatedRanges(unittest.TestCase):
+
+    def test_ranges(self):
+        np.testing.assert_array_equal(concatenated_ranges([5, 0, 9], [2, 0, 3]),
+                                      [5, 6, 9, 10, 11])
+        self.assertEqual(len(concatenated_ranges([], [])), 0)
+
+
+@unittest.skipIf(missing, missing)
+class TestTrajectoryBundle(unittest.TestCase):
+
+    def test_reveal(self):
+        bundle = TrajectoryBundle(TRACKS, ids=[7, 3], initial_frames=[1, 2])
+        lines = bundle.poly_data.lines.data
+
+        self.assertFalse(bundle.reveal(1))
+        # Slots of hidden points refer to the head of their track (points 5
+        # and 6), placed on its last visible point.
+        self.assertEqual(cells(bundle), [3, 0, 5, 5, 2, 6, 6])
+        np.testing.assert_array_equal(bundle.points[5], (0, 0, 0))
+
+        self.assertFalse(bundle.reveal(2))
+        self.assertEqual(cells(bundle), [3, 0, 1, 5, 2, 3, 6])
+        np.testing.assert_array_equal(bundle.points[5], (1, 0, 0))
+
+        self.assertTrue(bundle.reveal(3))
+        self.assertEqual(cells(bundle), [3, 0, 1, 2, 2, 3, 4])
+        # The connectivity is updated in place.
+        self.assertEqual(bundle.poly_data.lines.data, lines)
+
+    def test_colors(self):
+        bundle = TrajectoryBundle(TRACKS, ids=[7, 3], initial_frames=[1, 2])
+        bundle.reveal(1)
+        colors = bundle.poly_data.cell_data.get_array('colors')
+        # Tracks without visible points are transparent.
+        self.assertEqual(colors.get_tuple4(0), (255, 255, 255, 255))
+        self.assertEqual(colors.get_tuple4(1)[3], 0)
+
+        bundle.update_tracks(3, color=(1, 0, 0))
+        bundle.reveal(2)
+        self.assertEqual(colors.get_tuple4(1), (255, 0, 0, 255))
+
+        bundle.hide_tracks(7)
+        self.assertEqual(colors.get_tuple4(0)[3], 0)
+
+    def test_remove(self):
+        bundle = TrajectoryBundle(TRACKS)
+        bundle.remove_tracks(0)
+        self.assertEqual(cells(bundle)[:4], [3, 5, 5, 5])
+        self.assertTrue(bundle.reveal(10))
+        self.assertRaises(Exception, bundle.remove_tracks, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+from mlab_tools.cache import GeometryCache, warm
+
+
+class CountingReader(object):
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, filename):
+        self.calls += 1
+        with open(filename) as _file:
+            data = _file.read()
+        return np.array([len(data)]), len(data)
+
+
+class TestGeometryCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = GeometryCache(os.path.join(self.directory, 'cache'))
+        self.filename = os.path.join(self.directory, 'test.off')
+        self._write('abc')
+        self.reader = CountingReader()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _write(self, contents):
+        with open(self.filename, 'w') as _file:
+            _file.write(contents)
+
+    def _read(self):
+        return self.cache.read(self.filename, 'off', self.reader)
+
+    def test_read(self):
+        array, size = self._read()
+        self.assertTrue(self.cache.is_cached(self.filename, 'off'))
+
+        cached_array, cached_size = self._read()
+        self.assertEqual(self.reader.calls, 1)
+        np.testing.assert_array_equal(cached_array, array)
+        self.assertEqual(cached_size, 3)
+        self.assertIsInstance(cached_size, int)
+
+    def test_key(self):
+        self._read()
+
+        # A new size or modification time makes the entry stale.
+        self._write('abcd')
+        self.assertFalse(self.cache.is_cached(self.filename, 'off'))
+        self.assertEqual(self._read()[1], 4)
+        self.assertEqual(self.reader.calls, 2)
+
+        stat = os.stat(self.filename)
+        os.utime(self.filename, (stat.st_atime, stat.st_mtime + 10))
+        self._read()
+        self.assertEqual(self.reader.calls, 3)
+
+        # Entries of other readers are kept apart.
+        self.assertFalse(self.cache.is_cached(self.filename, 'vtk'))
+
+    def test_broken_entry(self):
+        self._read()
+        path = self.cache.path(self.filename, 'off')
+        with open(path, 'w') as _file:
+            _file.write('broken')
+
+        self.assertEqual(self._read()[1], 3)
+        self.assertEqual(self.reader.calls, 2)
+        self._read()
+        self.assertEqual(self.reader.calls, 2)
+
+    def test_disabled(self):
+        cache = GeometryCache('off')
+        cache.read(self.filename, 'off', self.reader)
+        cache.read(self.filename, 'off', self.reader)
+
+        self.assertEqual(self.reader.calls, 2)
+        self.assertFalse(cache.is_cached(self.filename, 'off'))
+        self.assertFalse(os.path.exists(self.cache.directory))
+
+    def test_warm(self):
+        self._write('OFF\n3 1 0\n0 0 0\n1 0 0\n0 1 0\n3 0 1 2\n')
+
+        self.assertEqual(warm(self.directory, cache=self.cache), (1, 0))
+        self.assertTrue(self.cache.is_cached(self.filename, 'off'))
+        self.assertEqual(warm(self.directory, cache=self.cache), (0, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
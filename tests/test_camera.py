@@ -0,0 +1,165 @@
+import os
+import sys
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+from mlab_tools.camera import Camera, CameraPath
+
+try:
+    from mayavi import mlab
+    from tvtk.api import tvtk
+except ImportError as e:
+    missing = 'Missing dependency: {}'.format(e)
+else:
+    missing = None
+
+
+def keyframes(*pairs, **kwargs):
+    easing = kwargs.get('easing', 'linear')
+    return [(float(frame), np.array([value], dtype=np.float64), easing)
+            for frame, value in pairs]
+
+
+class TestCameraPath(unittest.TestCase):
+
+    def _interpolate(self, interpolation, keys, frames):
+        path = CameraPath(interpolation=interpolation)
+        return path._interpolate(keys, np.asarray(frames, dtype=np.float64))[:, 0]
+
+    def test_endpoints(self):
+        keys = keyframes((1, 10), (5, 30), (11, -2))
+        frames = [-3, 1, 5, 11, 20]
+        for interpolation in ('linear', 'spline'):
+            values = self._interpolate(interpolation, keys, frames)
+            np.testing.assert_allclose(values, [10, 10, 30, -2, -2])
+
+    def test_linear(self):
+        keys = keyframes((1, 0), (5, 8))
+        values = self._interpolate('linear', keys, [2, 3, 4])
+        np.testing.assert_allclose(values, [2, 4, 6])
+
+    def test_spline_of_line(self):
+        # Catmull-Rom splines reproduce evenly spaced linear data.
+        keys = keyframes((0, 0), (2, 2), (4, 4), (6, 6))
+        values = self._interpolate('spline', keys, np.arange(7))
+        np.testing.assert_allclose(values, np.arange(7))
+
+    def test_easing(self):
+        frames = [0, 1, 2, 3, 4]
+        expected = {'linear' : [0, 0.25, 0.5, 0.75, 1],
+                    'ease_in' : [0, 0.0625, 0.25, 0.5625, 1],
+                    'ease_out' : [0, 0.4375, 0.75, 0.9375, 1],
+                    'ease_in_out' : [0, 0.15625, 0.5, 0.84375, 1]}
+        for easing, values in expected.items():
+            keys = keyframes((0, 0), (4, 1), easing=easing)
+            np.testing.assert_allclose(self._interpolate('linear', keys, frames),
+                                       values)
+
+    def test_keyframes_at_times(self):
+        path = CameraPath(interpolation='linear', time_per_frame=0.5)
+        path.add_keyframe(time=0, focalpoint=(0, 0, 0), distance=1,
+                          azimuth=0, elevation=90, roll=0)
+        path.add_keyframe(time=2, distance=5)
+
+        self.assertEqual(path.first_frame(), 1)
+        self.assertEqual(path.last_frame(), 5)
+        self.assertAlmostEqual(path.parameters(3)['distance'], 3)
+
+
+    def test_state(self):
+        path = CameraPath()
+        path.add_keyframe(frame=1, focalpoint=(1, 2, 3), distance=2,
+                          azimuth=90, elevation=90, roll=10)
+        focalpoint, position, view_up, roll, params = path.state(1)
+
+        np.testing.assert_allclose(position, (1, 4, 3), atol=1e-12)
+        np.testing.assert_allclose(view_up, (0, 0, 1), atol=1e-12)
+        self.assertEqual(roll, 10)
+        self.assertEqual(params['distance'], 2)
+
+
+class FakeView(object):
+
+    # Stands for mlab.view and mlab.roll, which need a figure.
+
+    def __init__(self):
+        self.state = (0, 90, 1, np.zeros(3))
+        self.calls = 0
+
+    def __call__(self, azimuth=None, elevation=None, distance=None,
+                 focalpoint=None, roll=None):
+        self.calls += 1
+        if azimuth is None and elevation is None and distance is None:
+            return self.state
+        self.state = (azimuth, elevation, distance, np.asarray(focalpoint))
+
+    def roll(self):
+        return 0
+
+
+class Scene(object):
+
+    def __init__(self):
+        self.camera = tvtk.Camera()
+        self.renderer = tvtk.Renderer(active_camera=self.camera)
+
+
+@unittest.skipIf(missing, missing)
+class TestCamera(unittest.TestCase):
+
+    def setUp(self):
+        self.mlab_view, self.mlab_roll = mlab.view, mlab.roll
+        self.view = mlab.view = FakeView()
+        mlab.roll = self.view.roll
+        self.scene = Scene()
+        self.camera = Camera(focalpoint=(0, 0, 0), distance=5, azimuth=30,
+                             elevation=90, scene=self.scene)
+
+    def tearDown(self):
+        mlab.view, mlab.roll = self.mlab_view, self.mlab_roll
+
+    def test_flush(self):
+        self.camera.update(distance=5, azimuth=60)
+        # Updates are only written when flushing.
+        np.testing.assert_allclose(self.scene.camera.position, (0, 0, 1))
+
+        self.camera.flush()
+        np.testing.assert_allclose(self.scene.camera.position, (0, 10, 0),
+                                   atol=1e-12)
+        self.assertAlmostEqual(self.scene.camera.get_roll(), 0)
+
+        m_time = self.scene.camera.m_time
+        self.camera.flush()
+        self.assertEqual(self.scene.camera.m_time, m_time)
+
+    def test_sync(self):
+        self.camera.update(azimuth=60)
+        self.camera.flush()
+        calls = self.view.calls
+
+        # The state is only read back when the camera was moved elsewhere.
+        self.assertEqual(self.camera.parameters()['azimuth'], 90)
+        self.assertEqual(self.view.calls, calls)
+
+        self.scene.camera.position = (7, 0, 0)
+        self.view.state = (0, 90, 7, np.zeros(3))
+        self.assertEqual(self.camera.parameters()['distance'], 7)
+        self.assertEqual(self.view.calls, calls + 1)
+
+    def test_follow(self):
+        path = CameraPath()
+        path.add_keyframe(frame=1, focalpoint=(1, 2, 3), distance=2,
+                          azimuth=90, elevation=90, roll=0)
+        path.add_keyframe(frame=3, distance=4)
+        self.camera.follow(path, 3)
+
+        np.testing.assert_allclose(self.scene.camera.position, (1, 6, 3),
+                                   atol=1e-12)
+        self.assertEqual(self.camera.parameters()['distance'], 4)
+        self.assertFalse(self.camera.changed)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import os
+import sys
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+try:
+    from tvtk.api import tvtk
+    from mlab_tools.group import ObjectGroup
+    from mlab_tools.object import Object, flush_updates
+    from mlab_tools.transformations import scaling_matrix, translation_matrix
+except ImportError as e:
+    missing = 'Missing dependency: {}'.format(e)
+else:
+    missing = None
+
+
+def make_group(n):
+    objects = list()
+    for _ in xrange(n):
+        obj = Object()
+        obj.actor = tvtk.Actor()
+        objects.append(obj)
+    return ObjectGroup(objects)
+
+
+def matrix(obj):
+    return obj.actor.matrix.to_array()
+
+
+@unittest.skipIf(missing, missing)
+class TestObjectGroup(unittest.TestCase):
+
+    def test_group_transform(self):
+        group = make_group(3)
+        group.apply(transform=translation_matrix((1, 2, 3)))
+        for obj in group.objects:
+            np.testing.assert_allclose(matrix(obj), translation_matrix((1, 2, 3)))
+
+    def test_same_object_transforms(self):
+        group = make_group(3)
+        group.apply(transform=[scaling_matrix(2)] * 3)
+
+        self.assertIsNone(group.object_transforms)
+        for obj in group.objects:
+            np.testing.assert_allclose(matrix(obj), scaling_matrix(2))
+
+    def test_object_transforms(self):
+        group = make_group(3)
+        group.apply(transform=[scaling_matrix(2)] * 3)
+        matrices = [translation_matrix((i, 0, 0)) for i in xrange(3)]
+        group.apply(transform=matrices)
+        group.apply(transform=translation_matrix((0, 1, 0)))
+
+        for obj, object_matrix in zip(group.objects, matrices):
+            expected = np.dot(translation_matrix((0, 1, 0)), object_matrix)
+            np.testing.assert_allclose(matrix(obj), expected)
+
+        # Unchanged matrices are not set again.
+        times = [t.m_time for t in group.object_transforms]
+        matrices[1] = scaling_matrix(3)
+        group.apply(transform=matrices)
+        self.assertEqual(group.object_transforms[0].m_time, times[0])
+        self.assertGreater(group.object_transforms[1].m_time, times[1])
+        np.testing.assert_allclose(matrix(group.objects[1]),
+                                   np.dot(translation_matrix((0, 1, 0)),
+                                          scaling_matrix(3)))
+
+    def test_colors(self):
+        group = make_group(2)
+        group.apply(colors=[(1, 0, 0), (0, 1, 0)], opacities=0.5)
+        flush_updates()
+
+        self.assertEqual(group.objects[0].actor.property.color, (1, 0, 0))
+        self.assertEqual(group.objects[1].actor.property.color, (0, 1, 0))
+        self.assertEqual(group.objects[1].actor.property.opacity, 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import os
+import sys
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+from mlab_tools.readers import CellType, LegacyReader
+
+
+VTK_HEADER = """# vtk DataFile Version 3.0
+Two cells
+{}
+DATASET UNSTRUCTURED_GRID
+"""
+
+POINTS = np.array([(0, 0, 0), (1, 0, 0), (0, 1, 0), (0, 0, 1), (1, 1, 1)],
+                  dtype=np.float64)
+CELLS = np.array([4, 0, 1, 2, 3, 3, 1, 2, 4])
+CELL_TYPES = np.array([CellType.VTK_TETRA, CellType.VTK_TRIANGLE])
+
+
+class TestLegacyReader(unittest.TestCase):
+
+    def _ascii(self):
+        return VTK_HEADER.format('ASCII') +\
+               'POINTS 5 float\n' +\
+               '\n'.join(' '.join(map(str, point)) for point in POINTS) +\
+               '\nCELLS 2 9\n4 0 1 2 3\n3 1 2 4\n' +\
+               'CELL_TYPES 2\n10\n5\n' +\
+               'CELL_DATA 2\nSCALARS id int 1\nLOOKUP_TABLE default\n1 2\n'
+
+    def _binary(self):
+        return VTK_HEADER.format('BINARY') +\
+               'POINTS 5 double\n' +\
+               POINTS.astype('>f8').tostring() +\
+               '\nCELLS 2 9\n' + CELLS.astype('>i4').tostring() +\
+               '\nCELL_TYPES 2\n' + CELL_TYPES.astype('>i4').tostring() + '\n'
+
+    def _check(self, data):
+        points, cells, cell_types = LegacyReader(data).read()
+
+        np.testing.assert_array_equal(points, POINTS)
+        np.testing.assert_array_equal(cells, CELLS)
+        np.testing.assert_array_equal(cell_types, CELL_TYPES)
+
+    def test_ascii(self):
+        self._check(self._ascii())
+
+    def test_binary(self):
+        self._check(self._binary())
+
+    def test_binary_float_points(self):
+        data = self._binary().replace('POINTS 5 double\n' +
+                                      POINTS.astype('>f8').tostring(),
+                                      'POINTS 5 float\n' +
+                                      POINTS.astype('>f4').tostring())
+        self._check(data)
+
+    def test_truncated_binary(self):
+        data = self._binary()
+        self.assertRaises(Exception, LegacyReader(data[:-20]).read)
+
+    def test_wrong_number_of_cell_types(self):
+        data = self._ascii().replace('CELL_TYPES 2\n10\n5\n', 'CELL_TYPES 1\n10\n')
+        self.assertRaises(Exception, LegacyReader(data).read)
+
+    def test_unsupported_dataset(self):
+        data = self._ascii().replace('UNSTRUCTURED_GRID', 'POLYDATA')
+        self.assertRaises(Exception, LegacyReader(data).read)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import os
+import sys
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+try:
+    from tvtk.api import tvtk
+    from mlab_tools.object import Object, PropertyPool, flush_updates
+    from mlab_tools.transformations import scaling_matrix, translation_matrix
+except ImportError as e:
+    missing = 'Missing dependency: {}'.format(e)
+else:
+    missing = None
+
+
+def make_object():
+    obj = Object()
+    obj.actor = tvtk.Actor()
+    return obj
+
+
+@unittest.skipIf(missing, missing)
+class TestPose(unittest.TestCase):
+
+    def test_transform_composes(self):
+        obj = make_object()
+        obj.transform(translate=(1, 2, 3))
+        obj.transform(scale=2)
+
+        expected = np.dot(translation_matrix((1, 2, 3)), scaling_matrix(2))
+        np.testing.assert_allclose(obj.get_pose(), expected)
+
+    def test_set_pose_replaces(self):
+        obj = make_object()
+        obj.transform(translate=(1, 2, 3))
+        obj.set_pose(scale=(1, 2, 3))
+        np.testing.assert_allclose(obj.get_pose(), np.diag((1, 2, 3, 1)))
+
+        matrix = translation_matrix((4, 5, 6))
+        obj.set_pose(matrix)
+        np.testing.assert_allclose(obj.get_pose(), matrix)
+
+    def test_flush(self):
+        obj = make_object()
+        obj.transform(translate=(1, 0, 0))
+        obj.transform(translate=(0, 1, 0))
+        # The actor is only updated when flushing.
+        self.assertIsNone(obj.actor.user_transform)
+
+        flush_updates()
+        transform = obj.actor.user_transform
+        np.testing.assert_allclose(transform.matrix.to_array(),
+                                   translation_matrix((1, 1, 0)))
+
+        obj.set_pose(translate=(2, 0, 0))
+        flush_updates()
+        self.assertIs(obj.actor.user_transform, transform)
+        np.testing.assert_allclose(transform.matrix.to_array(),
+                                   translation_matrix((2, 0, 0)))
+
+
+@unittest.skipIf(missing, missing)
+class TestPropertyPool(unittest.TestCase):
+
+    def test_shared(self):
+        pool = PropertyPool()
+        key, prop = pool.acquire({'color': (1, 0, 0)})
+        other_key, other = pool.acquire({'color': [1, 0, 0]})
+
+        self.assertEqual(other_key, key)
+        self.assertIs(other, prop)
+        self.assertEqual(pool.entries[key][1], 2)
+
+    def test_copy_on_write(self):
+        pool = PropertyPool()
+        key, prop = pool.acquire({'color': (1, 0, 0)})
+        pool.acquire({'color': (1, 0, 0)})
+
+        new_key, new = pool.acquire({'color': (0, 1, 0)}, key=key,
+                                    changes={'color': (0, 1, 0)})
+        self.assertIsNot(new, prop)
+        self.assertEqual(prop.color, (1, 0, 0))
+        self.assertEqual(new.color, (0, 1, 0))
+        self.assertEqual(pool.entries[key][1], 1)
+
+        # Nobody else holds the new property, so it is updated in place.
+        last_key, last = pool.acquire({'color': (0, 0, 1)}, key=new_key,
+                                      changes={'color': (0, 0, 1)})
+        self.assertIs(last, new)
+        self.assertEqual(last.color, (0, 0, 1))
+        self.assertNotIn(new_key, pool.entries)
+
+        # Going back to pooled values releases the property held.
+        key, prop = pool.acquire({'color': (1, 0, 0)}, key=last_key,
+                                 changes={'color': (1, 0, 0)})
+        self.assertEqual(pool.entries[key][1], 2)
+        self.assertNotIn(last_key, pool.entries)
+
+    def test_update_properties(self):
+        first, second = make_object(), make_object()
+        first.update_properties(color=(0.5, 0.5, 0.5), opacity=0.5)
+        second.update_properties(color=(0.5, 0.5, 0.5), opacity=0.5)
+        # Properties are only set when flushing.
+        self.assertEqual(first.actor.property.opacity, 1)
+
+        flush_updates()
+        self.assertIs(first.actor.property, second.actor.property)
+        self.assertEqual(first.actor.property.opacity, 0.5)
+
+        second.update_properties(opacity=1)
+        flush_updates()
+        self.assertIsNot(first.actor.property, second.actor.property)
+        self.assertEqual(first.actor.property.opacity, 0.5)
+        self.assertEqual(second.actor.property.opacity, 1)
+        self.assertEqual(second.actor.property.color, (0.5, 0.5, 0.5))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+from mlab_tools.arrays import cell_offsets
+from mlab_tools.cache import GeometryCache
+from mlab_tools.readers import read_OFF
+
+
+OFF_FILE = """OFF
+# A square pyramid.
+5 2 0
+
+0 0 0
+1 0 0
+1 1 0
+0 1 0 0.5 0.5 0.5 1
+0.5 0.5 1
+4 0 1 2 3
+3 0 1 4 255 0 0
+"""
+
+
+class TestReadOFF(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = GeometryCache('off')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _write(self, contents):
+        filename = os.path.join(self.directory, 'test.off')
+        with open(filename, 'w') as _file:
+            _file.write(contents)
+        return filename
+
+    def test_read(self):
+        points, faces, n_faces = read_OFF(self._write(OFF_FILE), cache=self.cache)
+
+        self.assertEqual(points.shape, (5, 3))
+        np.testing.assert_array_equal(points[3], (0, 1, 0))
+        np.testing.assert_array_equal(points[4], (0.5, 0.5, 1))
+        self.assertEqual(n_faces, 2)
+        np.testing.assert_array_equal(faces, [4, 0, 1, 2, 3, 3, 0, 1, 4])
+        np.testing.assert_array_equal(cell_offsets(faces, n_faces), [0, 5])
+
+    def test_colored_faces(self):
+        # The colors of the first face would be read as a face of three
+        # vertices if they were not dropped.
+        contents = OFF_FILE.replace('5 2 0', '5 3 0')\
+                           .replace('4 0 1 2 3', '3 0 1 2 3 1 2')\
+                           + '3 2 3 4\n'
+        points, faces, n_faces = read_OFF(self._write(contents), cache=self.cache)
+
+        self.assertEqual(n_faces, 3)
+        np.testing.assert_array_equal(faces, [3, 0, 1, 2, 3, 0, 1, 4, 3, 2, 3, 4])
+
+    def test_wrong_header(self):
+        filename = self._write(OFF_FILE.replace('OFF', 'PLY', 1))
+        self.assertRaises(Exception, read_OFF, filename, cache=self.cache)
+
+    def test_index_out_of_range(self):
+        filename = self._write(OFF_FILE.replace('3 0 1 4', '3 0 1 5'))
+        self.assertRaises(Exception, read_OFF, filename, cache=self.cache)
+
+    def test_missing_faces(self):
+        filename = self._write(OFF_FILE.replace('5 2 0', '5 3 0'))
+        self.assertRaises(Exception, read_OFF, filename, cache=self.cache)
+
+    def test_missing_face_vertices(self):
+        filename = self._write(OFF_FILE.replace('4 0 1 2 3', '4 0 1 2'))
+        self.assertRaises(Exception, read_OFF, filename, cache=self.cache)
+
+
+class TestCellOffsets(unittest.TestCase):
+
+    def test_same_size(self):
+        cells = np.array([3, 0, 1, 2, 3, 2, 1, 0])
+        np.testing.assert_array_equal(cell_offsets(cells, 2), [0, 4])
+
+    def test_mixed_sizes(self):
+        cells = np.array([4, 0, 1, 2, 3, 3, 1, 2, 4, 8, 0, 1, 2, 3, 4, 5, 6, 7,
+                          3, 0, 2, 4])
+        np.testing.assert_array_equal(cell_offsets(cells, 4), [0, 5, 9, 18])
+
+    def test_wrong_format(self):
+        cells = np.array([4, 0, 1, 2, 3, 3, 1, 2, 4])
+        self.assertRaises(Exception, cell_offsets, cells, 1)
+        self.assertRaises(Exception, cell_offsets, cells, 3)
+        self.assertRaises(Exception, cell_offsets, cells[:-1], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
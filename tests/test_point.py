@@ -0,0 +1,59 @@
+import os
+import sys
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+try:
+    from mlab_tools.point import PointCloud
+except ImportError as e:
+    missing = 'Missing dependency: {}'.format(e)
+else:
+    missing = None
+
+
+def mask(cloud):
+    return cloud.poly_data.point_data.get_array('mask').to_array()
+
+
+@unittest.skipIf(missing, missing)
+class TestPointCloud(unittest.TestCase):
+
+    def test_bounds(self):
+        cloud = PointCloud()
+        cloud.add_point((5, 6, 7))
+        cloud.add_point((6, 7, 8))
+
+        np.testing.assert_allclose(cloud.poly_data.bounds, (5, 6, 6, 7, 7, 8))
+
+    def test_append(self):
+        cloud = PointCloud([(0, 0, 0), (1, 1, 1)], colors=[(1, 0, 0), (0, 1, 0)])
+        points = cloud.poly_data.points
+        cloud.add_points([(2, 2, 2)], size=0.5, colors=(0, 0, 1))
+
+        # The buffers were not reallocated, so VTK still wraps them.
+        self.assertEqual(cloud.poly_data.points, points)
+        self.assertEqual(cloud.num_points(), 3)
+        np.testing.assert_array_equal(cloud.get_points()[-1], (2, 2, 2))
+        self.assertEqual(mask(cloud).sum(), 3)
+
+        colors = cloud.poly_data.point_data.get_array('colors').to_array()
+        np.testing.assert_array_equal(colors[:3], [(255, 0, 0), (0, 255, 0),
+                                                   (0, 0, 255)])
+        sizes = cloud.poly_data.point_data.get_array('sizes').to_array()
+        np.testing.assert_allclose(sizes[:3], [1e-2, 1e-2, 0.5])
+
+    def test_reallocation(self):
+        cloud = PointCloud()
+        points = np.random.RandomState(0).rand(100, 3)
+        cloud.add_points(points)
+
+        np.testing.assert_array_equal(cloud.get_points(), points)
+        self.assertEqual(mask(cloud).sum(), 100)
+        np.testing.assert_allclose(cloud.poly_data.bounds,
+                                   np.ravel(zip(points.min(0), points.max(0))))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import os
+import sys
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+try:
+    from mlab_tools.animation import Stop
+    from mlab_tools.polyline import AnimatedPolyLine, PolyLine
+except ImportError as e:
+    missing = 'Missing dependency: {}'.format(e)
+else:
+    missing = None
+
+
+def cells(line):
+    data = line.poly_data.lines.data
+    return [data.get_value(i) for i in xrange(data.number_of_tuples)]
+
+
+@unittest.skipIf(missing, missing)
+class TestPolyLine(unittest.TestCase):
+
+    def test_add_point(self):
+        line = PolyLine([(0, 0, 0), (1, 0, 0)])
+        line.add_point((1, 1, 0))
+        points = line.poly_data.points
+        line.add_point((1, 1, 1))
+
+        # The buffers were not reallocated, so VTK still wraps them.
+        self.assertEqual(line.poly_data.points, points)
+        np.testing.assert_array_equal(cells(line), [4, 0, 1, 2, 3])
+        np.testing.assert_allclose(line.poly_data.bounds, (0, 1, 0, 1, 0, 1))
+
+        line.coordinates.data[0] = (-1, 0, 0)
+        np.testing.assert_array_equal(line.poly_data.points.to_array()[0],
+                                      (-1, 0, 0))
+
+    def test_visible_points(self):
+        line = PolyLine([(0, 0, 0), (1, 0, 0), (2, 0, 0)])
+
+        line._set_visible_points(2)
+        np.testing.assert_array_equal(cells(line), [2, 0, 1])
+        np.testing.assert_allclose(line.poly_data.bounds, (0, 1, 0, 0, 0, 0))
+
+        line._set_visible_points(0)
+        self.assertEqual(line.poly_data.number_of_lines, 0)
+
+        line._set_visible_points(3)
+        np.testing.assert_array_equal(cells(line), [3, 0, 1, 2])
+
+
+@unittest.skipIf(missing, missing)
+class TestTimeSteps(unittest.TestCase):
+
+    POINTS = [(0, 0, 0), (1, 0, 0), (2, 0, 0), (3, 0, 0), (4, 0, 0)]
+
+    def test_times(self):
+        self.assertRaises(Exception, AnimatedPolyLine, self.POINTS,
+                          time_per_frame=1)
+        self.assertRaises(Exception, AnimatedPolyLine, self.POINTS,
+                          times=[0, 2, 1, 3, 4], time_per_frame=1)
+
+    def test_reveal(self):
+        line = AnimatedPolyLine(self.POINTS, initial_frame=3,
+                                times=[0, 0.1, 0.2, 1.0, 1.1], time_per_frame=0.5)
+        anim = line.default_animator()
+
+        # Every point whose time was reached is revealed at once.
+        visible = list()
+        for frame in xrange(1, 7):
+            anim(line, frame)
+            visible.append(line.num_visible)
+        self.assertEqual(visible, [1, 1, 1, 3, 4, 5])
+
+        self.assertRaises(Stop, anim, line, 7)
+
+    def test_interpolate(self):
+        line = AnimatedPolyLine(self.POINTS[:3], times=[0, 1, 2],
+                                time_per_frame=0.25, interpolate=True)
+        anim = line.default_animator()
+
+        anim(line, 3)
+        self.assertEqual(cells(line), [2, 0, 1])
+        np.testing.assert_allclose(line.poly_data.bounds, (0, 0.5, 0, 0, 0, 0))
+
+        anim(line, 6)
+        self.assertEqual(cells(line), [3, 0, 1, 2])
+        np.testing.assert_allclose(line.coordinates.data[1], (1, 0, 0))
+        np.testing.assert_allclose(line.poly_data.bounds, (0, 1.25, 0, 0, 0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
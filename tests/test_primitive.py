@@ -0,0 +1,80 @@
+import os
+import sys
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+try:
+    from tvtk.api import tvtk
+    from mlab_tools.primitive import Box, Instances, SourceCache, Sphere
+except ImportError as e:
+    missing = 'Missing dependency: {}'.format(e)
+else:
+    missing = None
+
+
+class CountingFactory(object):
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return tvtk.CubeSource()
+
+
+@unittest.skipIf(missing, missing)
+class TestSourceCache(unittest.TestCase):
+
+    def test_shared_sources(self):
+        first = Sphere((0, 0, 0), 1)
+        second = Sphere((1, 1, 1), 2)
+        other = Sphere((0, 0, 0), 1, theta_res=16)
+
+        self.assertIs(first.mapper, second.mapper)
+        self.assertIsNot(first.mapper, other.mapper)
+
+    def test_least_recently_used(self):
+        cache = SourceCache(capacity=2)
+        factory = CountingFactory()
+
+        a = cache.get('a', factory)
+        cache.get('b', factory)
+        self.assertIs(cache.get('a', factory), a)
+        cache.get('c', factory)
+        self.assertEqual(factory.calls, 3)
+
+        # 'b' was the least recently used entry.
+        self.assertIs(cache.get('a', factory), a)
+        self.assertEqual(factory.calls, 3)
+        cache.get('b', factory)
+        self.assertEqual(factory.calls, 4)
+
+    def test_offset(self):
+        box = Box(2, 4, 6, center=(1, 2, 3))
+        np.testing.assert_allclose(box.actor.bounds, (0, 2, 0, 4, 0, 6))
+
+        box.set_center((0, 0, 0))
+        np.testing.assert_allclose(box.actor.bounds, (-1, 1, -2, 2, -3, 3))
+
+
+@unittest.skipIf(missing, missing)
+class TestInstances(unittest.TestCase):
+
+    def test_update(self):
+        instances = Instances(Box(1, 2, 3), [(0, 0, 0), (1, 0, 0)],
+                              colors=[(1, 0, 0), (0, 1, 0)])
+        instances.update_instances(positions=[(5, 5, 5), (6, 6, 6)],
+                                   scales=[1, 2], colors=[(0, 0, 1, 0.5)] * 2)
+
+        data = instances.poly_data
+        np.testing.assert_allclose(data.points.to_array(), [(5, 5, 5), (6, 6, 6)])
+        np.testing.assert_allclose(data.point_data.get_array('scales').to_array(),
+                                   [(1, 1, 1), (2, 2, 2)])
+        self.assertEqual(data.point_data.get_array('colors').get_tuple4(1),
+                         (0, 0, 255, 128))
+
+
+if __name__ == '__main__':
+    unittest.main()
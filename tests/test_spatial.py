@@ -0,0 +1,95 @@
+import os
+import sys
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+from mlab_tools.arrays import cell_offsets
+from mlab_tools.readers import CellType
+from mlab_tools.spatial import CellLocator
+
+
+def cube_grid(n):
+    # Unit cubes of an n x n x n grid, each one split into six tetras
+    # sharing its main diagonal.
+    corners = [(x, y, z) for z in (0, 1) for y in (0, 1) for x in (0, 1)]
+    paths = [(1, 3), (1, 5), (2, 3), (2, 6), (4, 5), (4, 6)]
+    index = lambda x, y, z: (z*(n+1) + y)*(n+1) + x
+
+    points = np.array([(x, y, z) for z in xrange(n+1) for y in xrange(n+1)
+                       for x in xrange(n+1)], dtype=np.float64)
+    cells = list()
+    for z in xrange(n):
+        for y in xrange(n):
+            for x in xrange(n):
+                ids = [index(x+i, y+j, z+k) for i, j, k in corners]
+                for a, b in paths:
+                    cells.extend([4, ids[0], ids[a], ids[b], ids[7]])
+
+    cells = np.array(cells)
+    n_cells = 6*n**3
+    cell_types = np.empty(n_cells, dtype=np.int64)
+    cell_types[:] = CellType.VTK_TETRA
+
+    return points, cells, cell_offsets(cells, n_cells), cell_types
+
+
+def contains(points, cell, point, tolerance=1e-9):
+    vertices = points[cell]
+    edges = (vertices[1:] - vertices[0]).T
+    coordinates = np.linalg.solve(edges, point - vertices[0])
+    return (coordinates >= -tolerance).all() and coordinates.sum() <= 1 + tolerance
+
+
+class TestCellLocator(unittest.TestCase):
+
+    def test_tetras(self):
+        points, cells, offsets, cell_types = cube_grid(3)
+        locator = CellLocator(points, cells, offsets, cell_types)
+
+        queries = np.random.RandomState(0).uniform(-0.5, 3.5, (500, 3))
+        located = locator.locate(queries)
+
+        for point, index in zip(queries, located):
+            inside = ((point >= 0) & (point <= 3)).all()
+            if not inside:
+                self.assertEqual(index, -1)
+                continue
+            self.assertGreaterEqual(index, 0)
+            cell = cells[offsets[index]+1:offsets[index]+5]
+            self.assertTrue(contains(points, cell, point))
+
+    def test_shared_face(self):
+        # A voxel followed by a tetra sharing part of its face x = 1.
+        voxel = [(x, y, z) for z in (0, 1) for y in (0, 1) for x in (0, 1)]
+        points = np.array(voxel + [(1, 0, 0), (2, 0, 0), (1, 1, 0), (1, 0, 1)],
+                          dtype=np.float64)
+        cells = np.array([8] + range(8) + [4, 8, 9, 10, 11])
+        cell_types = np.array([CellType.VTK_VOXEL, CellType.VTK_TETRA])
+        locator = CellLocator(points, cells, cell_offsets(cells, 2), cell_types)
+
+        located = locator.locate([(1, 0.1, 0.1), (1.2, 0.1, 0.1),
+                                  (0.5, 0.5, 0.5), (5, 5, 5)])
+        np.testing.assert_array_equal(located, [0, 1, 0, -1])
+
+    def test_unsupported_cells(self):
+        points = np.array([(0, 0, 0), (1, 0, 0), (0, 1, 0)], dtype=np.float64)
+        cells = np.array([3, 0, 1, 2])
+        cell_types = np.array([CellType.VTK_TRIANGLE])
+        locator = CellLocator(points, cells, cell_offsets(cells, 1), cell_types)
+
+        np.testing.assert_array_equal(locator.locate([(0.1, 0.1, 0)]), [-1])
+
+    def test_chunks(self):
+        points, cells, offsets, cell_types = cube_grid(2)
+        locator = CellLocator(points, cells, offsets, cell_types)
+        queries = np.random.RandomState(1).uniform(0, 2, (100, 3))
+        expected = locator.locate(queries)
+
+        locator.CHUNK_SIZE = 7
+        np.testing.assert_array_equal(locator.locate(queries), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import os
+import sys
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+from mlab_tools.timeline import VolumeTimeline
+
+
+class FakeMesh(object):
+
+    # Stands for mesh.PolyhedronMesh: volumes with IDs and RGBA colors.
+
+    def __init__(self, ids):
+        self.ids = np.asarray(ids)
+        self.colors = np.ones((len(ids), 4))
+        self.updates = list()
+
+    def _indices(self, ids):
+        return np.searchsorted(self.ids, ids)
+
+    def update_polyhedrons(self, ids, color=None, opacity=None):
+        indices = self._indices(ids)
+        self.colors[indices, :3] = color
+        self.colors[indices, 3] = opacity
+        self.updates.append(sorted(ids))
+
+
+CURRENT = (0.7, 0, 0, 0.3)
+VISITED = (0.5, 0, 0, 0.05)
+
+
+class TestVolumeTimeline(unittest.TestCase):
+
+    def setUp(self):
+        self.mesh = FakeMesh([10, 20, 30, 40])
+        # Volume 20 is visited twice, and -1 is outside the mesh.
+        self.timeline = VolumeTimeline(self.mesh, [0, 1, 2, 3, 4],
+                                       [10, 20, -1, 20, 30], time_per_frame=1)
+
+    def test_seek(self):
+        self.assertEqual(self.timeline.seek(1), 0)
+        np.testing.assert_allclose(self.mesh.colors[0], CURRENT)
+
+        self.assertEqual(self.timeline.seek(2), 1)
+        np.testing.assert_allclose(self.mesh.colors[:2], [VISITED, CURRENT])
+        # Only the volumes of the entries reached are updated.
+        self.assertEqual(self.mesh.updates[-1], [10, 20])
+
+        self.timeline.seek(3)
+        np.testing.assert_allclose(self.mesh.colors[:2], [VISITED, VISITED])
+
+        self.timeline.seek(5)
+        self.assertTrue(self.timeline.finished())
+        np.testing.assert_allclose(self.mesh.colors,
+                                   [VISITED, VISITED, CURRENT, (1, 1, 1, 1)])
+
+    def test_seek_back(self):
+        self.timeline.seek(5)
+        self.assertEqual(self.timeline.seek(2), 1)
+        np.testing.assert_allclose(self.mesh.colors,
+                                   [VISITED, CURRENT, (1, 1, 1, 1), (1, 1, 1, 1)])
+
+        self.assertEqual(self.timeline.seek(0), -1)
+        np.testing.assert_allclose(self.mesh.colors, np.ones((4, 4)))
+
+    def test_jump(self):
+        # Jumping to a frame gives the same state as playing every frame.
+        for frame in xrange(1, 7):
+            self.timeline.seek(frame)
+            played = self.mesh.colors.copy()
+
+            mesh = FakeMesh([10, 20, 30, 40])
+            timeline = VolumeTimeline(mesh, [0, 1, 2, 3, 4],
+                                      [10, 20, -1, 20, 30], time_per_frame=1)
+            timeline.seek(frame)
+            np.testing.assert_allclose(mesh.colors, played)
+
+    def test_frames(self):
+        timeline = VolumeTimeline(self.mesh, [0, 1, 2, 3, 4],
+                                  [10, 20, -1, 20, 30], time_per_frame=0.5,
+                                  initial_frame=3)
+        self.assertEqual(timeline.entry_at_frame(2), -1)
+        self.assertEqual(timeline.entry_at_frame(4), 0)
+        self.assertEqual(timeline.entry_at_frame(5), 1)
+        self.assertEqual(timeline.entry_at_frame(100), 4)
+
+    def test_wrong_entries(self):
+        self.assertRaises(Exception, VolumeTimeline, self.mesh, [1, 0],
+                          [10, 20], time_per_frame=1)
+        self.assertRaises(Exception, VolumeTimeline, self.mesh, [0, 1],
+                          [10], time_per_frame=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import sys
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+from mlab_tools.transformations import rotation_matrix, scaling_matrix,\
+                                       translation_matrix
+
+try:
+    from tvtk.api import tvtk
+except ImportError:
+    tvtk = None
+
+
+def vtk_matrix(transform):
+    return np.array(transform.matrix.to_array())
+
+
+class TestTransformations(unittest.TestCase):
+
+    def test_translation(self):
+        point = np.dot(translation_matrix((1, -2, 3.5)), (1, 1, 1, 1))
+        np.testing.assert_allclose(point, (2, -1, 4.5, 1))
+
+    def test_scaling(self):
+        np.testing.assert_allclose(scaling_matrix(2), np.diag((2, 2, 2, 1)))
+        np.testing.assert_allclose(scaling_matrix(np.float32(2)),
+                                   np.diag((2, 2, 2, 1)))
+        np.testing.assert_allclose(scaling_matrix((1, 2, 3)),
+                                   np.diag((1, 2, 3, 1)))
+
+    def test_rotation(self):
+        # Rotations are counterclockwise and concatenated as tvtk.Transform
+        # does, so points are rotated around the z axis first.
+        point = np.dot(rotation_matrix((0, 0, 90)), (1, 0, 0, 1))
+        np.testing.assert_allclose(point, (0, 1, 0, 1), atol=1e-12)
+
+        point = np.dot(rotation_matrix((90, 0, 90)), (1, 0, 0, 1))
+        np.testing.assert_allclose(point, (0, 0, 1, 1), atol=1e-12)
+
+
+@unittest.skipIf(tvtk is None, 'tvtk is not available')
+class TestVTKTransformations(unittest.TestCase):
+
+    def test_translation(self):
+        transform = tvtk.Transform()
+        transform.translate((1, -2, 3.5))
+        np.testing.assert_allclose(translation_matrix((1, -2, 3.5)),
+                                   vtk_matrix(transform))
+
+    def test_scaling(self):
+        transform = tvtk.Transform()
+        transform.scale((2, 2, 2))
+        np.testing.assert_allclose(scaling_matrix(2), vtk_matrix(transform))
+
+    def test_rotation(self):
+        for angles in [(30, 0, 0), (0, 45, 0), (0, 0, -60), (10, 20, 30)]:
+            transform = tvtk.Transform()
+            transform.rotate_x(angles[0])
+            transform.rotate_y(angles[1])
+            transform.rotate_z(angles[2])
+            np.testing.assert_allclose(rotation_matrix(angles),
+                                       vtk_matrix(transform), atol=1e-12)
+
+    def test_composition(self):
+        # Same order as Object.transform.
+        transform = tvtk.Transform()
+        transform.translate((1, 2, 3))
+        transform.scale((2, 3, 4))
+        transform.rotate_x(15)
+        transform.rotate_y(25)
+        transform.rotate_z(35)
+
+        matrix = np.dot(np.dot(translation_matrix((1, 2, 3)),
+                               scaling_matrix((2, 3, 4))),
+                        rotation_matrix((15, 25, 35)))
+        np.testing.assert_allclose(matrix, vtk_matrix(transform), atol=1e-12)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+try:
+    from mlab_tools.cache import GeometryCache, set_cache
+    from mlab_tools.geometry import GeometryParser
+    from mlab_tools.mesh import PolyhedronView
+except ImportError as e:
+    missing = 'Missing dependency: {}'.format(e)
+else:
+    missing = None
+
+
+# A unit voxel (ID 1) and a tetra on top of it (ID 2).
+VTK_FILE = """# vtk DataFile Version 3.0
+Voxel and tetra
+ASCII
+DATASET UNSTRUCTURED_GRID
+POINTS 9 float
+0 0 0 1 0 0 0 1 0 1 1 0 0 0 1 1 0 1 0 1 1 1 1 1 0.5 0.5 2
+CELLS 2 14
+8 0 1 2 3 4 5 6 7
+4 4 5 6 8
+CELL_TYPES 2
+11
+10
+"""
+
+
+class ParserTestCase(unittest.TestCase):
+
+    merged = False
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'test.vtk')
+        with open(self.filename, 'w') as _file:
+            _file.write(VTK_FILE)
+        set_cache(GeometryCache('off'))
+        parser = GeometryParser.from_VTK(self.filename, merged=self.merged)
+        self.geometry = parser.parse()
+
+    def tearDown(self):
+        set_cache(None)
+        shutil.rmtree(self.directory)
+
+
+@unittest.skipIf(missing, missing)
+class TestMergedMesh(ParserTestCase):
+
+    merged = True
+
+    def _alphas(self):
+        # Opacity of the faces of each polyhedron (six faces of the voxel,
+        # then four of the tetra).
+        mesh = self.geometry.get_mesh()
+        alphas = mesh.face_colors[:, 3]
+        return list(alphas[mesh.face_ids == 1]), list(alphas[mesh.face_ids == 2])
+
+    def test_mesh(self):
+        mesh = self.geometry.get_mesh()
+        np.testing.assert_array_equal(mesh.ids, [1, 2])
+        self.assertEqual(mesh.poly_data.number_of_polys, 10)
+
+        view = self.geometry.get_polyhedron_by_ID(2)
+        self.assertIsInstance(view, PolyhedronView)
+        self.assertIs(view.get_actor(), mesh.get_actor())
+        self.assertRaises(Exception, view.transform, translate=1)
+
+    def test_update(self):
+        mesh = self.geometry.get_mesh()
+        self.geometry.get_polyhedron_by_ID(2).update_properties(opacity=0.5)
+
+        self.assertEqual(self._alphas(), ([255] * 6, [128] * 4))
+        np.testing.assert_allclose(mesh.colors[:, 3], [1, 0.5])
+
+    def test_drawn_views(self):
+        mesh = self.geometry.get_mesh()
+        view = self.geometry.get_polyhedron_by_ID(2)
+
+        # Only the polyhedrons of the views in the scene are drawn...
+        view._added_to_scene()
+        self.assertEqual(self._alphas(), ([0] * 6, [255] * 4))
+
+        # ... unless the mesh itself is in the scene.
+        mesh._added_to_scene()
+        self.assertEqual(self._alphas(), ([255] * 6, [255] * 4))
+        mesh._removed_from_scene()
+        self.assertEqual(self._alphas(), ([0] * 6, [255] * 4))
+
+        # Colors of polyhedrons not drawn are kept.
+        mesh.update_polyhedrons(1, opacity=0.5)
+        self.assertEqual(self._alphas(), ([0] * 6, [255] * 4))
+        view._removed_from_scene()
+        self.assertEqual(self._alphas(), ([128] * 6, [255] * 4))
+
+
+@unittest.skipIf(missing, missing)
+class TestLazyGeometry(ParserTestCase):
+
+    def test_lazy(self):
+        self.assertEqual(self.geometry.num_polyhedrons(), 2)
+        self.assertEqual(self.geometry.num_built, 0)
+        self.assertEqual(self.geometry.get_name(2), 'Tetra-4-5-6-8')
+        self.assertEqual(self.geometry.num_built, 0)
+
+        tetra = self.geometry.get_polyhedron_by_ID(2)
+        self.assertIs(self.geometry.get_polyhedron_by_ID(2), tetra)
+        self.assertEqual(self.geometry.num_built, 1)
+        self.assertEqual(self.geometry.num_polyhedrons(), 2)
+        np.testing.assert_allclose(tetra.poly_data.bounds, (0, 1, 0, 1, 1, 2))
+
+        self.assertIsNone(self.geometry.get_polyhedron_by_ID(3))
+
+    def test_iteration(self):
+        polyhedrons = list(self.geometry)
+        self.assertEqual([pid for pid, _ in polyhedrons], [1, 2])
+        self.assertEqual(polyhedrons[0][1].poly_data.number_of_polys, 6)
+        self.assertEqual(self.geometry.num_built, 2)
+        self.assertEqual(self.geometry.num_polyhedrons(), 2)
+
+    def test_add_polyhedron(self):
+        tetra = self.geometry.get_polyhedron_by_ID(2)
+        self.assertRaises(Exception, self.geometry.add_named_polyhedron,
+                          tetra, 'Other', 1)
+
+        self.geometry.add_named_polyhedron(tetra, 'Other', 3)
+        self.assertEqual(self.geometry.num_polyhedrons(), 3)
+        self.assertEqual(self.geometry.get_name(3), 'Other')
+
+
+@unittest.skipIf(missing, missing)
+class TestNameLookup(ParserTestCase):
+
+    def test_lookup(self):
+        self.assertEqual(self.geometry.get_name(1), 'Voxel-0-1-2-3-4-5-6-7')
+        tetra = self.geometry.get_polyhedron('Tetra-4-5-6-8')
+        self.assertIs(tetra, self.geometry.get_polyhedron_by_ID(2))
+        # The order of the points in the name is irrelevant.
+        self.assertIs(self.geometry.get_polyhedron('Tetra-8-6-5-4'), tetra)
+        self.assertIsNone(self.geometry.get_polyhedron('Tetra-4-5-6-7'))
+
+    def test_lookup_many(self):
+        names = ['Tetra-4-5-6-8', 'Voxel-7-6-5-4-3-2-1-0', 'Voxel-0-1',
+                 'Tetra-4-5-6-x', 'Hexa-0-1-2-3-4-5-6-7', 'World']
+        np.testing.assert_array_equal(self.geometry.lookup_many(names),
+                                      [2, 1, -1, -1, -1, -1])
+        # No polyhedron is built.
+        self.assertEqual(self.geometry.num_built, 0)
+
+    def test_registered_names(self):
+        tetra = self.geometry.get_polyhedron_by_ID(2)
+        self.geometry.add_named_polyhedron(tetra, 'World', 3)
+        np.testing.assert_array_equal(
+            self.geometry.lookup_many(['World', 'Tetra-4-5-6-8']), [3, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()